@@ -0,0 +1,14 @@
+"""
+asv benchmark suite, run from the project root with the current environment e.g.
+
+    asv run --python=same
+    asv compare <commit 1> <commit 2>
+
+the project is not installed as a package so the project root is added to the path for benchmark imports
+"""
+import sys
+from os import path
+
+_root = path.dirname(path.dirname(path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
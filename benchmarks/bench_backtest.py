@@ -0,0 +1,70 @@
+import logging
+import shutil
+import tempfile
+from os import path
+
+from mytrading.strategies.spike import MySpikeStrategy
+from mytrading.strategy import hist_strat_run
+from .fixtures import FIXTURE_NAMES, stream_buffer
+
+SPIKE_KWARGS = {
+    'name': 'benchmark',
+    'cutoff_seconds': 2,
+    'pre_seconds': 180,
+    'feature_seconds': 300,
+    'historic': True,
+    'trade_transactions_cutoff': 0,
+    'stake_size': 5,
+    'max_odds': 100,
+    'min_hedge_price': 1.01,
+    'window_spread_min': 2,
+    'ladder_spread_max': 5,
+    'tick_offset': 2,
+    'tick_trigger': 2,
+    'update_s': 5,
+    'spike_wait_ms': 500,
+    'hedge_tick_offset': 1,
+    'hedge_hold_ms': 1000,
+    'enable_lay': True,
+    'features_kwargs': {
+        'n_ladder_elements': 3,
+        'n_wom_ticks': 3,
+        'ltp_window_width_s': 40,
+        'ltp_window_sampling_ms': 200,
+        'ltp_window_sampling_count': 50,
+        'spread_sampling_ms': 100,
+        'spread_sampling_count': 10,
+    },
+}
+
+
+class SpikeBacktest:
+    """end to end flumine backtest of spike strategy for a single market"""
+    params = FIXTURE_NAMES
+    param_names = ['fixture']
+    timeout = 300
+
+    def setup(self, name):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.market_path = path.join(self.tmp_dir, 'stream_updates')
+        with open(self.market_path, 'w') as f:
+            f.write(stream_buffer(name))
+        self.db_kwargs = {
+            'cache_root': path.join(self.tmp_dir, 'cache'),
+            'engine_kwargs': {
+                'url': 'sqlite:///' + path.join(self.tmp_dir, 'benchmark.db')
+            }
+        }
+        logging.disable(logging.INFO)
+
+    def teardown(self, name):
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(self.tmp_dir)
+
+    def time_spike_backtest(self, name):
+        strategy = MySpikeStrategy(
+            **SPIKE_KWARGS,
+            db_kwargs=self.db_kwargs,
+            market_filter={'markets': [self.market_path]}
+        )
+        hist_strat_run(strategy)
@@ -0,0 +1,38 @@
+from mytrading.strategy.feature import simulate_runners
+from mytrading.visual import FeatureFigure
+from .fixtures import FIXTURE_NAMES, MARKET_TIME, stream_snapshots, feature_config, plot_config
+
+
+class FigPlot:
+    """
+    produce runner feature figure from market snapshots as per browser `Session.fig_plot()` with default display
+    seconds and buffer, excluding database reads
+    """
+    params = (FIXTURE_NAMES, ['spike', 'smooth'])
+    param_names = ['fixture', 'config']
+    timeout = 300
+
+    def setup(self, name, config):
+        self.snapshots = stream_snapshots(name)
+        self.configs = feature_config(config)
+        self.plot_cfg = plot_config(config)
+        self.selection_id = self.snapshots[0][0].runners[0].selection_id
+        self.start = FeatureFigure.get_chart_start(
+            display_seconds=180, market_time=MARKET_TIME, first=self.snapshots[0][0].publish_time
+        )
+
+    def time_fig_plot(self, name, config):
+        data = simulate_runners(
+            self.configs,
+            self.snapshots,
+            {self.selection_id: (self.start, MARKET_TIME)},
+            buffer_s=10
+        )
+        FeatureFigure(
+            ftrs_data=data[self.selection_id],
+            plot_cfg=self.plot_cfg,
+            title='benchmark',
+            chart_start=self.start,
+            chart_end=MARKET_TIME,
+            orders_df=None
+        ).fig
@@ -0,0 +1,31 @@
+import time
+
+from mytrading.strategy.feature import simulate_runners
+from .fixtures import FIXTURE_NAMES, stream_snapshots, feature_config
+
+
+class FeatureThroughput:
+    """simulate browser feature configurations for all runners over whole market"""
+    params = (FIXTURE_NAMES, ['spike', 'smooth'])
+    param_names = ['fixture', 'config']
+    timeout = 300
+
+    def setup(self, name, config):
+        self.snapshots = stream_snapshots(name)
+        self.configs = feature_config(config)
+        start = self.snapshots[0][0].publish_time
+        end = self.snapshots[-1][0].publish_time
+        self.windows = {r.selection_id: (start, end) for r in self.snapshots[0][0].runners}
+        self.n_updates = len(self.snapshots) * len(self.windows)
+
+    def _simulate(self):
+        simulate_runners(self.configs, self.snapshots, self.windows, buffer_s=0)
+
+    def time_simulate_runners(self, name, config):
+        self._simulate()
+
+    def track_runner_updates_per_second(self, name, config):
+        t = time.perf_counter()
+        self._simulate()
+        return self.n_updates / (time.perf_counter() - t)
+    track_runner_updates_per_second.unit = 'updates/s'
@@ -0,0 +1,35 @@
+from mytrading.process import oddschecker as oc
+from mytrading.utils.ocstandin import oc_page
+
+
+def _names(n_runners):
+    return [f'Runner {chr(ord("A") + i)}' for i in range(n_runners)]
+
+
+class OCParse:
+    """parse synthetic oddschecker race pages, targeted event table scan against whole page BeautifulSoup parse"""
+    params = [6, 12, 20]
+    param_names = ['runners']
+
+    def setup(self, n_runners):
+        self.html = oc_page(_names(n_runners), seed=n_runners)
+
+    def time_parse(self, n_runners):
+        oc.oc_parse(self.html)
+
+    def time_parse_soup(self, n_runners):
+        oc.oc_parse_soup(self.html)
+
+
+class OCConvertNames:
+    """convert parsed oddschecker runner names to selection IDs"""
+    params = [6, 12, 20]
+    param_names = ['runners']
+
+    def setup(self, n_runners):
+        names = _names(n_runners)
+        self.odds = oc.oc_parse(oc_page(names, seed=n_runners))
+        self.names = {1000 + i: name for i, name in enumerate(names)}
+
+    def time_convert_names(self, n_runners):
+        oc.convert_names(self.odds, self.names)
@@ -0,0 +1,43 @@
+import queue
+import sys
+import time
+
+import betfairlightweight
+
+from myutils.betfair import BufferStream
+from mytrading.process.snapshot import snapshots_from_buffer
+from .fixtures import FIXTURE_NAMES, stream_buffer
+
+
+class StreamDecode:
+    """decode market stream buffer to market books or snapshots"""
+    params = FIXTURE_NAMES
+    param_names = ['fixture']
+
+    def setup(self, name):
+        self.buffer = stream_buffer(name)
+        self.n_updates = self.buffer.count('\n') + 1
+
+    def _market_books(self):
+        q = queue.Queue()
+        listener = betfairlightweight.StreamListener(output_queue=q, max_latency=sys.float_info.max)
+        BufferStream.generator(self.buffer, listener).start()
+        return q
+
+    def time_market_books(self, name):
+        self._market_books()
+
+    def time_snapshots(self, name):
+        snapshots_from_buffer(self.buffer)
+
+    def track_market_books_per_second(self, name):
+        t = time.perf_counter()
+        self._market_books()
+        return self.n_updates / (time.perf_counter() - t)
+    track_market_books_per_second.unit = 'updates/s'
+
+    def track_snapshots_per_second(self, name):
+        t = time.perf_counter()
+        snapshots_from_buffer(self.buffer)
+        return self.n_updates / (time.perf_counter() - t)
+    track_snapshots_per_second.unit = 'updates/s'
@@ -0,0 +1,30 @@
+import random
+
+from mytrading.process import closest_tick, side_tick_offset, tick_spread
+from mytrading.process.ticks import LTICKS_DECODED
+
+
+class TickLookup:
+    """odds tick arithmetic for prices on ticks (as from ladders) and between ticks (as from averaged values)"""
+    params = ['tick', 'between']
+    param_names = ['prices']
+
+    def setup(self, prices):
+        rng = random.Random(0)
+        ticks = [rng.choice(LTICKS_DECODED[:-1]) for _ in range(1000)]
+        if prices == 'tick':
+            self.prices = ticks
+        else:
+            self.prices = [t + rng.uniform(0.001, 0.009) for t in ticks]
+
+    def time_closest_tick(self, prices):
+        for p in self.prices:
+            closest_tick(p, return_index=True)
+
+    def time_side_tick_offset(self, prices):
+        for p in self.prices:
+            side_tick_offset(p, 2, 'BACK')
+
+    def time_tick_spread(self, prices):
+        for p in self.prices:
+            tick_spread(p, 3.5, check_values=False)
@@ -0,0 +1,49 @@
+"""
+deterministic synthetic market stream fixtures for benchmarks, in betfair historical "mcm" stream format
+"""
+from functools import lru_cache
+from os import path
+from typing import Dict, List
+
+import yaml
+
+from mytrading.process.snapshot import BookSnapshot, snapshots_from_buffer
+from mytrading.utils.streamgen import StreamConfig, market_stream
+
+MARKET_TIME = StreamConfig.market_time
+
+# fixtures of varying runner count, ladder depth and length
+FIXTURES = {
+    'small': StreamConfig(n_runners=4, ladder_depth=3, pre_seconds=120),
+    'medium': StreamConfig(n_runners=8, ladder_depth=10, pre_seconds=600),
+    'large': StreamConfig(n_runners=12, ladder_depth=10, pre_seconds=900, inplay_seconds=60),
+}
+FIXTURE_NAMES = list(FIXTURES.keys())
+
+
+@lru_cache()
+def stream_buffer(name: str) -> str:
+    """get (cached) market stream buffer of fixture"""
+    return market_stream(FIXTURES[name])
+
+
+@lru_cache()
+def stream_snapshots(name: str) -> List[List[BookSnapshot]]:
+    """get (cached) market book snapshots of fixture"""
+    return snapshots_from_buffer(stream_buffer(name))
+
+
+def _browser_config(dir_name: str, name: str) -> Dict:
+    p = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'mybrowser', dir_name, name + '.yaml')
+    with open(p) as f:
+        return yaml.safe_load(f)
+
+
+def feature_config(name: str) -> Dict:
+    """get browser feature configuration by name"""
+    return _browser_config('configurations_feature', name)
+
+
+def plot_config(name: str) -> Dict:
+    """get browser plot configuration by name"""
+    return _browser_config('configurations_plot', name)
@@ -18,9 +18,8 @@ from myutils import general
 from myutils.dashutilities.triggered import triggered_id, all_triggered_ids
 from myutils.dashutilities.csshandler import CSSClassHandler
 from myutils.dashutilities.callbacks import TDict, dict_callback
-from myutils import timing
 
-from mytrading.strategy.feature.features import RFBase
+from mytrading.strategy import feature as ftrutils
 from mytrading.strategy import tradetracker as tt
 from .session import Session, post_notification, LoadedMarket, Notification, NotificationType
 from .error_catcher import handle_errors, exceptions
@@ -428,6 +427,10 @@ class RunnersComponent(Component, TableComponent):
                     'all-figures-wrapper',
                     intf.button('button-all-figures', btn_icon='fas fa-chart-line', btn_text='All Figures')
                 ),
+                intf.wrapper(
+                    'latency-figure-wrapper',
+                    intf.button('button-latency-figure', btn_icon='fas fa-stopwatch', btn_text='Latency')
+                ),
             ]),
             intf.div('infobox-market'),
             intf.table('table-runners', self.table_columns, self.n_table_rows)
@@ -469,6 +472,7 @@ class RunnersComponent(Component, TableComponent):
                 'info': Output('infobox-market', 'children'),
                 'disable-bin': Output('button-mkt-bin', 'disabled'),
                 'disable-figures': Output('button-all-figures', 'disabled'),
+                'disable-latency': Output('button-latency-figure', 'disabled'),
                 'cell': Output('table-runners', 'active_cell'),
                 'cells': Output('table-runners', 'selected_cells'),
                 'loading': Output(self.loading_id, 'children'),
@@ -496,6 +500,7 @@ class RunnersComponent(Component, TableComponent):
             outputs['info'] = html.P('no market selected'),  # market status
             outputs['disable-bin'] = True,  # by default assume market not loaded, bin market button disabled
             outputs['disable-figures'] = True  # by default assume market not loaded, figures button disabled
+            outputs['disable-latency'] = True  # by default assume market not loaded, latency button disabled
             outputs['cell'] = None  # reset active cell
             outputs['cells'] = []  # reset selected cells
             outputs['loading'] = ''  # blank loading output
@@ -541,6 +546,7 @@ class RunnersComponent(Component, TableComponent):
             outputs['info'] = f'loaded "{market_id}"'
             outputs['disable-bin'] = False  # enable bin market button
             outputs['disable-figures'] = False  # enable plot all figures button
+            outputs['disable-latency'] = not strategy_id  # enable latency figure button if strategy loaded
             outputs['selected-market'] = loaded_market
             outputs['nav-notifications'] = '1'
             return
@@ -605,7 +611,9 @@ class RunnersComponent(Component, TableComponent):
             intf.tooltip('Clear loaded runners\n(market must be loaded first)', 'market-bin-wrapper'),
             intf.tooltip('Show runner orders\n(strategy must be downloaded to market)', 'orders-button-wrapper'),
             intf.tooltip('Plot figure for select runner\n(runner must be selected from table)', 'figure-button-wrapper'),
-            intf.tooltip('Plot all figures\n(market must be loaded)', 'all-figures-wrapper')
+            intf.tooltip('Plot all figures\n(market must be loaded)', 'all-figures-wrapper'),
+            intf.tooltip('Plot strategy processing latency\n(strategy must be downloaded to market)',
+                         'latency-figure-wrapper')
         ]
 
 
@@ -666,6 +674,7 @@ class FigureComponent(Component):
                 'buttons': [
                     Input('button-figure', 'n_clicks'),
                     Input('button-all-figures', 'n_clicks'),
+                    Input('button-latency-figure', 'n_clicks'),
                     Input('btn-close-figure', 'n_clicks')
                 ],
                 'active': Input('figure-tabs', 'active_tab')
@@ -731,7 +740,7 @@ class FigureComponent(Component):
                         outputs['delete-disabled'] = True
                     return
 
-            if triggered_id() != 'button-figure' and triggered_id() != 'button-all-figures':
+            if triggered_id() not in ['button-figure', 'button-all-figures', 'button-latency-figure']:
                 return
 
             if not states['selected-market']:
@@ -743,30 +752,38 @@ class FigureComponent(Component):
                 n_figures = states['count']  # get number of figures
                 shn.deserialise_loaded_market(states['selected-market'])  # deserialise market info
 
+                # plot latency of market processing instead of runner figures
+                if triggered_id() == 'button-latency-figure':
+                    fig = shn.fig_latency(states['selected-market'])
+                    n_figures += 1
+                    tab_name = f'Figure {n_figures}'
+                    tabs.append(dbc.Tab(label=tab_name, tab_id=tab_name))
+                    graph = dcc.Graph(figure=fig, className='flex-grow-1')
+                    figure_stores[tab_name] = graph
+                    post_notification(notifs, 'success', 'Figure', f'produced latency {tab_name}')
+                    outputs['figure'] = graph
+                    outputs['active'] = tab_name
+                    outputs['delete-disabled'] = False
+                    outputs['count'] = n_figures
+                    return
+
                 # get datetime/None chart offset from time input
                 offset_dt = self._get_chart_offset(states['offset'], notifs)
                 secs = offset_dt.total_seconds() if offset_dt else 0
 
                 # get selected IDs and plot
                 sel_ids = self._get_ids(states['cell'], list(states['selected-market'].keys()), notifs)
-                reg = timing.TimingRegistrar()
-
-                def update_reg(feature: RFBase, registrar: timing.TimingRegistrar):
-                    for sub_feature in feature.sub_features.values():
-                        registrar = update_reg(sub_feature, registrar)
-                    return feature.timing_reg + registrar
+                ftrutils.clear_timings()
 
                 # shn.ftr_update()  # update feature & plot configs
-                for selection_id in sel_ids:
-                    features, fig = shn.fig_plot(
-                        market_info=states['selected-market'],
-                        selection_id=selection_id,
-                        secs=secs,
-                        ftr_key=states['plot-config'],
-                        plt_key=states['plot-config']
-                    )
-                    for f in features.values():
-                        reg = update_reg(f, reg)
+                figs = shn.fig_plots(
+                    market_info=states['selected-market'],
+                    selection_ids=sel_ids,
+                    secs=secs,
+                    ftr_key=states['plot-config'],
+                    plt_key=states['plot-config']
+                ) if sel_ids else {}
+                for selection_id, fig in figs.items():
                     n_figures += 1
                     tab_name = f'Figure {n_figures}'
                     tabs.append(dbc.Tab(label=tab_name, tab_id=tab_name))
@@ -784,9 +801,13 @@ class FigureComponent(Component):
                     outputs['figure-notifications'] = str(nav_count)
                     outputs['timings-notifications'] = '1'
 
-                summary = reg.get_timings_summary()
+                summary = ftrutils.get_timings_summary()
                 if not summary:
-                    post_notification(notifs, 'warning', 'Figure', 'no timings on which to produce table')
+                    # features read from feature cache are not processed so have no timings
+                    post_notification(
+                        notifs, 'warning', 'Figure',
+                        'no timings on which to produce table, timings are not logged for features read from cache'
+                    )
                 else:
                     for s in summary:
                         s['level'] = s['function'].count('.')
@@ -235,6 +235,9 @@ class TableConfigs(BaseModel):
             'function': 'Function',
             'count': 'Count',
             'mean': 'Mean',
+            'p50': 'P50',
+            'p95': 'P95',
+            'p99': 'P99',
             'level': 'Level'
         },
         description="""timings table mappings
@@ -245,7 +248,10 @@ class TableConfigs(BaseModel):
 
     timings_table_formatters: Dict[str, Callable[[Any], Any]] = Field(
         {
-            "mean": default_timedelta_formatter
+            "mean": default_timedelta_formatter,
+            "p50": default_timedelta_formatter,
+            "p95": default_timedelta_formatter,
+            "p99": default_timedelta_formatter,
         },
         description='mappings of timings table column name to formatter function'
     )
@@ -275,6 +281,21 @@ class PlotConfig(BaseModel):
     default_offset: str = Field("00:03:00", description="default time offset before start of event")
     order_offset_secs: int = Field(2, description="number of seconds to plot either side of order update start/end")
     cmp_buffer_secs: int = Field(10, description="additional seconds to add when computing features for plotting")
+    feature_timings: bool = Field(True, description="log feature processing times for the timings table")
+    processes: int = Field(
+        0,
+        description="number of worker processes to compute features when plotting multiple runners, 0 or 1 computes "
+                    "all runners in the browser process"
+    )
+    feature_cache_entries: int = Field(
+        500,
+        description="maximum number of runner feature results to store in feature cache, 0 to disable cache"
+    )
+    strategy_features: bool = Field(
+        False,
+        description="plot features stored by strategy (if found) instead of simulating features, plot configuration "
+                    "must match strategy feature identifiers"
+    )
 
 
 class Config(BaseSettings):
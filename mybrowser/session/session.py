@@ -8,8 +8,6 @@ import pandas as pd
 import logging
 from datetime import datetime
 import yaml
-import json
-from json.decoder import JSONDecodeError
 import importlib
 from flask_caching import Cache
 import betfairlightweight
@@ -28,8 +26,9 @@ from .config import MarketFilter, Config
 # from .formatters import get_formatters
 from ..exceptions import SessionException
 from mytrading.utils import bettingdb as bdb, dbfilter as dbf
-from mytrading.strategy import tradetracker, messages as msgs
+from mytrading.strategy import tradetracker, messages as msgs, latency
 from mytrading.strategy import feature as ftrutils
+from mytrading.process.snapshot import BookSnapshot, snapshots_from_buffer
 from mytrading import visual as figlib
 from myutils import timing
 import mybrowser
@@ -87,7 +86,14 @@ class Session:
             streamer.start()
             return list(q.queue)
 
+        @cache.memoize(60)
+        def get_market_snapshots(market_id) -> List[List[BookSnapshot]]:
+            print(f'**** reading market snapshots "{market_id}"')
+            row = self.betting_db.read('marketstream', {'market_id': market_id})
+            return snapshots_from_buffer(row['stream_updates'])
+
         self.get_market_records = get_market_records
+        self.get_market_snapshots = get_market_snapshots
         self.config = config  # parsed configuration
 
         self._market_filters = dbf.DBFilterHandler([flt.filter for flt in market_filters])
@@ -97,6 +103,16 @@ class Session:
         self._db_kwargs = config.database_config.db_kwargs
         self.betting_db = bdb.BettingDB(**self._db_kwargs)
 
+        # cache of feature results for plotting
+        n_entries = config.plot_config.feature_cache_entries
+        self.feature_cache: Optional[ftrutils.FeatureCache] = ftrutils.FeatureCache(
+            self.betting_db.path_feature_cache(),
+            n_entries
+        ) if n_entries > 0 else None
+
+        # feature processing timings displayed in timings table
+        ftrutils.set_timing(config.plot_config.feature_timings)
+
         self.feature_configs = dict()
         self.plot_configs = dict()
         self.update_configs()
@@ -236,8 +252,8 @@ class Session:
         buffer = self.get_strategy_updates(market_id, strategy_id)
         # get order results
         try:
-            lines = [json.loads(ln) for ln in buffer.splitlines()]
-        except JSONDecodeError as e:
+            lines = tradetracker.TradeTracker.read_updates(buffer)
+        except mytrading.exceptions.TradeTrackerException as e:
             raise SessionException(f'error decoding orders buffer: {e}')
 
         # get order infos for each message close and check not blank
@@ -306,21 +322,53 @@ class Session:
         })
         return row['strategy_updates']
 
-    def fig_plot(
+    def _get_fig_orders(self, market_info: LoadedMarket) -> Optional[pd.DataFrame]:
+        """get orders dataframe for all runners of loaded market (or None if no strategy selected)"""
+        if not market_info['strategy_id']:
+            return None
+        row = self.betting_db.read('strategyupdates', {
+            'strategy_id': market_info['strategy_id'],
+            'market_id': market_info['market_id'],
+        })
+        buffer = row['strategy_updates']
+
+        # p = self.betting_db.path_strat_updates(market_info['market_id'], market_info['strategy_id'])
+        # if not path.exists(p):
+        #     raise SessionException(f'could not find cached strategy market file:\n-> "{p}"')
+
+        try:
+            orders = tradetracker.TradeTracker.get_orders_from_buffer(buffer)
+        except mytrading.exceptions.TradeTrackerException as e:
+            raise SessionException(e)
+        if not orders.shape[0]:
+            raise SessionException(f'could not find any rows in strategy updates')
+        return orders
+
+    def _get_strategy_features(self, market_info: LoadedMarket) -> Dict[int, Dict[str, pd.Series]]:
+        """get features stored by strategy for each runner, empty if no strategy selected or none stored"""
+        if not market_info['strategy_id']:
+            return {}
+        row = self.betting_db.read('strategyupdates', {
+            'strategy_id': market_info['strategy_id'],
+            'market_id': market_info['market_id'],
+        })
+        buffer = row.get('strategy_features')
+        if not buffer:
+            return {}
+        try:
+            return ftrutils.read_features(buffer)
+        except mytrading.exceptions.FeatureException as e:
+            raise SessionException(e)
+
+    def _get_fig_window(
             self,
             market_info: LoadedMarket,
+            market_records: List[List[BookSnapshot]],
             selection_id,
             secs,
-            ftr_key,
-            plt_key
-    ) -> (ftrutils.FeatureHolder, Figure):
-
-        # if no active market selected then abort
-        if not market_info:
-            raise SessionException('no market information')
-        market_records = self.get_market_records(market_info['market_id'])
-        if not market_records:
-            raise SessionException('no market records')
+            orders: Optional[pd.DataFrame]
+    ) -> (str, datetime, datetime, Optional[pd.DataFrame]):
+        """get figure title, chart start/end datetimes and runner orders dataframe (or None)"""
 
         # get name and title
         if selection_id not in market_info['runners']:
@@ -337,55 +385,108 @@ class Session:
         )
         end = mkt_dt
 
-        # get orders dataframe (or None)
-        orders = None
-        if market_info['strategy_id']:
-            row = self.betting_db.read('strategyupdates', {
-                'strategy_id': market_info['strategy_id'],
-                'market_id': market_info['market_id'],
-            })
-            buffer = row['strategy_updates']
-
-            # p = self.betting_db.path_strat_updates(market_info['market_id'], market_info['strategy_id'])
-            # if not path.exists(p):
-            #     raise SessionException(f'could not find cached strategy market file:\n-> "{p}"')
-
-            try:
-                orders = tradetracker.TradeTracker.get_orders_from_buffer(buffer)
-            except mytrading.exceptions.TradeTrackerException as e:
-                raise SessionException(e)
-            if not orders.shape[0]:
-                raise SessionException(f'could not find any rows in strategy updates')
-
+        # modify start/end for runner orders
+        if orders is not None:
             orders = orders[orders['selection_id'] == selection_id]
             offset_secs = float(self.config.plot_config.order_offset_secs)
             start = figlib.FeatureFigure.modify_start(start, orders, offset_secs)
             end = figlib.FeatureFigure.modify_end(end, orders, offset_secs)
 
+        return title, start, end, orders
+
+    def _get_market_snapshots(self, market_info: LoadedMarket) -> List[List[BookSnapshot]]:
+        # if no active market selected then abort
+        if not market_info:
+            raise SessionException('no market information')
+        market_records = self.get_market_snapshots(market_info['market_id'])
+        if not market_records:
+            raise SessionException('no market records')
+        return market_records
+
+    def fig_latency(self, market_info: LoadedMarket) -> Figure:
+        """produce figure of strategy processing stage timings recorded for market"""
+        market_id = market_info['market_id']
+        strategy_id = market_info['strategy_id']
+        if not strategy_id:
+            raise SessionException(f'cannot plot latency for market "{market_id}", no strategy selected')
+        df = latency.read_latency(self.get_strategy_updates(market_id, strategy_id))
+        if not df.shape[0]:
+            raise SessionException(f'no latency recorded for market "{market_id}" by strategy "{strategy_id}"')
+        title = 'Latency {} {} {}, strategy "{}"'.format(
+            market_info['info']['event_name'],
+            market_info['info']['market_time'],
+            market_id,
+            strategy_id
+        )
+        return figlib.latency_figure(df, title)
+
+    def fig_plot(
+            self,
+            market_info: LoadedMarket,
+            selection_id,
+            secs,
+            ftr_key,
+            plt_key
+    ) -> Figure:
+        """produce figure for a single runner"""
+        return self.fig_plots(market_info, [selection_id], secs, ftr_key, plt_key)[selection_id]
+
+    def fig_plots(
+            self,
+            market_info: LoadedMarket,
+            selection_ids: List[int],
+            secs,
+            ftr_key,
+            plt_key
+    ) -> Dict[int, Figure]:
+        """
+        produce figures for multiple runners, simulating features for all runners in a single pass over market records
+        (split across worker processes if configured) - returns dictionary of (selection ID => figure)
+        """
+
+        market_records = self._get_market_snapshots(market_info)
+        orders = self._get_fig_orders(market_info)
+        windows = {
+            selection_id: self._get_fig_window(market_info, market_records, selection_id, secs, orders)
+            for selection_id in selection_ids
+        }
+
         # feature and plot configurations
         plt_cfg = self.get_plot_config(plt_key)
         ftr_cfg = self.get_feature_config(ftr_key)
 
-        # generate plot by simulating features
-        features = ftrutils.FeatureHolder.generator(ftr_cfg)
-        data = features.simulate(
+        # use features stored by strategy if requested
+        data = {}
+        if self.config.plot_config.strategy_features:
+            stored = self._get_strategy_features(market_info)
+            data = {k: v for k, v in stored.items() if k in windows}
+            active_logger.info(f'using stored strategy features for {len(data)} runners')
+
+        # simulate features for remaining runners, using cached results where possible
+        kwargs = dict(
+            configs=ftr_cfg,
             hist_records=market_records,
-            selection_id=selection_id,
-            cmp_start=start,
-            cmp_end=end,
-            buffer_s=float(self.config.plot_config.cmp_buffer_secs)
+            windows={k: (v[1], v[2]) for k, v in windows.items() if k not in data},
+            buffer_s=float(self.config.plot_config.cmp_buffer_secs),
+            processes=self.config.plot_config.processes
         )
-
-        # generate figure and display
-        fig = figlib.FeatureFigure(
-            ftrs_data=data,
-            plot_cfg=plt_cfg,
-            title=title,
-            chart_start=start,
-            chart_end=end,
-            orders_df=orders
-        )
-        return features, fig.fig
+        if self.feature_cache:
+            data.update(self.feature_cache.simulate(market_id=market_info['market_id'], **kwargs))
+        else:
+            data.update(ftrutils.simulate_runners(**kwargs))
+
+        # generate figures
+        figs = {}
+        for selection_id, (title, start, end, runner_orders) in windows.items():
+            figs[selection_id] = figlib.FeatureFigure(
+                ftrs_data=data[selection_id],
+                plot_cfg=plt_cfg,
+                title=title,
+                chart_start=start,
+                chart_end=end,
+                orders_df=runner_orders
+            ).fig
+        return figs
 
     @property
     def filters_mkt(self):
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import bisect
 import operator
 from dataclasses import dataclass
 import logging
@@ -10,10 +11,11 @@ from flumine.order.trade import Trade
 
 import myutils.datetime
 import myutils.dictionaries
-from .ticks import LTICKS, LTICKS_DECODED, TICKS, TICKS_DECODED
-from myutils import general, timing
+from .ticks import LTICKS, LTICKS_DECODED, TICKS, TICKS_DECODED, N_TICKS, TICK_INDEX
+from myutils import timing
 from ..exceptions import BfProcessException
 from . import oddschecker as oc
+from .snapshot import BookSnapshot, RunnerSnapshot
 
 active_logger = logging.getLogger(__name__)
 active_logger.setLevel(logging.INFO)
@@ -45,14 +47,14 @@ class BfLadderPoint:
         """get ladder point instance with tick index"""
         # max decimal points is 2 for betfair prices
         price = round(price, 2)
-        if price not in LTICKS_DECODED:
+        if price not in TICK_INDEX:
             raise BfProcessException(f'failed to create ladder point at price {price}')
         if side != 'BACK' and side != 'LAY':
             raise BfProcessException(f'failed to create ladder point with side "{side}"')
         return BfLadderPoint(
             price=price,
             size=size,
-            tick_index=LTICKS_DECODED.index(price),
+            tick_index=TICK_INDEX[price],
             side=side
         )
 
@@ -110,9 +112,9 @@ def get_runner_spread(book_ex: RunnerBookEX) -> float:
     atb = book_ex.available_to_back
     atl = book_ex.available_to_lay
     if atb and atl:
-        if atb[0]['price'] in LTICKS_DECODED and atl[0]['price'] in LTICKS_DECODED:
-            return LTICKS_DECODED.index(atl[0]['price']) - LTICKS_DECODED.index(atb[0]['price'])
-    return len(LTICKS_DECODED)
+        if atb[0]['price'] in TICK_INDEX and atl[0]['price'] in TICK_INDEX:
+            return TICK_INDEX[atl[0]['price']] - TICK_INDEX[atb[0]['price']]
+    return N_TICKS
 
 
 def get_names(market, name_attr='name', name_key=False) -> Dict[int, str]:
@@ -133,13 +135,24 @@ def get_names(market, name_attr='name', name_key=False) -> Dict[int, str]:
         }
 
 
-def get_starting_odds(records: List[List[MarketBook]]) -> Dict:
-    """get a dictionary of {selection ID: starting odds} from last record where market is open"""
+def get_starting_odds(records: List[List[Union[MarketBook, BookSnapshot]]]) -> Dict:
+    """
+    get a dictionary of {selection ID: starting odds} from last record where market is open, records can be market
+    books or snapshots
+    """
     for i in reversed(range(len(records))):
-        if not records[i][0].market_definition.in_play and records[i][0].status == 'OPEN':
+        book = records[i][0]
+        if type(book) is BookSnapshot:
+            in_play = book.in_play
+        else:
+            in_play = book.market_definition.in_play
+        if not in_play and book.status == 'OPEN':
             runner_odds = {}
-            for runner in records[i][0].runners:
-                price = get_best_price(runner.ex.available_to_back)
+            for runner in book.runners:
+                if type(runner) is RunnerSnapshot:
+                    price = runner.best_back()
+                else:
+                    price = get_best_price(runner.ex.available_to_back)
                 if price is not None:
                     runner_odds[runner.selection_id] = price
             return runner_odds
@@ -152,9 +165,9 @@ def get_best_price(available: List, is_dict=True) -> float:
     return GETTER[is_dict](available[0], 'price') if available else None
 
 
-def get_ltps(market_book: MarketBook) -> Dict[int, float]:
+def get_ltps(market_book: Union[MarketBook, BookSnapshot]) -> Dict[int, float]:
     """get dictionary of runner ID to last traded price if last traded price is not 0 (or None), sorting with
-    shortest LTP first"""
+    shortest LTP first (accepts market book or snapshot)"""
     return myutils.dictionaries.dict_sort({
         r.selection_id: r.last_price_traded
         for r in market_book.runners if r.last_price_traded
@@ -244,18 +257,60 @@ def side_invert(side: str) -> str:
         raise BfProcessException(f'side "{side}" not recognised')
 
 
+def tick_index(value: float, round_down=False, round_up=False) -> int:
+    """
+    get index of closest odds tick to value, looking up tick values in `TICK_INDEX` and searching the sorted tick list
+    for values between ticks - specify `round_down`/`round_up` to get the tick below/above the value when between ticks
+
+    values outside the ladder are clamped to the bottom/top tick, including infinity which maps to the top tick (unlike
+    `myutils.general.closest_value()` which gives the bottom tick for infinity), NaN gives the bottom tick
+    """
+    index = TICK_INDEX.get(value)
+    if index is not None:
+        return index
+    # ticks either side of value, where nearest is lower on a tie
+    index = bisect.bisect_left(LTICKS_DECODED, value)
+    if index >= N_TICKS:
+        index = N_TICKS - 1
+    elif index > 0 and value - LTICKS_DECODED[index - 1] <= LTICKS_DECODED[index] - value:
+        index -= 1
+    if round_down and index > 0 and LTICKS_DECODED[index] > value:
+        index -= 1
+    if round_up and index < N_TICKS - 1 and LTICKS_DECODED[index] < value:
+        index += 1
+    return index
+
+
+def tick_clamp(index: int) -> int:
+    """clamp tick index to bounds of tick ladder"""
+    return min(max(index, 0), N_TICKS - 1)
+
+
+def tick_offset(value: float, n_ticks: int) -> float:
+    """get odds `n_ticks` from closest tick to value (negative for lower odds), limited to bounds of tick ladder"""
+    return LTICKS_DECODED[tick_clamp(tick_index(value) + n_ticks)]
+
+
+def side_tick_offset(value: float, n_ticks: int, side: str) -> float:
+    """
+    get odds `n_ticks` from closest tick to value away from the opposite side of the book for an order on `side`, i.e.
+    lower odds for 'BACK' and higher odds for 'LAY', limited to bounds of tick ladder
+    """
+    if side == 'BACK':
+        return tick_offset(value, -n_ticks)
+    elif side == 'LAY':
+        return tick_offset(value, n_ticks)
+    else:
+        raise BfProcessException(f'side "{side}" not recognised')
+
+
 def closest_tick(value: float, return_index=False, round_down=False, round_up=False):
     """
     Convert an value to the nearest odds tick, e.g. 2.10000001 would be converted to 2.1
     Specify return_index=True to get index instead of value
     """
-    return general.closest_value(
-        TICKS_DECODED,
-        value,
-        return_index=return_index,
-        round_down=round_down,
-        round_up=round_up
-    )
+    index = tick_index(value, round_down=round_down, round_up=round_up)
+    return index if return_index else LTICKS_DECODED[index]
 
 
 def tick_spread(value_0: float, value_1: float, check_values: bool) -> int:
@@ -267,23 +322,25 @@ def tick_spread(value_0: float, value_1: float, check_values: bool) -> int:
     """
     if check_values:
         # check that both values are valid odds
-        if value_0 in LTICKS_DECODED and value_1 in LTICKS_DECODED:
+        if value_0 in TICK_INDEX and value_1 in TICK_INDEX:
             # get tick spread
-            return abs(LTICKS_DECODED.index(value_0) - LTICKS_DECODED.index(value_1))
+            return abs(TICK_INDEX[value_0] - TICK_INDEX[value_1])
         else:
             # both values are not valid odds
             return 0
     else:
         # dont check values are valid odds, just use closet odds values
-        return abs(closest_tick(value_0, return_index=True) - closest_tick(value_1, return_index=True))
+        return abs(tick_index(value_0) - tick_index(value_1))
 
 
-def traded_runner_vol(runner: RunnerBook, is_dict=True):
+def traded_runner_vol(runner: Union[RunnerBook, RunnerSnapshot], is_dict=True):
     """Get runner traded volume across all prices"""
+    if type(runner) is RunnerSnapshot:
+        return runner.traded_volume()
     return sum(e['size'] if is_dict else e.size for e in runner.ex.traded_volume)
 
 
-def total_traded_vol(record: MarketBook):
+def total_traded_vol(record: Union[MarketBook, BookSnapshot]):
     """Get traded volume across all runners at all prices"""
     return sum(traded_runner_vol(runner) for runner in record.runners)
 
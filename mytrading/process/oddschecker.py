@@ -1,45 +1,54 @@
+import queue
+import threading
+from functools import lru_cache
+from html import unescape
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
 import re
 import yaml
-from typing import Dict, List
+from typing import Dict, List, Optional, Any, Tuple
 from ..exceptions import OCException
 
 
 oc_logger = logging.getLogger('')
 OC_EXCHANGES = ['BF', 'MK', 'MA', 'BD', 'BQ']
+OC_URL = 'https://oddschecker.com'
+OC_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'
+}
+_RE_NON_ALPHA = re.compile('[^a-zA-Z]')
+# tag attributes, where quoted attribute values can contain '>' (unrolled so unquoted text is matched in runs)
+_TAG_ATTRS = r'([^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*)'
+_RE_TABLE = re.compile(r'<table\b' + _TAG_ATTRS + '>', re.IGNORECASE)
+_RE_TAG = re.compile(r'<(/?)(table|tbody|tr|td)\b' + _TAG_ATTRS + '>', re.IGNORECASE)
+_RE_ATTR = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
 
 
+@lru_cache(maxsize=4096)
 def name_processor(name):
     """remove all characters not in alphabet and convert to lower case"""
-    return re.sub('[^a-zA-Z]', '', name).lower()
+    return _RE_NON_ALPHA.sub('', name).lower()
 
 
-def _validate_names(names: List):
-    l1 = len(names)
-    l2 = len(set(name_processor(nm) for nm in names))
-    if l1 != l2:
+def _validate_names(names: List) -> List[str]:
+    """get processed names, checking there are no duplicates once processed"""
+    processed = [name_processor(nm) for nm in names]
+    if len(set(processed)) != len(processed):
         raise OCException(f'processed names have duplicated, original:\n{yaml.dump(names)}')
+    return processed
 
 
 def convert_names(odds: Dict, names: Dict) -> Dict:
-    _validate_names(list(names.values()))
-    _validate_names(list(odds.keys()))
     # process names and invert from (ID: name) to (processed name: ID)
-    prc_names = {
-        name_processor(v): k
-        for k, v in names.items()
-    }
+    prc_names = dict(zip(_validate_names(list(names.values())), names.keys()))
     # convert from (OC name: OC odds dict) to (ID: OC odds dict)
     prc_odds = {}
-    for nm, v in odds.items():
-        prc_nm = name_processor(nm)
-        if prc_nm not in prc_names.keys():
+    for prc_nm, v in zip(_validate_names(list(odds.keys())), odds.values()):
+        if prc_nm not in prc_names:
             raise OCException(f'processed name "{prc_nm}" not found in name list')
-        _id = prc_names[prc_nm]
-        prc_odds[_id] = v
+        prc_odds[prc_names[prc_nm]] = v
     return prc_odds
 
 
@@ -47,7 +56,7 @@ def tr_odds(tr):
     """get dictionary of (bookmaker: odds) from table row"""
     backs = {}
     for td in tr.find_all('td'):
-        if 'data-bk' and 'data-odig' in td.attrs:
+        if 'data-bk' in td.attrs and 'data-odig' in td.attrs:
             odds = td.attrs['data-odig']
             try:
                 odds = float(odds)
@@ -82,7 +91,7 @@ gh_venues = {
 }
 
 
-def oc_url(sport, dt: datetime, venue, odds_type='winner'):
+def oc_url(sport, dt: datetime, venue, odds_type='winner', base_url=OC_URL):
     """construct oddschecker url (datetime must be in UK localised with daylight savings form)"""
 
     # get date and time strings (as oddschecker constructs them)
@@ -97,18 +106,96 @@ def oc_url(sport, dt: datetime, venue, odds_type='winner'):
     # convert to oddschecker venue name
     venue = _venue_map.get(name_processor(venue)) or venue
 
-    return f'https://oddschecker.com/{sport}/{_date}-{venue}/{_time}/{odds_type}'
+    return f'{base_url}/{sport}/{_date}-{venue}/{_time}/{odds_type}'
 
 
-def oc(url) -> Dict:
+def oc_html(url, session: Optional[requests.Session] = None, timeout: Optional[float] = None) -> str:
+    """request oddschecker page html, using `session` if specified to re-use connections"""
     oc_logger.info(f'requesting oddschecker url "{url}"')
-
-    resp = requests.get(url, headers={
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'
-    })
+    try:
+        resp = (session or requests).get(url, headers=OC_HEADERS, timeout=timeout)
+    except requests.RequestException as e:
+        raise OCException(f'error requesting url: {e}')
     if not resp.ok:
         raise OCException(f'error requesting url, code {resp.status_code}')
-    soup = BeautifulSoup(resp.text, "html.parser")
+    return resp.text
+
+
+def _tag_attrs(attrs: str) -> Dict[str, str]:
+    """get (name: value) of attributes in html tag attributes string, values are not unescaped"""
+    return {m[0].lower(): m[1] or m[2] or m[3] for m in _RE_ATTR.findall(attrs)}
+
+
+def _event_table_start(html: str) -> Optional[int]:
+    """get index in page html of first table tag with class "eventTable", None if not found"""
+    for m in _RE_TABLE.finditer(html):
+        if 'eventTable' in _tag_attrs(m[1]).get('class', '').split():
+            return m.start()
+    return None
+
+
+def oc_parse(html: str) -> Dict:
+    """
+    get dictionary of (runner name: (bookmaker: odds)) from oddschecker page html
+
+    rather than parsing the whole page, the page is scanned from the start of the "eventTable" table until the end of
+    its first body, only reading attributes of the table, body, row and cell tags of the table (nested tables are
+    ignored)
+    """
+    start = _event_table_start(html)
+    if start is None:
+        raise OCException(f'could not find table element')
+
+    odds = {}
+    depth = 0
+    in_body = found_body = False
+    row: Optional[Dict[str, float]] = None
+    for tag in _RE_TAG.finditer(html, start):
+        closing, name, attrs = tag.groups()
+        name = name.lower()
+        if name == 'table':
+            depth += -1 if closing else 1
+            if not depth:
+                break
+        elif depth != 1:
+            continue
+        elif name == 'tbody':
+            # only rows of the first body are read
+            if closing:
+                if in_body:
+                    break
+            else:
+                in_body = found_body = True
+            row = None
+        elif name == 'tr':
+            row = None
+            if in_body and not closing:
+                bname = _tag_attrs(attrs).get('data-bname')
+                if bname is not None:
+                    bname = unescape(bname)
+                    oc_logger.debug(f'new name "{bname}" found')
+                    row = odds[bname] = {}
+        elif name == 'td' and row is not None and not closing and 'data-odig' in attrs:
+            td = _tag_attrs(attrs)
+            bk = td.get('data-bk')
+            if bk is not None and 'data-odig' in td:
+                try:
+                    value = float(td['data-odig'])
+                    if value:
+                        row[unescape(bk)] = value
+                except ValueError:
+                    pass
+
+    if not found_body:
+        raise OCException(f'table does not have "tbody" element')
+    oc_logger.debug(f'found {len(odds)} runners in table')
+    return odds
+
+
+def oc_parse_soup(html: str) -> Dict:
+    """get dictionary of (runner name: (bookmaker: odds)) from oddschecker page html, parsing the whole page with
+    BeautifulSoup"""
+    soup = BeautifulSoup(html, "html.parser")
 
     table = soup.find("table", {"class": "eventTable"})
     if not table:
@@ -121,3 +208,54 @@ def oc(url) -> Dict:
     oc_logger.debug(f'found {len(trs)} "tr" elements in table')
     return table_odds(table.tbody)
 
+
+def oc(url, session: Optional[requests.Session] = None, timeout: Optional[float] = None) -> Dict:
+    """request oddschecker page and get dictionary of (runner name: (bookmaker: odds))"""
+    return oc_parse(oc_html(url, session, timeout))
+
+
+class OCFetcher:
+    """
+    fetch oddschecker odds on a background thread so that requests do not block the caller, using a connection pooled
+    session
+
+    requests are made with `submit()` and processed in order, and results are put on the `results` queue as tuples of
+    (key, odds, error) - where odds are converted from runner names to IDs if names are passed on submit, and on
+    failure odds are None and error is the exception
+    """
+    def __init__(self, timeout: float = 10, session: Optional[requests.Session] = None):
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.results: queue.Queue[Tuple[Any, Optional[Dict], Optional[Exception]]] = queue.Queue()
+        self._requests = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            key, url, names = item
+            try:
+                odds = oc(url, self.session, self.timeout)
+                if names is not None:
+                    odds = convert_names(odds, names)
+                self.results.put((key, odds, None))
+            except Exception as e:
+                # any error is passed back to caller rather than stopping worker
+                self.results.put((key, None, e))
+
+    def submit(self, key: Any, url: str, names: Optional[Dict] = None) -> None:
+        """request odds from `url` to be put on results queue with `key`, converted to runner IDs if (ID: name) passed"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='oc-fetcher', daemon=True)
+            self._thread.start()
+        self._requests.put((key, url, names))
+
+    def stop(self) -> None:
+        """stop worker thread once pending requests have been processed"""
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join()
+            self._thread = None
+
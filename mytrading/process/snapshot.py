@@ -0,0 +1,277 @@
+"""
+Lightweight per-update ladder snapshots of market books, holding price/size ladders as numpy arrays
+
+Snapshots can be created from `betfairlightweight` MarketBook objects, or directly from the stream cache (using a
+lightweight listener) to avoid building full MarketBook objects
+
+In a flumine framework the MarketBook is still built by flumine for every update, the strategy path only avoids
+re-converting runners whose stream cache entries have not changed since the previous book (see `market_snapshot()`)
+"""
+from __future__ import annotations
+import queue
+import sys
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Union, Tuple, Callable, Any
+
+import numpy as np
+from betfairlightweight import StreamListener
+from betfairlightweight.resources import MarketBook, RunnerBook
+from betfairlightweight.resources.baseresource import BaseResource
+from flumine.markets.market import Market
+
+from myutils.betfair import BufferStream
+
+
+_EMPTY = np.empty(0, dtype=float)
+
+# market context key of values computed from the latest market book, shared by strategies in the same framework
+SHARED_CONTEXT_KEY = 'shared_book'
+
+# market context key of (stream cache runner dict, runner snapshot) pairs from the previous book
+RUNNERS_CONTEXT_KEY = 'snapshot_runners'
+
+
+@lru_cache(maxsize=256)
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    # market definition datetimes repeat on every book so cache parsed values
+    return BaseResource.strip_datetime(value) if value else None
+
+
+def _ladder_arrays(ladder: List) -> Tuple[np.ndarray, np.ndarray]:
+    """convert ladder of price/sizes (as dicts or PriceSize objects) to arrays of prices and sizes"""
+    if not ladder:
+        return _EMPTY, _EMPTY
+    if type(ladder[0]) is dict:
+        prices = [x['price'] for x in ladder]
+        sizes = [x['size'] for x in ladder]
+    else:
+        prices = [x.price for x in ladder]
+        sizes = [x.size for x in ladder]
+    return np.array(prices, dtype=float), np.array(sizes, dtype=float)
+
+
+def ladder_dicts(prices: np.ndarray, sizes: np.ndarray) -> List[dict]:
+    """convert arrays of prices and sizes to ladder list of dicts with 'price' and 'size'"""
+    return [{'price': p, 'size': s} for p, s in zip(prices.tolist(), sizes.tolist())]
+
+
+def tv_diff(
+        prices_1: np.ndarray,
+        sizes_1: np.ndarray,
+        prices_0: np.ndarray,
+        sizes_0: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    get difference between traded volume ladders, as per `get_record_tv_diff()`, for ladders as arrays - returns
+    prices and sizes where the size at a price in ladder 1 differs from ladder 0
+    """
+    if not len(prices_0):
+        mask = sizes_1 != 0
+        return prices_1[mask], sizes_1[mask]
+    order = np.argsort(prices_0, kind='stable')
+    prices_0 = prices_0[order]
+    sizes_0 = sizes_0[order]
+    idx = np.searchsorted(prices_0, prices_1)
+    idx_clipped = np.minimum(idx, len(prices_0) - 1)
+    matched = (idx < len(prices_0)) & (prices_0[idx_clipped] == prices_1)
+    diff = sizes_1 - np.where(matched, sizes_0[idx_clipped], 0)
+    mask = diff != 0
+    return prices_1[mask], diff[mask]
+
+
+class RunnerSnapshot:
+    """runner ladders as arrays of prices and sizes, with best price first for back/lay"""
+    __slots__ = [
+        'selection_id',
+        'status',
+        'last_price_traded',
+        'total_matched',
+        'back_prices',
+        'back_sizes',
+        'lay_prices',
+        'lay_sizes',
+        'tv_prices',
+        'tv_sizes',
+    ]
+
+    def __init__(
+            self,
+            selection_id: int,
+            status: Optional[str],
+            last_price_traded: Optional[float],
+            total_matched: Optional[float],
+            back: Tuple[np.ndarray, np.ndarray],
+            lay: Tuple[np.ndarray, np.ndarray],
+            tv: Tuple[np.ndarray, np.ndarray],
+    ):
+        self.selection_id = selection_id
+        self.status = status
+        self.last_price_traded = last_price_traded
+        self.total_matched = total_matched
+        self.back_prices, self.back_sizes = back
+        self.lay_prices, self.lay_sizes = lay
+        self.tv_prices, self.tv_sizes = tv
+
+    @classmethod
+    def from_runner_book(cls, runner: RunnerBook) -> RunnerSnapshot:
+        return cls(
+            selection_id=runner.selection_id,
+            status=runner.status,
+            last_price_traded=runner.last_price_traded,
+            total_matched=runner.total_matched,
+            back=_ladder_arrays(runner.ex.available_to_back),
+            lay=_ladder_arrays(runner.ex.available_to_lay),
+            tv=_ladder_arrays(runner.ex.traded_volume),
+        )
+
+    @classmethod
+    def from_dict(cls, runner: dict) -> RunnerSnapshot:
+        ex = runner.get('ex') or {}
+        return cls(
+            selection_id=runner['selectionId'],
+            status=runner.get('status'),
+            last_price_traded=runner.get('lastPriceTraded'),
+            total_matched=runner.get('totalMatched'),
+            back=_ladder_arrays(ex.get('availableToBack')),
+            lay=_ladder_arrays(ex.get('availableToLay')),
+            tv=_ladder_arrays(ex.get('tradedVolume')),
+        )
+
+    def best_back(self) -> Optional[float]:
+        """best available back price, None if empty"""
+        return self.back_prices[0].item() if len(self.back_prices) else None
+
+    def best_lay(self) -> Optional[float]:
+        """best available lay price, None if empty"""
+        return self.lay_prices[0].item() if len(self.lay_prices) else None
+
+    def traded_volume(self) -> float:
+        """total traded volume across all prices"""
+        return self.tv_sizes.sum().item()
+
+
+class BookSnapshot:
+    """market book snapshot with runners as `RunnerSnapshot` instances"""
+    __slots__ = [
+        'market_id',
+        'publish_time',
+        'market_time',
+        'status',
+        'in_play',
+        'runners',
+    ]
+
+    def __init__(
+            self,
+            market_id: str,
+            publish_time: datetime,
+            market_time: Optional[datetime],
+            status: Optional[str],
+            in_play: Optional[bool],
+            runners: List[RunnerSnapshot]
+    ):
+        self.market_id = market_id
+        self.publish_time = publish_time
+        self.market_time = market_time
+        self.status = status
+        self.in_play = in_play
+        self.runners = runners
+
+    @classmethod
+    def from_market_book(cls, market_book: MarketBook) -> BookSnapshot:
+        return cls(
+            market_id=market_book.market_id,
+            publish_time=market_book.publish_time,
+            market_time=market_book.market_definition.market_time if market_book.market_definition else None,
+            status=market_book.status,
+            in_play=market_book.inplay,
+            runners=[RunnerSnapshot.from_runner_book(r) for r in market_book.runners]
+        )
+
+    @classmethod
+    def from_dict(cls, market_book: dict) -> BookSnapshot:
+        """create from lightweight (dictionary) market book"""
+        return cls(
+            market_id=market_book['marketId'],
+            publish_time=datetime.utcfromtimestamp(market_book['publishTime'] / 1e3),
+            market_time=_parse_datetime((market_book.get('marketDefinition') or {}).get('marketTime')),
+            status=market_book.get('status'),
+            in_play=market_book.get('inplay'),
+            runners=[RunnerSnapshot.from_dict(r) for r in market_book['runners']]
+        )
+
+
+def as_snapshot(book: Union[MarketBook, BookSnapshot]) -> BookSnapshot:
+    """convert market book to snapshot, or return as is if already a snapshot"""
+    if type(book) is BookSnapshot:
+        return book
+    return BookSnapshot.from_market_book(book)
+
+
+def shared_book_value(market: Market, market_book: MarketBook, key: str, func: Callable[[MarketBook], Any]) -> Any:
+    """
+    get value `key` computed from market book by `func`, computing once per market book and storing in market context
+    so that all strategies processing the same book in a framework share the value - values from previous books are
+    discarded when a new book is received
+    """
+    shared = market.context.get(SHARED_CONTEXT_KEY)
+    if shared is None or shared[0] is not market_book:
+        shared = market.context[SHARED_CONTEXT_KEY] = (market_book, dict())
+    values = shared[1]
+    if key not in values:
+        values[key] = func(market_book)
+    return values[key]
+
+
+def _stream_snapshot(market: Market, market_book: MarketBook) -> BookSnapshot:
+    """
+    create snapshot of market book, re-using runner snapshots from the previous book where the runner's stream cache
+    dict is unchanged - the `betfairlightweight` stream cache only re-serialises runners that have updated, so unchanged
+    runners in consecutive market books share the same `_data['runners']` dict object
+    """
+    runner_dicts = market_book._data.get('runners')
+    if not runner_dicts or len(runner_dicts) != len(market_book.runners):
+        market.context.pop(RUNNERS_CONTEXT_KEY, None)
+        return BookSnapshot.from_market_book(market_book)
+    previous = market.context.get(RUNNERS_CONTEXT_KEY) or []
+    runners = []
+    for i, runner_dict in enumerate(runner_dicts):
+        if i < len(previous) and previous[i][0] is runner_dict:
+            runners.append(previous[i][1])
+        else:
+            runners.append(RunnerSnapshot.from_dict(runner_dict))
+    # keep references to runner dicts so their identities cannot be re-used by new objects
+    market.context[RUNNERS_CONTEXT_KEY] = list(zip(runner_dicts, runners))
+    return BookSnapshot(
+        market_id=market_book.market_id,
+        publish_time=market_book.publish_time,
+        market_time=market_book.market_definition.market_time if market_book.market_definition else None,
+        status=market_book.status,
+        in_play=market_book.inplay,
+        runners=runners
+    )
+
+
+def market_snapshot(market: Market, market_book: MarketBook) -> BookSnapshot:
+    """
+    get snapshot of market book, shared by all strategies processing the book (see `shared_book_value()`) - runner
+    snapshots are re-used from the previous book for runners that have not updated
+    """
+    return shared_book_value(market, market_book, 'snapshot', lambda b: _stream_snapshot(market, b))
+
+
+def snapshots_from_buffer(buffer: str) -> List[List[BookSnapshot]]:
+    """
+    read market stream buffer directly to snapshots using a lightweight listener, in the same list of lists structure
+    as the output queue of a non lightweight listener
+    """
+    q = queue.Queue()
+    listener = StreamListener(
+        output_queue=q,
+        max_latency=sys.float_info.max,
+        lightweight=True
+    )
+    streamer = BufferStream.generator(buffer, listener)
+    streamer.start()
+    return [[BookSnapshot.from_dict(b) for b in books] for books in q.queue]
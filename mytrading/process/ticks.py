@@ -52,4 +52,8 @@ TICKS_DECODED: np.ndarray = int_decode(TICKS)
 # list of Betfair ticks in actual floating values
 LTICKS_DECODED = TICKS_DECODED.tolist()
 
+# number of Betfair ticks
+N_TICKS = len(LTICKS_DECODED)
 
+# index in `LTICKS_DECODED` of each Betfair tick value
+TICK_INDEX = {v: i for i, v in enumerate(LTICKS_DECODED)}
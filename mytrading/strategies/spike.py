@@ -14,14 +14,14 @@ from flumine.order.ordertype import LimitOrder, OrderTypes
 from functools import partial
 
 from ..configs import feature_configs_spike
-from ..process import closest_tick, tick_spread, LTICKS_DECODED
+from ..process import tick_index, tick_clamp, tick_spread, LTICKS_DECODED
 from mytrading.strategy.messages import register_formatter, MessageTypes as BaseMessageTypes
 from ..strategy.runnerhandler import RunnerHandler
 from ..strategy import tradestates as basestates
 from ..strategy.trademachine import RunnerTradeMachine
 from ..strategy.strategy import MyFeatureStrategy
 from ..strategy.feature import FeatureHolder
-from ..strategy.tradetracker import TradeTracker
+from ..strategy.tradetracker import TradeTracker, UpdateWriter
 from ..strategy import strategies_reg
 from ..process import get_ltps
 
@@ -87,7 +87,21 @@ class SpikeRunnerHandler(RunnerHandler):
 
         self.first_runner: bool = False
         self.spike_data = SpikeData()
-        
+
+    def update_spike_data(self):
+        """
+        read feature values into spike data - called from trade states only when values are needed so that lazily
+        evaluated features are not computed for runners that are not traded
+        """
+        dif = self.features['tvlad'].sub_features['dif']
+        self.spike_data.ltp_max = dif.sub_features['max'].last_value()
+        self.spike_data.ltp_min = dif.sub_features['min'].last_value()
+        self.spike_data.ltp_tick_spread = dif.sub_features['spread'].last_value()
+        self.spike_data.spread = self.features['spread'].sub_features['smp'].sub_features['avg'].last_value()
+        self.spike_data.ltp = self.features['ltp'].last_value()
+        self.spike_data.best_back = self.features['best back'].last_value()
+        self.spike_data.best_lay = self.features['best lay'].last_value()
+
 
 @strategies_reg.register_element
 class MySpikeStrategy(MyFeatureStrategy):
@@ -143,7 +157,8 @@ class MySpikeStrategy(MyFeatureStrategy):
             feature_holder: FeatureHolder,
             update_path: str,
             trade_machine: RunnerTradeMachine,
-            market_id: str
+            market_id: str,
+            update_writer: Optional[UpdateWriter] = None
     ) -> RunnerHandler:
         """create runner handler instance on new runner"""
         return SpikeRunnerHandler(
@@ -152,7 +167,8 @@ class MySpikeStrategy(MyFeatureStrategy):
                 selection_id=runner_book.selection_id,
                 strategy=self,
                 market_id=market_id,
-                file_path=update_path
+                file_path=update_path,
+                writer=update_writer
             ),
             trade_machine=trade_machine,
             features=feature_holder
@@ -225,14 +241,7 @@ class MySpikeStrategy(MyFeatureStrategy):
         rh: SpikeRunnerHandler = self.market_handlers[mkt.market_id].runner_handlers[rbk.selection_id]
         # get ID for shortest runner from LTPs
         ltps = get_ltps(mbk)
-        rh.spike_data.ltp_max = rh.features['tvlad'].sub_features['dif'].sub_features['max'].last_value()
-        rh.spike_data.ltp_min = rh.features['tvlad'].sub_features['dif'].sub_features['min'].last_value()
-        rh.spike_data.ltp_tick_spread = rh.features['tvlad'].sub_features['dif'].sub_features['spread'].last_value()
-        rh.spike_data.spread = rh.features['spread'].sub_features['smp'].sub_features['avg'].last_value()
-        rh.spike_data.ltp = rh.features['ltp'].last_value()
-        rh.spike_data.best_back = rh.features['best back'].last_value()
-        rh.spike_data.best_lay = rh.features['best lay'].last_value()
-        rh.first_runner = next(iter(ltps.keys()), 0)
+        rh.first_runner = next(iter(ltps.keys()), None) == rbk.selection_id
         rh.trade_machine.run(market=mkt, runner_index=runner_index, runner_handler=rh)
 
 
@@ -257,6 +266,7 @@ class SpikeTradeStateIdle(basestates.TradeStateIdle):
         if not runner_handler.first_runner:
             return False
 
+        runner_handler.update_spike_data()
         if not spike_data.validate_spike_data():
             return False
 
@@ -397,7 +407,7 @@ class SpikeTradeStateMonitorWindows(basestates.TradeStateBase):
 
         if breach:
             # record tick difference
-            ltp_tick = closest_tick(spike_data.ltp, return_index=True)
+            ltp_tick = tick_index(spike_data.ltp)
             tick_diff = ltp_tick - old_tick if old_tick else -1
 
             trade_tracker.log_update(
@@ -434,6 +444,7 @@ class SpikeTradeStateMonitorWindows(basestates.TradeStateBase):
             return False
 
     def run(self, market: Market, runner_index: int, runner_handler: SpikeRunnerHandler):
+        runner_handler.update_spike_data()
         spike_data = runner_handler.spike_data
         trade_tracker = runner_handler.trade_tracker
         market_book = market.market_book
@@ -452,13 +463,13 @@ class SpikeTradeStateMonitorWindows(basestates.TradeStateBase):
 
         # compute max/min boundary values
         boundary_top_value = max(spike_data.ltp, spike_data.best_back, spike_data.best_lay)  # max of back/lay/ltp
-        boundary_top_tick = closest_tick(boundary_top_value, return_index=True)
-        top_tick = min(len(LTICKS_DECODED) - 1, boundary_top_tick + self.tick_offset)
+        boundary_top_tick = tick_index(boundary_top_value)
+        top_tick = tick_clamp(boundary_top_tick + self.tick_offset)
         top_value = LTICKS_DECODED[top_tick]  # top of window with margin
 
         boundary_bottom_value = min(spike_data.ltp, spike_data.best_back, spike_data.best_lay)  # min of back/lay/ltp
-        boundary_bottom_tick = closest_tick(boundary_bottom_value, return_index=True)
-        bottom_tick = max(0, boundary_bottom_tick - self.tick_offset)
+        boundary_bottom_tick = tick_index(boundary_bottom_value)
+        bottom_tick = tick_clamp(boundary_bottom_tick - self.tick_offset)
         bottom_value = LTICKS_DECODED[bottom_tick]  # bottom of window with margin
 
         # check if breached window
@@ -1,13 +1,25 @@
-from typing import Dict
+from typing import Dict, List, Optional, Type, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+import itertools
+import json
+import math
+from os import path
+import uuid
 import yaml
 import logging
 from myutils import registrar as myreg
 from myutils import dictionaries
 from uuid import UUID
 from ..exceptions import MyStrategyException
-from ..utils import BettingDB
+from ..utils import BettingDB, APIHandler
+from ..process.snapshot import snapshots_from_buffer
 from .strategy import BackTestClientNoMin, MyFeatureStrategy
+from .feature import FeatureCache, precompute_features
 from flumine import FlumineBacktest, clients, Flumine
+from flumine.events import events
+from flumine.worker import BackgroundWorker
 from betfairlightweight.filters import streaming_market_filter, streaming_market_data_filter
 from betfairlightweight import APIClient
 
@@ -28,6 +40,26 @@ STRATEGY_CONFIG_SPEC = {
 }
 
 
+LIVE_STRATEGY_CONFIG_SPEC = {
+    'name': {
+        'type': str,
+    },
+    'info': {
+        'type': dict,
+    },
+    'catalogue_filter': {
+        'type': dict,
+    },
+    'market_data_filter': {
+        'type': dict,
+        'optional': True,
+    }
+}
+
+# streaming market data fields used by feature processing
+LIVE_MARKET_DATA_FIELDS = ['EX_ALL_OFFERS', 'EX_TRADED', 'EX_TRADED_VOL', 'EX_LTP', 'EX_MARKET_DEF']
+
+
 def hist_strat_create(cfg: Dict, db: BettingDB) -> MyFeatureStrategy:
     dictionaries.validate_config(cfg, STRATEGY_CONFIG_SPEC)
     nm = cfg['name']
@@ -55,4 +87,308 @@ def hist_strat_run(strategy_obj: MyFeatureStrategy):
     framework.run()
 
 
+def _hist_strat_worker(strategy_cls: Type[MyFeatureStrategy], kwargs: Dict, paths: List[str]) -> int:
+    """run historic strategy over a subset of market stream files in a worker process, return number of markets"""
+    kwargs = kwargs | {
+        'market_filter': {
+            'markets': paths
+        }
+    }
+    hist_strat_run(strategy_cls(**kwargs))
+    return len(paths)
+
+
+def hist_strat_run_parallel(
+        cfg: Dict,
+        db: BettingDB,
+        processes: int,
+        chunk_size: Optional[int] = None,
+        limit: Optional[int] = None
+) -> uuid.UUID:
+    """
+    run historic strategy from configuration over markets matching filter specification, with markets split into
+    chunks across `processes` worker processes
+
+    each chunk is run with its own flumine backtest framework and strategy instance, where all strategy instances share
+    the same strategy ID so that per market strategy updates are written to the same strategy in the cache. Market
+    stream paths are read from the database in pages, with no cap on the number of markets unless `limit` is specified
+
+    `chunk_size` is the number of markets per worker task, defaulting to splitting markets into 4 chunks per process
+
+    returns strategy ID
+    """
+    dictionaries.validate_config(cfg, STRATEGY_CONFIG_SPEC)
+    nm = cfg['name']
+    if nm not in strategies_reg:
+        raise MyStrategyException(f'strategy "{nm}" not found in registrar')
+    strategy_cls = strategies_reg[nm]
+    paths = db.paths_market_updates(filter_spec=cfg['market_filter_spec'], limit=limit)
+    if not paths:
+        raise MyStrategyException(f'no markets found for strategy "{nm}"')
+
+    strategy_id = uuid.uuid4()
+    kwargs = cfg['info'] | {
+        'historic': True,
+        'strategy_id': str(strategy_id),
+    }
+    db.write_strat_info(
+        strategy_id=strategy_id,
+        type='simulated',
+        name=strategy_cls.__name__,
+        exec_time=datetime.utcnow(),
+        info=kwargs | {
+            'market_filter': {
+                'markets': paths
+            }
+        },
+    )
+    processes = max(processes, 1)
+    chunk_size = chunk_size or math.ceil(len(paths) / (processes * 4))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    active_logger.info(f'running strategy "{nm}" with ID "{strategy_id}" over {len(paths)} markets in {len(chunks)} '
+                       f'chunks across {processes} processes, with args:\n'
+                       f'{yaml.dump(kwargs, sort_keys=False)}')
+
+    n_done = 0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_hist_strat_worker, strategy_cls, kwargs, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            n_done += future.result()
+            active_logger.info(f'completed {n_done}/{len(paths)} markets for strategy "{strategy_id}"')
+    return strategy_id
+
+
+def _precompute_worker(cache: FeatureCache, configs: dict, feature_seconds: float, update_path: str) -> None:
+    """precompute features for all runners in a market stream file and store in cache, if not already cached"""
+    with open(update_path) as f:
+        buffer = f.read()
+    # get market ID from first stream update to check cache before processing stream
+    market_id = json.loads(buffer.split('\n', 1)[0])['mc'][0]['id']
+    key = cache.market_key(market_id, configs, feature_seconds)
+    if cache.get(key) is None:
+        # entries are evicted once all markets have been precomputed rather than by each worker
+        cache.put(key, precompute_features(configs, snapshots_from_buffer(buffer), feature_seconds), evict=False)
+
+
+def hist_strat_sweep(
+        cfg: Dict,
+        db: BettingDB,
+        grid: Dict[str, List[Any]],
+        processes: int,
+        chunk_size: Optional[int] = None,
+        limit: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    run historic strategy from configuration for every combination of strategy arguments in `grid`, a dictionary of
+    (strategy argument name => list of values), over markets matching filter specification
+
+    features only depend on the strategy feature configuration, so features are precomputed once per market for each
+    distinct value of "features_kwargs" and "feature_seconds" and stored in a feature cache. Each combination is then
+    run as a separate strategy (with its own strategy meta entry) replaying the precomputed features, so only the trade
+    state machines and order simulation are run per combination. Strategies must have a `features_config` attribute
+
+    precomputation and combinations are split across `processes` worker processes, with `chunk_size` markets per
+    combination task as per `hist_strat_run_parallel()`
+
+    returns dictionary of (strategy ID => combination of arguments)
+    """
+    dictionaries.validate_config(cfg, STRATEGY_CONFIG_SPEC)
+    nm = cfg['name']
+    if nm not in strategies_reg:
+        raise MyStrategyException(f'strategy "{nm}" not found in registrar')
+    strategy_cls = strategies_reg[nm]
+    if not grid or not all(type(v) is list and v for v in grid.values()):
+        raise MyStrategyException(f'sweep grid must be a dictionary of non-empty lists: "{grid}"')
+    paths = db.paths_market_updates(filter_spec=cfg['market_filter_spec'], limit=limit)
+    if not paths:
+        raise MyStrategyException(f'no markets found for strategy "{nm}"')
+
+    combinations = [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+    combination_kwargs = [cfg['info'] | combination | {'historic': True} for combination in combinations]
+
+    # group combinations by feature arguments, create a strategy for each group to get its feature configuration
+    groups: Dict[str, Dict[str, Any]] = {}
+    combination_groups = []
+    for kwargs in combination_kwargs:
+        group_key = json.dumps({
+            'features_kwargs': kwargs.get('features_kwargs'),
+            'feature_seconds': kwargs.get('feature_seconds')
+        }, sort_keys=True, default=str)
+        if group_key not in groups:
+            try:
+                strategy_obj = strategy_cls(**kwargs, market_filter={'markets': paths})
+            except TypeError as e:
+                raise MyStrategyException(f'could not create strategy "{nm}": "{e}"')
+            if not hasattr(strategy_obj, 'features_config'):
+                raise MyStrategyException(f'strategy "{nm}" has no "features_config" attribute to precompute')
+            groups[group_key] = {
+                'configs': strategy_obj.features_config,
+                'feature_seconds': kwargs['feature_seconds']
+            }
+        combination_groups.append(groups[group_key])
+
+    processes = max(processes, 1)
+    cache = FeatureCache(
+        path.join(db.path_feature_cache(), 'sweep'),
+        max_entries=max(len(paths) * len(groups), 1)
+    )
+    active_logger.info(f'precomputing features for {len(groups)} feature configurations over {len(paths)} markets '
+                       f'across {processes} processes')
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_precompute_worker, cache, group['configs'], group['feature_seconds'], p)
+            for group in groups.values() for p in paths
+        ]
+        for i, future in enumerate(as_completed(futures)):
+            future.result()
+            active_logger.info(f'precomputed features {i + 1}/{len(futures)}')
+    cache.evict()
+
+    # write strategy meta for each combination
+    chunk_size = chunk_size or math.ceil(len(paths) / (processes * 4))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    strategy_ids = {}
+    tasks = []
+    for combination, kwargs, group in zip(combinations, combination_kwargs, combination_groups):
+        strategy_id = uuid.uuid4()
+        strategy_ids[str(strategy_id)] = combination
+        kwargs = kwargs | {
+            'strategy_id': str(strategy_id)
+        }
+        db.write_strat_info(
+            strategy_id=strategy_id,
+            type='simulated',
+            name=strategy_cls.__name__,
+            exec_time=datetime.utcnow(),
+            info=kwargs | {
+                'market_filter': {
+                    'markets': paths
+                }
+            },
+        )
+        kwargs['feature_source'] = partial(
+            cache.get_market,
+            configs=group['configs'],
+            feature_seconds=group['feature_seconds']
+        )
+        tasks.extend((kwargs, chunk) for chunk in chunks)
+
+    active_logger.info(f'running {len(combinations)} combinations of strategy "{nm}" over {len(paths)} markets in '
+                       f'{len(tasks)} tasks across {processes} processes')
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_hist_strat_worker, strategy_cls, kwargs, chunk) for kwargs, chunk in tasks]
+        for i, future in enumerate(as_completed(futures)):
+            future.result()
+            active_logger.info(f'completed {i + 1}/{len(futures)} sweep tasks')
+    return strategy_ids
+
+
+def _terminate_closed(context: dict, flumine: Flumine, market_ids: List[str]) -> None:
+    """terminate framework once all markets have been received and closed (closed markets can later be removed)"""
+    markets = flumine.markets.markets
+    seen = context.setdefault('seen', set())
+    seen.update(m for m in market_ids if m in markets)
+    if len(seen) == len(market_ids) and not any(m in markets and not markets[m].closed for m in market_ids):
+        active_logger.info(f'all {len(market_ids)} markets closed, terminating')
+        flumine.handler_queue.put(events.TerminationEvent(flumine))
+
+
+def _live_strat_worker(
+        strategy_cls: Type[MyFeatureStrategy],
+        kwargs: Dict,
+        market_ids: List[str],
+        market_data_filter: Dict,
+        transaction_limit: int
+) -> int:
+    """run live strategy on a shard of markets in a worker process until all markets close, return number of markets"""
+    client = clients.BetfairClient(APIHandler().API_client, transaction_limit=transaction_limit)
+    framework = Flumine(client=client)
+    framework.add_strategy(strategy_cls(**kwargs | {
+        'market_filter': streaming_market_filter(market_ids=market_ids),
+        'market_data_filter': streaming_market_data_filter(**market_data_filter),
+    }))
+    framework.add_worker(BackgroundWorker(
+        framework,
+        _terminate_closed,
+        func_kwargs={'market_ids': market_ids},
+        context={},
+        interval=60,
+        start_delay=60,
+    ))
+    framework.run()
+    return len(market_ids)
+
+
+def live_strat_run_sharded(
+        cfg: Dict,
+        db: BettingDB,
+        processes: int,
+        transaction_limit: int = 5000
+) -> uuid.UUID:
+    """
+    run live strategy from configuration over markets from betfair catalogue, with markets sharded across `processes`
+    worker processes
+
+    configuration "catalogue_filter" are keyword arguments to `APIHandler.list_market_catalogues()`, and optional
+    "market_data_filter" keyword arguments to streaming market data filter (default `LIVE_MARKET_DATA_FIELDS`)
+
+    each worker runs its own flumine framework, betfair client and strategy instance (feature processing, trade
+    machines and order execution) for its markets, until they have all closed. Markets are sorted by start time and
+    dealt to workers in turn, so that markets starting at the same time are processed in different workers.
+    All strategy instances share the same strategy ID so that per market strategy updates are written to the same
+    strategy in the cache, as per `hist_strat_run_parallel()`
+
+    the account `transaction_limit` (per hour) is split evenly between workers. Each strategy instance is given a
+    distinct flumine name, so that orders placed by one worker are not adopted by another from the order stream
+
+    returns strategy ID
+    """
+    dictionaries.validate_config(cfg, LIVE_STRATEGY_CONFIG_SPEC)
+    nm = cfg['name']
+    if nm not in strategies_reg:
+        raise MyStrategyException(f'strategy "{nm}" not found in registrar')
+    strategy_cls = strategies_reg[nm]
+    catalogues = APIHandler().list_market_catalogues(**cfg['catalogue_filter'])
+    market_ids = [c.market_id for c in sorted(catalogues, key=lambda c: c.market_start_time)]
+    if not market_ids:
+        raise MyStrategyException(f'no markets found for strategy "{nm}"')
+    market_data_filter = cfg.get('market_data_filter') or {'fields': LIVE_MARKET_DATA_FIELDS}
+
+    processes = max(min(processes, len(market_ids)), 1)
+    shards = [market_ids[i::processes] for i in range(processes)]
+    shard_limit = transaction_limit // processes
+    strategy_id = uuid.uuid4()
+    kwargs = cfg['info'] | {
+        'historic': False,
+        'strategy_id': str(strategy_id),
+    }
+    db.write_strat_info(
+        strategy_id=strategy_id,
+        type='live',
+        name=strategy_cls.__name__,
+        exec_time=datetime.utcnow(),
+        info=kwargs | {
+            'market_filter': streaming_market_filter(market_ids=market_ids),
+            'market_data_filter': market_data_filter,
+        },
+    )
+    active_logger.info(f'running live strategy "{nm}" with ID "{strategy_id}" over {len(market_ids)} markets across '
+                       f'{processes} processes, with {shard_limit} transactions per process, with args:\n'
+                       f'{yaml.dump(kwargs, sort_keys=False)}')
 
+    n_done = 0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                _live_strat_worker,
+                strategy_cls,
+                kwargs | {'framework_name': f'{strategy_cls.__name__}-{i}'},
+                shard,
+                market_data_filter,
+                shard_limit
+            ) for i, shard in enumerate(shards)
+        ]
+        for future in as_completed(futures):
+            n_done += future.result()
+            active_logger.info(f'completed {n_done}/{len(market_ids)} markets for strategy "{strategy_id}"')
+    return strategy_id
@@ -1,14 +1,19 @@
 from __future__ import annotations
 import copy
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple, Union
 import logging
-import numpy as np
 import pandas as pd
 from betfairlightweight.resources import MarketBook
+from ...process.snapshot import BookSnapshot, as_snapshot
 from myutils import timing
 # from collections import MutableMapping
-from .features import ftrs_reg, RFBase
+from .features import ftrs_reg, RFBase, set_timing, is_timing_enabled, clear_timings, get_timings_summary, \
+    get_timings, merge_timings
+from .cache import FeatureCache
+from .storage import FeatureWriter, read_features
+from .replay import ReplayFeature
 from ...exceptions import FeatureException
 
 active_logger = logging.getLogger(__name__)
@@ -16,6 +21,8 @@ active_logger = logging.getLogger(__name__)
 
 class FeatureHolder(dict):
     """dictionary holder of (feature name => feature instance)"""
+    _subscribers: List[RFBase] = None
+
     @classmethod
     def generator(cls, configs: dict) -> FeatureHolder:
         """
@@ -58,6 +65,47 @@ class FeatureHolder(dict):
             return dly
         return _get_delay(0, self)
 
+    def user_data_subscribers(self) -> List[RFBase]:
+        """
+        get features and sub-features (flattened) which subscribe to user data updates - list is cached on first call so
+        features must not be added to holder afterwards
+        """
+        def _get(_ftrs):
+            for ftr in _ftrs.values():
+                if ftr.user_data_subscriber:
+                    yield ftr
+                yield from _get(ftr.sub_features)
+        if self._subscribers is None:
+            self._subscribers = list(_get(self))
+        return self._subscribers
+
+    def flattened(self) -> List[RFBase]:
+        """get list of features and sub-features (flattened), parents before their sub-features"""
+        def _get(_ftrs):
+            for ftr in _ftrs.values():
+                yield ftr
+                yield from _get(ftr.sub_features)
+        return list(_get(self))
+
+    def set_lazy(self, lazy: bool) -> None:
+        """
+        set lazy evaluation for features, where eligible features only compute their value when `last_value()` is
+        called - intended for live/backtest strategies that only read a subset of feature values on each update, not
+        for `simulate()` where all values are stored
+        """
+        for ftr in self.values():
+            ftr.set_lazy(lazy)
+
+    def replay(self, data: Dict[str, pd.Series]) -> FeatureHolder:
+        """
+        create feature holder with the same feature names and identifiers which replays precomputed feature data (as
+        returned by `precompute_features()`) instead of computing values
+        """
+        return FeatureHolder({
+            name: ReplayFeature.from_feature(ftr, data)
+            for name, ftr in self.items()
+        })
+
     def get_data(self) -> Dict[str, pd.Series]:
         """get feature data recursively into dictionary of pandas Series, indexed by feature identifier"""
 
@@ -69,18 +117,19 @@ class FeatureHolder(dict):
                 if ftr.ftr_identifier in data:
                     raise FeatureException(f'feature "{ftr.ftr_identifier}" already exists')
                 if len(ftr.out_cache):
-                    a = np.array(ftr.out_cache)
-                    data[ftr.ftr_identifier] = pd.Series(a[:, 1], a[:, 0])
+                    # values can be ladders or arrays so build from lists rather than 2d array
+                    index, values = zip(*ftr.out_cache)
+                    data[ftr.ftr_identifier] = pd.Series(values, index=pd.DatetimeIndex(index), dtype=object)
                 # call function recursively with sub features
                 inner(ftr.sub_features)
 
         inner(self)
         return data
 
-    def _stream(self, selection_id: int, records: List[List[MarketBook]]):
+    def _stream(self, selection_id: int, records: List[List[Union[MarketBook, BookSnapshot]]]):
         """simulate streaming and process historical records with a set of features for a selected runner"""
         for bk in records:
-            bk = bk[0]
+            bk = as_snapshot(bk[0])
             for i_rn, runner_book in enumerate(bk.runners):
                 if runner_book.selection_id == selection_id:
                     for feature in self.values():
@@ -88,14 +137,17 @@ class FeatureHolder(dict):
 
     def simulate(
             self,
-            hist_records: List[List[MarketBook]],
+            hist_records: List[List[Union[MarketBook, BookSnapshot]]],
             selection_id: int,
             cmp_start: datetime,
             cmp_end: datetime,
             buffer_s: float
     ) -> Dict[str, pd.Series]:
         """for a historical market, generate runner features from config, simulate feature processing for market within
-        computation start and end time (allowing for buffer seconds), and return dictionary of feature data"""
+        computation start and end time (allowing for buffer seconds), and return dictionary of feature data
+
+        records can be betfairlightweight market books or snapshots (snapshots are faster as they are not converted)
+        """
 
         # check record set empty
         if not hist_records:
@@ -121,7 +173,7 @@ class FeatureHolder(dict):
 
         # initialise features with first of trimmed books, then simulate market stream and process feature updates
         for feature in self.values():
-            feature.race_initializer(selection_id, hist_records[0][0])
+            feature.race_initializer(selection_id, as_snapshot(hist_records[0][0]))
         self._stream(selection_id, hist_records)
 
         # get feature data from feature set
@@ -130,3 +182,170 @@ class FeatureHolder(dict):
     def __getitem__(self, item) -> RFBase:
         return super().__getitem__(item)
 
+
+def _simulate_pass(
+        configs: dict,
+        hist_records: List[List[Union[MarketBook, BookSnapshot]]],
+        windows: Dict[int, Tuple[datetime, datetime]],
+        buffer_s: float
+) -> Dict[int, Dict[str, pd.Series]]:
+    """process each historical record once for all runners specified in `windows`, see `simulate_runners()`"""
+
+    # create features for each runner and get computation start (allowing for buffer and cache seconds) and end times
+    holders = {}
+    bounds = {}
+    for selection_id, (cmp_start, cmp_end) in windows.items():
+        holders[selection_id] = FeatureHolder.generator(configs)
+        total_s = buffer_s + holders[selection_id].max_cache()
+        bounds[selection_id] = (cmp_start - timedelta(seconds=total_s), cmp_end)
+
+    pending = set(windows.keys())
+    active = set()
+    for bk in hist_records:
+        pt = bk[0].publish_time
+        if not any(bounds[k][0] <= pt <= bounds[k][1] for k in windows):
+            continue
+        bk = as_snapshot(bk[0])
+
+        # initialise runner features with first book inside computation window
+        for selection_id in list(pending):
+            start, end = bounds[selection_id]
+            if start <= pt <= end:
+                for feature in holders[selection_id].values():
+                    feature.race_initializer(selection_id, bk)
+                pending.remove(selection_id)
+                active.add(selection_id)
+
+        for i_rn, runner_book in enumerate(bk.runners):
+            selection_id = runner_book.selection_id
+            if selection_id in active:
+                start, end = bounds[selection_id]
+                if start <= pt <= end:
+                    for feature in holders[selection_id].values():
+                        feature.process_runner(bk, i_rn)
+
+    if pending:
+        raise FeatureException(f'trimmed record set empty for selection IDs: {sorted(pending)}')
+    return {selection_id: holder.get_data() for selection_id, holder in holders.items()}
+
+
+def _simulate_worker(
+        timing_enabled: bool,
+        configs: dict,
+        hist_records: List[List[Union[MarketBook, BookSnapshot]]],
+        windows: Dict[int, Tuple[datetime, datetime]],
+        buffer_s: float
+) -> Tuple[Dict[int, Dict[str, pd.Series]], timing.TimingRegistrar]:
+    """
+    simulate runners in a worker process as per `_simulate_pass()`, returning feature data and the feature timings
+    logged in the worker (timing is set explicitly as worker processes do not necessarily inherit it)
+    """
+    set_timing(timing_enabled)
+    clear_timings()
+    return _simulate_pass(configs, hist_records, windows, buffer_s), get_timings()
+
+
+def precompute_features(
+        configs: dict,
+        hist_records: List[List[Union[MarketBook, BookSnapshot]]],
+        feature_seconds: float
+) -> Dict[int, Dict[str, pd.Series]]:
+    """
+    process features for all runners in a historical market as a strategy would, with features created and
+    initialised for each runner on the first book (or first book the runner appears) from `feature_seconds` before
+    market start time until the market is closed
+
+    returns dictionary of (selection ID => feature data), which can be replayed in a strategy using
+    `FeatureHolder.replay()` - unlike `FeatureHolder.get_data()`, feature data is the value of `last_value()` for each
+    feature after every book, indexed by the book publish time, as the values stored by sampled features are indexed
+    by sample times which can be ahead of the book at which a strategy would have read them
+    """
+    # (selection ID => (feature holder, book publish times, list of (feature, values after each book)))
+    runners: Dict[int, Tuple[FeatureHolder, List[datetime], List[Tuple[RFBase, list]]]] = {}
+    for bk in hist_records:
+        bk = as_snapshot(bk[0])
+        if bk.status == 'CLOSED':
+            break
+        if bk.market_time is None or bk.publish_time < bk.market_time - timedelta(seconds=feature_seconds):
+            continue
+        for i_rn, runner_book in enumerate(bk.runners):
+            runner = runners.get(runner_book.selection_id)
+            if runner is None:
+                holder = FeatureHolder.generator(configs)
+                for feature in holder.values():
+                    feature.race_initializer(runner_book.selection_id, bk)
+                runner = runners[runner_book.selection_id] = (holder, [], [(f, []) for f in holder.flattened()])
+            holder, times, records = runner
+            for feature in holder.values():
+                feature.process_runner(bk, i_rn)
+            times.append(bk.publish_time)
+            for feature, values in records:
+                values.append(feature.last_value())
+
+    data = {}
+    for selection_id, (holder, times, records) in runners.items():
+        index = pd.DatetimeIndex(times)
+        data[selection_id] = {}
+        for feature, values in records:
+            if feature.ftr_identifier in data[selection_id]:
+                raise FeatureException(f'feature "{feature.ftr_identifier}" already exists')
+            data[selection_id][feature.ftr_identifier] = pd.Series(values, index=index, dtype=object)
+    return data
+
+
+def simulate_runners(
+        configs: dict,
+        hist_records: List[List[Union[MarketBook, BookSnapshot]]],
+        windows: Dict[int, Tuple[datetime, datetime]],
+        buffer_s: float,
+        processes: int = 0
+) -> Dict[int, Dict[str, pd.Series]]:
+    """
+    for a historical market, generate features from config for multiple runners and simulate feature processing,
+    passing over the records once for all runners rather than once per runner
+
+    `windows` is a dictionary of (selection ID => (computation start, computation end)), where each runner is computed
+    within its window (allowing for buffer seconds) as per `FeatureHolder.simulate()`
+
+    if `processes` is greater than 1 then runners are split across a pool of worker processes, where feature timings
+    logged in workers (if enabled, see `set_timing()`) are merged into those of this process
+
+    returns dictionary of (selection ID => feature data)
+    """
+
+    # check record set empty
+    if not hist_records:
+        raise FeatureException(f'records set empty')
+    if not windows:
+        return {}
+    active_logger.info(f'creating feature data for {len(windows)} runners from {len(hist_records)} records')
+
+    n_workers = min(processes, len(windows))
+    if n_workers <= 1:
+        return _simulate_pass(configs, hist_records, windows, buffer_s)
+
+    # only send records that can be inside computation windows to workers
+    start = min(w[0] for w in windows.values()) - timedelta(seconds=buffer_s + FeatureHolder.generator(configs).max_cache())
+    end = max(w[1] for w in windows.values())
+    hist_records = [r for r in hist_records if start <= r[0].publish_time <= end]
+
+    selection_ids = list(windows.keys())
+    chunks = [selection_ids[i::n_workers] for i in range(n_workers)]
+    active_logger.info(f'splitting runners across {n_workers} processes')
+    data = {}
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [
+            executor.submit(
+                _simulate_worker,
+                is_timing_enabled(),
+                configs,
+                hist_records,
+                {selection_id: windows[selection_id] for selection_id in chunk},
+                buffer_s
+            ) for chunk in chunks
+        ]
+        for future in futures:
+            worker_data, worker_timings = future.result()
+            data.update(worker_data)
+            merge_timings(worker_timings)
+    return data
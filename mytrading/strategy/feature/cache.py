@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from os import path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from betfairlightweight.resources import MarketBook
+
+from ...exceptions import FeatureException
+
+active_logger = logging.getLogger(__name__)
+
+
+class FeatureCache:
+    """
+    disk cache of simulated feature data (as returned by `FeatureHolder.get_data()`), where entries are addressed by a
+    hash of market ID, selection ID, feature configuration and computation window
+
+    entries are stored as pickled dictionaries of pandas Series (feature values can be ladders, so are not suited to a
+    fixed columnar schema) - when more than `max_entries` are stored the least recently used are removed
+
+    the number of entries is counted when the cache is created and then tracked as entries are stored, so the directory
+    is only scanned when the count exceeds `max_entries` (entries stored by other processes are not counted)
+    """
+    EXT = '.pkl'
+
+    def __init__(self, cache_dir: str, max_entries: int = 500):
+        if max_entries < 1:
+            raise FeatureException(f'feature cache max entries "{max_entries}" must be at least 1')
+        self.cache_dir = path.abspath(path.expandvars(cache_dir))
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._n_entries = sum(1 for e in os.scandir(self.cache_dir) if e.is_file() and e.name.endswith(self.EXT))
+
+    @staticmethod
+    def key(
+            market_id: str,
+            selection_id: int,
+            configs: dict,
+            cmp_start: datetime,
+            cmp_end: datetime,
+            buffer_s: float
+    ) -> str:
+        """get hash of feature computation inputs, feature configuration is serialised with sorted keys"""
+        spec = json.dumps({
+            'market_id': market_id,
+            'selection_id': selection_id,
+            'configs': configs,
+            'cmp_start': cmp_start.isoformat(),
+            'cmp_end': cmp_end.isoformat(),
+            'buffer_s': float(buffer_s),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(spec.encode()).hexdigest()
+
+    @staticmethod
+    def market_key(market_id: str, configs: dict, feature_seconds: float) -> str:
+        """get hash of inputs for features precomputed for all runners in a market, see `precompute_features()`"""
+        spec = json.dumps({
+            'market_id': market_id,
+            'configs': configs,
+            'feature_seconds': float(feature_seconds),
+            # precomputed data is feature values after each book, distinguish from entries of stored feature updates
+            'values': 'per_book',
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(spec.encode()).hexdigest()
+
+    def get_market(self, market_id: str, configs: dict, feature_seconds: float) -> Optional[Dict[int, Dict[str, pd.Series]]]:
+        """get cached precomputed features for all runners in a market, or None if not found"""
+        return self.get(self.market_key(market_id, configs, feature_seconds))
+
+    def _path(self, key: str) -> str:
+        return path.join(self.cache_dir, key + self.EXT)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """get cached feature data, or None if not found"""
+        p = self._path(key)
+        if not path.isfile(p):
+            return None
+        try:
+            data = pd.read_pickle(p)
+        except Exception as e:
+            active_logger.warning(f'failed to read feature cache entry "{p}": {e}')
+            return None
+        # update modified time so entry is most recently used, entry may have been evicted since being read
+        try:
+            os.utime(p)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key: str, data: Dict, evict: bool = True) -> None:
+        """
+        store feature data, writing to temporary file first so a partially written entry is never read
+
+        if `evict` is False then least recently used entries are not removed when the cache is full until `evict()` is
+        called, e.g. once a batch of entries has been stored
+        """
+        p = self._path(key)
+        if not path.isfile(p):
+            self._n_entries += 1
+        # temporary file is unique to process so concurrent writers of the same entry do not collide
+        tmp = f'{p}.{os.getpid()}.tmp'
+        pd.to_pickle(data, tmp)
+        os.replace(tmp, p)
+        if evict and self._n_entries > self.max_entries:
+            self.evict()
+
+    def evict(self) -> None:
+        """remove least recently used entries so that at most `max_entries` are stored"""
+        # other processes (e.g. precompute workers) sharing the cache directory may remove entries concurrently, so
+        # entries which have gone by the time they are accessed are skipped
+        entries = []
+        for e in os.scandir(self.cache_dir):
+            if e.is_file() and e.name.endswith(self.EXT):
+                try:
+                    entries.append((e.stat().st_mtime, e))
+                except FileNotFoundError:
+                    pass
+        n_remove = len(entries) - self.max_entries
+        self._n_entries = min(len(entries), self.max_entries)
+        if n_remove > 0:
+            entries.sort(key=lambda x: x[0])
+            for _, e in entries[:n_remove]:
+                active_logger.info(f'removing feature cache entry "{e.name}"')
+                try:
+                    os.remove(e.path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> int:
+        """remove all cache entries, returning number removed"""
+        n = 0
+        for e in os.scandir(self.cache_dir):
+            if e.is_file() and e.name.endswith(self.EXT):
+                os.remove(e.path)
+                n += 1
+        self._n_entries = 0
+        return n
+
+    def simulate(
+            self,
+            market_id: str,
+            configs: dict,
+            hist_records: List[List[MarketBook]],
+            windows: Dict[int, Tuple[datetime, datetime]],
+            buffer_s: float,
+            processes: int = 0
+    ) -> Dict[int, Dict[str, pd.Series]]:
+        """
+        get feature data for multiple runners as per `simulate_runners()`, reading from cache where possible and only
+        simulating runners not found in cache - runners read from cache are not processed so do not log feature timings
+        """
+        from . import simulate_runners
+
+        data = {}
+        keys = {}
+        for selection_id, (cmp_start, cmp_end) in windows.items():
+            keys[selection_id] = self.key(market_id, selection_id, configs, cmp_start, cmp_end, buffer_s)
+            cached = self.get(keys[selection_id])
+            if cached is not None:
+                data[selection_id] = cached
+
+        missing = {k: v for k, v in windows.items() if k not in data}
+        active_logger.info(f'found {len(data)} runners in feature cache, simulating {len(missing)} runners')
+        if missing:
+            new_data = simulate_runners(configs, hist_records, missing, buffer_s, processes)
+            for selection_id, ftr_data in new_data.items():
+                self.put(keys[selection_id], ftr_data)
+            data.update(new_data)
+        return data
@@ -2,18 +2,19 @@
 # from __future__ import annotations
 import time
 
-from betfairlightweight.resources.bettingresources import MarketBook
 import numpy as np
-from typing import Dict, Optional, Any, Union
+from typing import Dict, Optional, Any, Union, List
 from datetime import datetime, timedelta
 import logging
 from collections import deque
+from bisect import bisect_left
 import statistics
 import pydantic
 from dataclasses import dataclass, field, InitVar
 
 from mytrading.exceptions import FeatureException
-from mytrading.process import get_best_price, closest_tick, tick_spread, traded_runner_vol, get_record_tv_diff
+from mytrading.process import closest_tick, tick_spread
+from mytrading.process.snapshot import BookSnapshot, tv_diff, ladder_dicts
 from mytrading.process.ticks import LTICKS_DECODED
 from myutils import timing, registrar, dictionaries, pyschema
 
@@ -21,6 +22,44 @@ from myutils import timing, registrar, dictionaries, pyschema
 
 active_logger = logging.getLogger(__name__)
 
+# feature processing timings are disabled by default, when enabled they are aggregated by feature identifier across
+# all feature instances
+_timing_enabled = False
+_timings = timing.TimingRegistrar()
+
+
+def set_timing(enabled: bool) -> None:
+    """globally enable/disable logging of feature processing times"""
+    global _timing_enabled
+    _timing_enabled = enabled
+
+
+def is_timing_enabled() -> bool:
+    """check if logging of feature processing times is enabled"""
+    return _timing_enabled
+
+
+def clear_timings() -> None:
+    """remove all feature processing times logged"""
+    _timings.clear()
+
+
+def get_timings_summary() -> List[timing.TimingResult]:
+    """get list of feature processing timings, aggregated by feature identifier"""
+    return _timings.get_timings_summary()
+
+
+def get_timings() -> timing.TimingRegistrar:
+    """get registrar of feature processing timings logged"""
+    return _timings
+
+
+def merge_timings(timings: timing.TimingRegistrar) -> None:
+    """add feature processing timings logged elsewhere (e.g. in a worker process) to those logged"""
+    global _timings
+    _timings = _timings + timings
+
+
 SUB_FEATURE_CONFIG_SPEC = {
     'name': {
         'type': str,
@@ -37,11 +76,36 @@ class RFBase:
     base class for runner features that can hold child features specified by `sub_features_config`, dictionary of
     (child feature identifier => child feature constructor kwargs)
 
+    features are processed with market book snapshots (see `mytrading.process.snapshot`) rather than betfairlightweight
+    market books, where runner ladders are numpy arrays of prices and sizes
+
     by default store cache of 2 values using `cache_count`. If cache seconds `cache_secs` is specified this
     takes priority over `cache_count` by indicating number of seconds prior to cache values. In this case,
     `cache_insidewindow` determines whether first cache value in queue should be inside the time window or
     outside
+
+    features can be evaluated lazily (see `set_lazy()`), where computing a value is deferred until `last_value()` is
+    called. To be eligible a feature must declare `deferrable` (value is a pure function of the new market book and
+    the parent cache) and all its children must be lazy, not read its history (`parent_history`) and not be
+    `nullable` - as only the most recent of its deferred updates is computed. A `nullable` feature keeps its deferred
+    updates (with the parent value at the time, so cannot read parent history) and computes them newest first until
+    one is not None, which is the value eager evaluation would have stored
+
+    features that use user data (e.g. oddschecker prices) must declare `user_data_subscriber`, only subscribing
+    features are passed user data updates via `update_user_data()`
     """
+
+    # value depends only on new market book and parent cache, not on any internal state
+    deferrable = False
+    # value reads parent cache history rather than just the most recent parent value
+    parent_history = False
+    # value can be None for an update (and is not stored)
+    nullable = True
+    # maximum deferred updates kept by a lazy nullable feature before they are computed
+    lazy_pending_max = 50
+    # value uses user data, passed by strategy when updated
+    user_data_subscriber = False
+
     def __init__(
             self,
             parent: Optional['RFBase'] = None,
@@ -67,7 +131,6 @@ class RFBase:
                 self.ftr_identifier
             ])
 
-        self.timing_reg = timing.TimingRegistrar()
         self._values_cache = deque()
         self.out_cache = deque()
         # self.cache_count = cache_count
@@ -100,11 +163,14 @@ class RFBase:
                         f'error in feature "{self.ftr_identifier}", sub-feature "{sub_nm}": {e}'
                     )
         self._user_data = None
+        self.lazy = False
+        # deferred updates of (market book, runner index, publish time, parent cache item) when lazy
+        self._pending = []
+        self._parent_item = None
 
     def update_user_data(self, user_data):
+        """set user data, sub-features which subscribe to user data are updated separately"""
         self._user_data = user_data
-        for ftr in self.sub_features.values():
-            ftr.update_user_data(user_data)
 
     def _update_cache(self):
         if self.cache_secs:
@@ -121,13 +187,59 @@ class RFBase:
             while len(self._values_cache) > self.cache_count:
                 self._values_cache.popleft()
 
-    def race_initializer(self, selection_id: int, first_book: MarketBook) -> None:
+    def race_initializer(self, selection_id: int, first_book: BookSnapshot) -> None:
         """initialize feature with first market book of race and selected runner"""
         self.selection_id = selection_id
+        self._pending = []
         for sub_feature in self.sub_features.values():
             sub_feature.race_initializer(selection_id, first_book)
 
+    def set_lazy(self, lazy: bool) -> None:
+        """
+        set lazy evaluation mode for feature and its children - features that are not eligible for lazy evaluation
+        continue to be computed on every update
+        """
+        for sub_feature in self.sub_features.values():
+            sub_feature.set_lazy(lazy)
+        # make sure any deferred update is not lost when switching off
+        self._resolve()
+        self.lazy = lazy and self.deferrable and not (self.nullable and self.parent_history) and all(
+            sub_feature.lazy and not sub_feature.parent_history and not sub_feature.nullable
+            for sub_feature in self.sub_features.values()
+        )
+
+    def _resolve(self):
+        """compute deferred updates (if exist) newest first until a value is stored, updating lazy parent first"""
+        if self.parent is not None and self.parent.lazy:
+            self.parent._resolve()
+        if self._pending:
+            pending = self._pending
+            self._pending = []
+            for new_book, runner_index, pt, parent_item in reversed(pending):
+                self._parent_item = parent_item
+                try:
+                    value = self._get_feature_value(new_book, runner_index)
+                finally:
+                    self._parent_item = None
+                if value is not None:
+                    self._store_update(new_book, runner_index, pt or parent_item[0], value)
+                    return
+
     def _publish_update(self, new_book, runner_index, pt=None):
+        # if lazy then store update to be computed when value is requested
+        if self.lazy:
+            if pt is None and self.parent is None:
+                pt = new_book.publish_time
+            parent_item = self.parent._values_cache[-1] if self.parent is not None else None
+            if not self.nullable:
+                self._pending.clear()
+            self._pending.append((new_book, runner_index, pt, parent_item))
+            if len(self._pending) > self.lazy_pending_max:
+                self._resolve()
+        else:
+            self._compute_update(new_book, runner_index, pt)
+
+    def _compute_update(self, new_book, runner_index, pt=None):
         # get feature value, ignore if None
         value = self._get_feature_value(new_book, runner_index)
         if value is None:
@@ -139,7 +251,10 @@ class RFBase:
                 pt = new_book.publish_time
             else:
                 pt = self.parent._values_cache[-1][0]
+        self._store_update(new_book, runner_index, pt, value)
 
+    def _store_update(self, new_book, runner_index, pt, value):
+        """add value to caches and process sub-features"""
         self._values_cache.append((pt, value))
         self.out_cache.append((pt, value))
         self._update_cache()
@@ -147,21 +262,95 @@ class RFBase:
         for sub_feature in self.sub_features.values():
             sub_feature.process_runner(new_book, runner_index)
 
-    def process_runner(self, new_book: MarketBook, runner_index) -> None:
+    def _extend_values(self, value, timestamps: List[datetime]):
+        """add the same value at each of `timestamps` to caches, only adding to values cache those that will be kept"""
+        self.out_cache.extend((pt, value) for pt in timestamps)
+        if self.cache_secs:
+            # keep one value before window in case first cache value is allowed outside window
+            i = bisect_left(timestamps, timestamps[-1] - timedelta(seconds=self.cache_secs))
+            start = max(i - 1, 0)
+        else:
+            start = max(len(timestamps) - self.cache_count, 0)
+        self._values_cache.extend((pt, value) for pt in timestamps[start:])
+        self._update_cache()
+
+    def _publish_repeat(self, new_book, runner_index, value, timestamps: List[datetime]):
+        """
+        publish the same `value` at each of `timestamps` (e.g. sampling filling forward a gap in updates)
+
+        sub-features with internal state are processed for each timestamp, whereas `deferrable` sub-features are only
+        processed for each timestamp until the values cache holds only the repeated value and stops changing - from
+        then on their value cannot change so it is computed once and repeated in bulk
+        """
+        stepped = [ftr for ftr in self.sub_features.values() if not ftr.deferrable]
+        bulk = [ftr for ftr in self.sub_features.values() if ftr.deferrable]
+        prev_len = None
+        for i, pt in enumerate(timestamps):
+
+            # nothing to process per timestamp, add remaining values in one go
+            if not stepped and not bulk:
+                self._extend_values(value, timestamps[i:])
+                return
+
+            self._values_cache.append((pt, value))
+            self.out_cache.append((pt, value))
+            self._update_cache()
+
+            for sub_feature in stepped:
+                sub_feature.process_runner(new_book, runner_index)
+
+            if bulk:
+                # cache is saturated when it only holds the repeated value and its length is unchanged
+                n_cache = len(self._values_cache)
+                if i + 1 >= n_cache and n_cache == prev_len:
+                    for sub_feature in bulk:
+                        sub_feature._process_repeat(new_book, runner_index, timestamps[i:])
+                    bulk = []
+                else:
+                    for sub_feature in bulk:
+                        sub_feature.process_runner(new_book, runner_index)
+                prev_len = n_cache
+
+    def _process_repeat(self, new_book, runner_index, timestamps: List[datetime]):
+        """process update where parent value and cache are the same for each of `timestamps`"""
+        if self.lazy:
+            self._publish_update(new_book, runner_index, timestamps[-1])
+        else:
+            value = self._get_feature_value(new_book, runner_index)
+            if value is not None:
+                self._publish_repeat(new_book, runner_index, value, timestamps)
+
+    def process_runner(self, new_book: BookSnapshot, runner_index) -> None:
         """update feature value and add to cache"""
-        t = time.perf_counter()
-        self._publish_update(new_book, runner_index)
-        self.timing_reg.log_result(time.perf_counter() - t, self.ftr_identifier)
+        if _timing_enabled:
+            t = time.perf_counter()
+            self._publish_update(new_book, runner_index)
+            _timings.log_result(time.perf_counter() - t, self.ftr_identifier)
+        else:
+            self._publish_update(new_book, runner_index)
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index) -> Optional[Any]:
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index) -> Optional[Any]:
         """
         implement this function to return feature value from new market book received
         return None if do not want value to be stored
         """
         raise NotImplementedError
 
+    def _parent_value(self) -> Optional[Any]:
+        """
+        get most recent parent value for the update being computed - for a deferred update this is the parent value
+        when the update was published
+        """
+        item = self._parent_item
+        if item is None:
+            cache = self.parent._values_cache
+            return cache[-1][1] if len(cache) else None
+        return item[1]
+
     def last_value(self) -> Optional[Any]:
         """get most recent value processed, if empty return None"""
+        if self.lazy:
+            self._resolve()
         return self._values_cache[-1][1] if len(self._values_cache) else None
 
 
@@ -176,6 +365,10 @@ class RFChild(RFBase):
     """
     feature that must be used as a sub-feature to existing feature
     """
+    deferrable = True
+    # sub-features are only processed once parent has stored a value
+    nullable = False
+
     def __init__(
             self,
             **kwargs
@@ -184,14 +377,16 @@ class RFChild(RFBase):
         if kwargs.get('parent') is None:
             raise FeatureException(f'sub-feature has not received "parent" argument')
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return self.parent.last_value()
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        return self._parent_value()
 
 
 @reg_feature
 class RFMvAvg(RFChild):
     """moving average of parent values"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    parent_history = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         if len(self.parent._values_cache):
             return statistics.mean([v[1] for v in self.parent._values_cache])
 
@@ -199,97 +394,118 @@ class RFMvAvg(RFChild):
 @reg_feature
 class RFSample(RFChild):
     """sample values to periodic timestamps with most recent value"""
+    deferrable = False
+
     def __init__(self, periodic_ms: float, **kwargs):
         super().__init__(**kwargs)
         self.periodic_ms = periodic_ms
         self.last_timestamp: Optional[datetime] = None
 
-    def race_initializer(self, selection_id: int, first_book: MarketBook):
+    def race_initializer(self, selection_id: int, first_book: BookSnapshot):
         super().race_initializer(selection_id, first_book)
         self.last_timestamp = first_book.publish_time.replace(microsecond=0)
 
-    def process_runner(self, new_book: MarketBook, runner_index):
+    def process_runner(self, new_book: BookSnapshot, runner_index):
+        if _timing_enabled:
+            t = time.perf_counter()
+            self._sample(new_book, runner_index)
+            _timings.log_result(time.perf_counter() - t, self.ftr_identifier)
+        else:
+            self._sample(new_book, runner_index)
+
+    def _sample(self, new_book: BookSnapshot, runner_index):
         # if data is sampled and more than one sample time has elapsed, fill forwards until time is met
-        t = time.perf_counter()
+        timestamps = []
         while int((new_book.publish_time - self.last_timestamp).total_seconds() * 1000) > self.periodic_ms:
             self.last_timestamp = self.last_timestamp + timedelta(milliseconds=self.periodic_ms)
-            self._publish_update(new_book, runner_index, self.last_timestamp)
-        self.timing_reg.log_result(time.perf_counter() - t, self.ftr_identifier)
+            timestamps.append(self.last_timestamp)
+        if timestamps:
+            # parent value does not change between sample times so publish in bulk
+            value = self._get_feature_value(new_book, runner_index)
+            if value is not None:
+                self._publish_repeat(new_book, runner_index, value, timestamps)
 
 
 @reg_feature
 class RFTVLad(RFBase):
     """traded volume ladder"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return new_book.runners[runner_index].ex.traded_volume or None
+    deferrable = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        runner = new_book.runners[runner_index]
+        return (runner.tv_prices, runner.tv_sizes) if len(runner.tv_prices) else None
 
 
 @reg_feature
 class RFTVLadDif(RFChild):
-    """child feature of `RFTVLad`, computes difference in parent current traded volume ladder and first in cache"""
+    """
+    child feature of `RFTVLad`, computes difference in parent current traded volume ladder and first in cache, as
+    tuple of (prices, sizes) arrays
+    """
+    parent_history = True
+    nullable = True
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if type(self.parent) is not RFTVLad:
             raise FeatureException('expected traded vol feature parent')
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         if len(self.parent._values_cache) >= 2:
-            return get_record_tv_diff(
-                self.parent._values_cache[-1][1],
-                self.parent._values_cache[0][1]
+            return tv_diff(
+                *self.parent._values_cache[-1][1],
+                *self.parent._values_cache[0][1]
             )
         else:
             return None
 
 
 class _RFTVLadDifFunc(RFChild):
+    nullable = True
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if type(self.parent) is not RFTVLadDif:
             raise FeatureException('expected traded vol diff feature parent')
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        if len(self.parent._values_cache):
-            tvs = self.parent._values_cache[-1][1]
-            if len(tvs):
-                return self.lad_func(tvs)
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        value = self._parent_value()
+        if value is not None:
+            prices, sizes = value
+            if len(prices):
+                return self.lad_func(prices, sizes)
         return None
 
-    def lad_func(self, tvs):
+    def lad_func(self, prices: np.ndarray, sizes: np.ndarray):
         raise NotImplementedError
 
 
 @reg_feature
 class RFTVLadMax(_RFTVLadDifFunc):
     """maximum of traded volume difference ladder over cached values"""
-    def lad_func(self, tvs):
-        v = max([x['price'] for x in tvs])
-        return v
+    def lad_func(self, prices, sizes):
+        return prices.max().item()
 
 
 @reg_feature
 class RFTVLadMin(_RFTVLadDifFunc):
     """minimum of traded volume difference ladder over cached values"""
-    def lad_func(self, tvs):
-        v = min([x['price'] for x in tvs])
-        return v
+    def lad_func(self, prices, sizes):
+        return prices.min().item()
 
 
 @reg_feature
 class RFTVLadSpread(_RFTVLadDifFunc):
     """tick spread between min/max of traded vol difference"""
-    def lad_func(self, tvs):
-        v_max = max([x['price'] for x in tvs])
-        v_min = min([x['price'] for x in tvs])
-        return tick_spread(v_min, v_max, check_values=False)
+    def lad_func(self, prices, sizes):
+        return tick_spread(prices.min().item(), prices.max().item(), check_values=False)
 
 
 @reg_feature
 class RFTVLadTot(_RFTVLadDifFunc):
     """total new traded volume money"""
-    def lad_func(self, tvs):
-        v = sum([x['size'] for x in tvs])
-        return v
+    def lad_func(self, prices, sizes):
+        return sizes.sum().item()
 
 
 @reg_feature
@@ -301,27 +517,28 @@ class RFBkSplit(RFBase):
         super().__init__(**kwargs)
         self.previous_best_back = None
         self.previous_best_lay = None
-        self.previous_ladder = dict()
+        self.previous_ladder = (np.empty(0), np.empty(0))
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
 
         runner = new_book.runners[runner_index]
         value = None
 
         if self.previous_best_back and self.previous_best_lay:
-            diff = get_record_tv_diff(
-                runner.ex.traded_volume,
-                self.previous_ladder
+            prices, sizes = tv_diff(
+                runner.tv_prices,
+                runner.tv_sizes,
+                *self.previous_ladder
             )
             # difference in new back and lay money
-            back_diff = sum([x['size'] for x in diff if x['price'] <= self.previous_best_back])
-            lay_diff = sum([x['size'] for x in diff if x['price'] >= self.previous_best_lay])
+            back_diff = sizes[prices <= self.previous_best_back].sum().item()
+            lay_diff = sizes[prices >= self.previous_best_lay].sum().item()
             value = back_diff - lay_diff
 
         # update previous state values
-        self.previous_best_back = get_best_price(runner.ex.available_to_back)
-        self.previous_best_lay = get_best_price(runner.ex.available_to_lay)
-        self.previous_ladder = runner.ex.traded_volume
+        self.previous_best_back = runner.best_back()
+        self.previous_best_lay = runner.best_lay()
+        self.previous_ladder = (runner.tv_prices, runner.tv_sizes)
 
         return value
 
@@ -329,7 +546,9 @@ class RFBkSplit(RFBase):
 @reg_feature
 class RFLTP(RFBase):
     """Last traded price of runner"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    deferrable = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         return new_book.runners[runner_index].last_price_traded
 
 
@@ -339,17 +558,17 @@ class RFWOM(RFBase):
     Weight of money (difference of available-to-lay to available-to-back)
     applied to `wom_ticks` number of ticks on BACK and LAY sides of the book
     """
+    deferrable = True
+
     def __init__(self, wom_ticks: int, **kwargs):
         super().__init__(**kwargs)
         self.wom_ticks = wom_ticks
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        atl = new_book.runners[runner_index].ex.available_to_lay
-        atb = new_book.runners[runner_index].ex.available_to_back
-
-        if atl and atb:
-            back = sum([x['size'] for x in atb[:self.wom_ticks]])
-            lay = sum([x['size'] for x in atl[:self.wom_ticks]])
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        runner = new_book.runners[runner_index]
+        if len(runner.lay_sizes) and len(runner.back_sizes):
+            back = runner.back_sizes[:self.wom_ticks].sum().item()
+            lay = runner.lay_sizes[:self.wom_ticks].sum().item()
             return lay - back
         else:
             return None
@@ -358,8 +577,10 @@ class RFWOM(RFBase):
 @reg_feature
 class RFBck(RFBase):
     """Best available back price of runner"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return get_best_price(new_book.runners[runner_index].ex.available_to_back)
+    deferrable = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        return new_book.runners[runner_index].best_back()
 
 
 @reg_feature
@@ -367,8 +588,10 @@ class RFLay(RFBase):
     """
     Best available lay price of runner
     """
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return get_best_price(new_book.runners[runner_index].ex.available_to_lay)
+    deferrable = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        return new_book.runners[runner_index].best_lay()
 
 
 @reg_feature
@@ -376,9 +599,12 @@ class RFLadSprd(RFBase):
     """
     tick spread between best lay and best back - defaults to 1000 if cannot find best back or lay
     """
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        best_lay = get_best_price(new_book.runners[runner_index].ex.available_to_lay)
-        best_back = get_best_price(new_book.runners[runner_index].ex.available_to_back)
+    deferrable = True
+    nullable = False
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        best_lay = new_book.runners[runner_index].best_lay()
+        best_back = new_book.runners[runner_index].best_back()
         if best_lay and best_back:
             return tick_spread(best_back, best_lay, check_values=False)
         else:
@@ -390,12 +616,16 @@ class RFLadBck(RFBase):
     """
     best available price-sizes on back side within specified number of elements of best price
     """
+    deferrable = True
+    nullable = False
+
     def __init__(self, n_elements: int, **kwargs):
         super().__init__(**kwargs)
         self.n_elements = n_elements
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return new_book.runners[runner_index].ex.available_to_back[:self.n_elements]
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        runner = new_book.runners[runner_index]
+        return ladder_dicts(runner.back_prices[:self.n_elements], runner.back_sizes[:self.n_elements])
 
 
 @reg_feature
@@ -403,18 +633,24 @@ class RFLadLay(RFBase):
     """
     best available price-sizes on lay side within specified number of elements of best price
     """
+    deferrable = True
+    nullable = False
+
     def __init__(self, n_elements: int, **kwargs):
         super().__init__(**kwargs)
         self.n_elements = n_elements
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return new_book.runners[runner_index].ex.available_to_lay[:self.n_elements]
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        runner = new_book.runners[runner_index]
+        return ladder_dicts(runner.lay_prices[:self.n_elements], runner.lay_sizes[:self.n_elements])
 
 
 @reg_feature
 class RFMaxDif(RFChild):
     """maximum difference of parent cache values"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    parent_history = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         if len(self.parent._values_cache) >= 2:
             return max(abs(np.diff([v[1] for v in self.parent._values_cache])).tolist())
         else:
@@ -424,18 +660,23 @@ class RFMaxDif(RFChild):
 @reg_feature
 class RFTVTot(RFBase):
     """total traded volume of runner"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return traded_runner_vol(new_book.runners[runner_index])
+    deferrable = True
+    nullable = False
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        return new_book.runners[runner_index].traded_volume()
 
 
 @reg_feature
 class RFIncSum(RFChild):
     """incrementally sum parent values"""
+    deferrable = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._sum = 0
 
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         self._sum += self.parent._values_cache[-1][1]
         return self._sum
 
@@ -443,20 +684,24 @@ class RFIncSum(RFChild):
 @reg_feature
 class RFSum(RFChild):
     """sum parent cache values"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    parent_history = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         return sum(v[1] for v in self.parent._values_cache)
 
 
 @reg_feature
 class RFTick(RFChild):
     """convert parent to tick value"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
-        return closest_tick(self.parent._values_cache[-1][1], return_index=True)
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
+        return closest_tick(self._parent_value(), return_index=True)
 
 
 @reg_feature
 class RFDif(RFChild):
     """compare parent most recent value to first value in cache"""
-    def _get_feature_value(self, new_book: MarketBook, runner_index):
+    parent_history = True
+
+    def _get_feature_value(self, new_book: BookSnapshot, runner_index):
         return self.parent._values_cache[-1][1] - self.parent._values_cache[0][1]
 
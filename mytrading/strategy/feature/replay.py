@@ -0,0 +1,76 @@
+from __future__ import annotations
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+import pandas as pd
+
+from ...process.snapshot import BookSnapshot
+
+
+class ReplayFeature:
+    """
+    stand-in for a runner feature which replays precomputed feature values rather than computing them, exposing the
+    parts of the `RFBase` interface used by strategies
+
+    feature data is the value of `last_value()` after every book as per `precompute_features()`, so each market book
+    processed advances the replay position (for the feature and its sub-features) to the book with the same publish
+    time and `last_value()` returns the value recorded after that book - books sharing a publish time are replayed in
+    turn, and books not processed by the strategy are skipped
+    """
+    cache_secs = None
+    user_data_subscriber = False
+
+    def __init__(
+            self,
+            ftr_identifier: str,
+            data: Optional[pd.Series],
+            sub_features: Dict[str, ReplayFeature]
+    ):
+        self.ftr_identifier = ftr_identifier
+        self.sub_features = sub_features
+        self.out_cache = deque()
+        self._times = list(data.index.to_pydatetime()) if data is not None else []
+        self._values = list(data.values) if data is not None else []
+        self._index = 0
+
+    @classmethod
+    def from_feature(cls, feature, data: Dict[str, pd.Series]) -> ReplayFeature:
+        """create replay feature (and sub-features recursively) matching feature identifiers of an existing feature"""
+        return cls(
+            ftr_identifier=feature.ftr_identifier,
+            data=data.get(feature.ftr_identifier),
+            sub_features={
+                name: cls.from_feature(sub_feature, data)
+                for name, sub_feature in feature.sub_features.items()
+            }
+        )
+
+    def set_lazy(self, lazy: bool) -> None:
+        pass
+
+    def race_initializer(self, selection_id: int, book: BookSnapshot) -> None:
+        pass
+
+    def update_user_data(self, user_data: Dict) -> None:
+        pass
+
+    def _set_time(self, dt: datetime) -> None:
+        # replay time is increasing so search forward from previous position, skipping values recorded for earlier
+        # books and taking the first value recorded at the replay time
+        times = self._times
+        i = self._index
+        while i < len(times) and times[i] < dt:
+            i += 1
+        if i < len(times) and times[i] == dt:
+            i += 1
+        self._index = i
+        for sub_feature in self.sub_features.values():
+            sub_feature._set_time(dt)
+
+    def process_runner(self, new_book: BookSnapshot, runner_index: int) -> None:
+        self._set_time(new_book.publish_time)
+
+    def last_value(self) -> Optional[Any]:
+        """get precomputed value recorded after the most recent book at or before replay time, if none return None"""
+        return self._values[self._index - 1] if self._index else None
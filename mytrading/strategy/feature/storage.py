@@ -0,0 +1,114 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple, Any, Optional
+
+import pandas as pd
+
+from ...exceptions import FeatureException
+
+active_logger = logging.getLogger(__name__)
+
+EPOCH = datetime.utcfromtimestamp(0)
+
+
+def _json_default(obj):
+    # numpy arrays and scalars
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'object of type "{type(obj).__name__}" is not JSON serializable')
+
+
+class FeatureWriter:
+    """
+    buffered columnar writer of strategy feature values for a market
+
+    values are buffered and written in chunks, where each chunk is a single JSON line of the form
+    {
+        'ids': {code: feature identifier} for identifiers not written in a previous chunk,
+        'series': [[selection ID, identifier code, [timestamps (ms since epoch)], [values]], ...]
+    }
+    so identifiers are dictionary encoded and timestamps/values are stored as arrays per runner feature
+
+    chunks are written when `flush_count` values have been buffered or when `flush()` is called
+    """
+    def __init__(self, file_path: str, flush_count: int = 10000):
+        self.file_path = file_path
+        self.flush_count = flush_count
+        self._codes: Dict[str, int] = {}
+        self._new_ids: Dict[int, str] = {}
+        self._series: Dict[Tuple[int, int], Tuple[List[int], List[Any]]] = {}
+        self._count = 0
+
+    def add(self, selection_id: int, ftr_identifier: str, dt: datetime, value: Any) -> None:
+        code = self._codes.get(ftr_identifier)
+        if code is None:
+            code = self._codes[ftr_identifier] = len(self._codes)
+            self._new_ids[code] = ftr_identifier
+        key = (selection_id, code)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([], [])
+        series[0].append(int((dt - EPOCH).total_seconds() * 1000))
+        series[1].append(value)
+        self._count += 1
+        if self._count >= self.flush_count:
+            self.flush()
+
+    def flush(self) -> None:
+        """write buffered values to file"""
+        if not self._count:
+            return
+        chunk = {
+            'ids': self._new_ids,
+            'series': [[k[0], k[1], v[0], v[1]] for k, v in self._series.items()]
+        }
+        with open(self.file_path, 'a') as f:
+            f.write(json.dumps(chunk, default=_json_default) + '\n')
+        self._new_ids = {}
+        self._series = {}
+        self._count = 0
+
+
+def read_features(buffer: str, selection_id: Optional[int] = None) -> Dict[int, Dict[str, pd.Series]]:
+    """
+    read strategy features buffer written by `FeatureWriter` into dictionary of
+    (selection ID => (feature identifier => pandas Series)), as per `FeatureHolder.get_data()` for each runner
+
+    lines of the legacy format (one JSON object per value, with 'selection_id', 'dt', 'ftr_identifier', 'value') are
+    also accepted
+
+    optionally filter to a single runner with `selection_id`
+    """
+    ids: Dict[int, str] = {}
+    data: Dict[int, Dict[str, Tuple[list, list]]] = defaultdict(lambda: defaultdict(lambda: ([], [])))
+    for i, ln in enumerate(buffer.splitlines()):
+        if not ln:
+            continue
+        try:
+            obj = json.loads(ln)
+        except json.JSONDecodeError as e:
+            raise FeatureException(f'failed to read line {i} of features buffer: {e}')
+        if 'series' in obj:
+            ids.update({int(k): v for k, v in obj['ids'].items()})
+            for sel_id, code, timestamps, values in obj['series']:
+                if selection_id is not None and sel_id != selection_id:
+                    continue
+                series = data[sel_id][ids[code]]
+                series[0].extend(pd.to_datetime(timestamps, unit='ms'))
+                series[1].extend(values)
+        else:
+            sel_id = obj['selection_id']
+            if selection_id is not None and sel_id != selection_id:
+                continue
+            series = data[sel_id][obj['ftr_identifier']]
+            series[0].append(datetime.fromisoformat(obj['dt']))
+            series[1].append(obj['value'])
+
+    return {
+        sel_id: {
+            ftr_id: pd.Series(values, index=pd.DatetimeIndex(index), dtype=object)
+            for ftr_id, (index, values) in ftrs.items()
+        } for sel_id, ftrs in data.items()
+    }
@@ -0,0 +1,165 @@
+"""
+latency instrumentation of strategy market book processing, recording ring buffered timings of each processing stage
+per market, which can be exported in Prometheus text format or written with strategy updates and charted in the browser
+"""
+import json
+import math
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .messages import MessageTypes
+
+active_logger = logging.getLogger(__name__)
+
+EPOCH = datetime.utcfromtimestamp(0)
+
+# processing stages timed for each market book, 'runner_init' is market snapshot conversion and creation of handlers
+# for new runners, 'total' is from start to end of processing and 'lag' is from book publish time to start of processing
+LATENCY_STAGES = [
+    'flags', 'runner_init', 'user_data', 'features', 'trade_machine', 'order_tracker', 'total', 'lag'
+]
+_STAGE_INDEX = {name: i for i, name in enumerate(LATENCY_STAGES)}
+
+# summary quantiles of Prometheus export
+LATENCY_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class LatencyRecorder:
+    """
+    ring buffer of processing stage timings (in seconds) of the last `capacity` market books processed for a market
+
+    for each book `start()` is called first, then `stage()` after each stage has been run (timing from the previous
+    call, where stages called more than once per book are summed) and finally `end()` - stages that are not run for a
+    book are NaN
+
+    book publish time to start of processing ('lag') is only recorded if `record_lag` is True, as with historic markets
+    publish times are not real time
+    """
+    def __init__(self, market_id: str, capacity: int = 10000, record_lag: bool = True):
+        self.market_id = market_id
+        self.capacity = capacity
+        self.record_lag = record_lag
+        self.count = 0
+        self._data = np.full((capacity, len(LATENCY_STAGES)), np.nan)
+        self._times = np.zeros(capacity)
+        self._row: List[Optional[float]] = []
+        self._t0 = 0.0
+        self._t = 0.0
+
+    def start(self, publish_time: datetime) -> None:
+        """start timing processing of market book with `publish_time` (naive UTC datetime)"""
+        self._t0 = self._t = time.perf_counter()
+        self._row = [None] * len(LATENCY_STAGES)
+        pt = (publish_time - EPOCH).total_seconds()
+        self._times[self.count % self.capacity] = pt
+        if self.record_lag:
+            self._row[_STAGE_INDEX['lag']] = time.time() - pt
+
+    def stage(self, name: str) -> None:
+        """record time elapsed since previous stage (or start) against stage `name`"""
+        t = time.perf_counter()
+        i = _STAGE_INDEX[name]
+        v = self._row[i]
+        self._row[i] = t - self._t if v is None else v + t - self._t
+        self._t = t
+
+    def end(self) -> None:
+        """finish timing processing of market book"""
+        self._row[_STAGE_INDEX['total']] = time.perf_counter() - self._t0
+        self._data[self.count % self.capacity] = np.array(self._row, dtype=float)
+        self.count += 1
+
+    def _ordered(self) -> (np.ndarray, np.ndarray):
+        """get publish timestamps and stage timings of books in ring buffer, oldest first"""
+        n = min(self.count, self.capacity)
+        i = self.count % self.capacity
+        if self.count <= self.capacity:
+            return self._times[:n], self._data[:n]
+        return np.roll(self._times, -i), np.roll(self._data, -i, axis=0)
+
+    def values(self) -> pd.DataFrame:
+        """get dataframe of stage timings in seconds (columns) indexed by book publish time"""
+        times, data = self._ordered()
+        return pd.DataFrame(data, index=pd.to_datetime(times, unit='s'), columns=LATENCY_STAGES)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """get count, sum, max and quantiles (in seconds) of timings in ring buffer for each stage that has run"""
+        _, data = self._ordered()
+        smry = {}
+        for i, name in enumerate(LATENCY_STAGES):
+            col = data[:, i]
+            col = col[~np.isnan(col)]
+            if not col.shape[0]:
+                continue
+            smry[name] = {
+                'count': int(col.shape[0]),
+                'sum': float(col.sum()),
+                'max': float(col.max()),
+            } | {
+                str(q): float(np.quantile(col, q)) for q in LATENCY_QUANTILES
+            }
+        return smry
+
+    def update_line(self, dt: datetime) -> str:
+        """
+        get line to write with strategy updates (as per `TradeTracker.log_update()`) of message type `MSG_LATENCY`,
+        with stage summary in message attributes and timings in ring buffer under 'latency' as publish timestamps
+        ('dt') and stage timings in microseconds (null where not run)
+        """
+        times, data = self._ordered()
+        latency = {'dt': times.tolist()} | {
+            name: [None if math.isnan(v) else round(v * 1e6) for v in data[:, i].tolist()]
+            for i, name in enumerate(LATENCY_STAGES)
+        }
+        return json.dumps({
+            'selection_id': None,
+            'dt': dt.timestamp(),
+            'msg_type': MessageTypes.MSG_LATENCY.name,
+            'msg_attrs': {
+                'market_id': self.market_id,
+                'count': self.count,
+                'summary': self.summary()
+            },
+            'display_odds': 0,
+            'order_info': None,
+            'trade_id': str(None),
+            'latency': latency
+        })
+
+
+def read_latency(buffer: str) -> pd.DataFrame:
+    """
+    get dataframe of stage timings in seconds (columns) indexed by book publish time from the `MSG_LATENCY` line of
+    strategy updates buffer, empty if not found
+    """
+    for line in buffer.splitlines():
+        if MessageTypes.MSG_LATENCY.name not in line:
+            continue
+        data = json.loads(line)
+        if data.get('msg_type') != MessageTypes.MSG_LATENCY.name:
+            continue
+        latency = data['latency']
+        index = pd.to_datetime(latency.pop('dt'), unit='s')
+        return pd.DataFrame(latency, index=index, dtype=float) / 1e6
+    return pd.DataFrame()
+
+
+def prometheus_text(recorders: Iterable[LatencyRecorder], metric: str = 'strategy_latency_seconds') -> str:
+    """get Prometheus text exposition of stage timing summaries for latency recorders, labelled by market and stage"""
+    lines = [
+        f'# HELP {metric} strategy market book processing time by stage',
+        f'# TYPE {metric} summary',
+    ]
+    for recorder in recorders:
+        for stage, smry in recorder.summary().items():
+            labels = f'market_id="{recorder.market_id}",stage="{stage}"'
+            for q in LATENCY_QUANTILES:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {smry[str(q)]:.9f}')
+            lines.append(f'{metric}_sum{{{labels}}} {smry["sum"]:.9f}')
+            lines.append(f'{metric}_count{{{labels}}} {smry["count"]}')
+    return '\n'.join(lines) + '\n'
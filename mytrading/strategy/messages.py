@@ -63,6 +63,7 @@ class MessageTypes(Enum):
     MSG_BACK_EMPTY = 'back empty'
     MSG_PRICE_INVALID = 'price invalid'
     MSG_CANCEL_ID_FAIL = 'cannot cancel'
+    MSG_LATENCY = 'processing latency'
 
 
 @register_formatter(MessageTypes.MSG_LAY_EMPTY)
@@ -207,3 +208,9 @@ def formatter(attrs: Dict) -> str:
 def foramtter(attrs: Dict) -> str:
     return f'cannot cancel order "{attrs.get("order_id")}", bet_id is None'
 
+
+@register_formatter(MessageTypes.MSG_LATENCY)
+def formatter(attrs: Dict) -> str:
+    total = attrs.get('summary', {}).get('total', {})
+    return f'market "{attrs.get("market_id")}" processed {attrs.get("count")} books, total processing time ' \
+           f'median {total.get("0.5", 0) * 1e3:.3f}ms, max {total.get("max", 0) * 1e3:.3f}ms'
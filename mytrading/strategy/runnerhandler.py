@@ -22,6 +22,7 @@ class RunnerHandler:
         self.features: FeatureHolder = features
         self.trade_tracker = trade_tracker
         self.trade_machine = trade_machine
+        # most recent user data received for market, None if not yet received
         self.user_data = None
 
     def rst_trade(self):
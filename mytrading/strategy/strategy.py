@@ -3,20 +3,23 @@ import uuid
 from datetime import datetime, timedelta
 from os import path
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Union, Callable
 import logging
 
+import pandas as pd
 from betfairlightweight.resources import MarketBook, RunnerBook
 from flumine import clients, BaseStrategy
 from flumine.markets.market import Market
 
-from .userdata import UserDataLoader, UserDataStreamer
+from .userdata import UserDataLoader, UserDataStreamer, stream_market_id
 from ..exceptions import MyStrategyException
 from ..utils import bettingdb
-from .feature import FeatureHolder
+from ..process.snapshot import BookSnapshot, market_snapshot, shared_book_value
+from .feature import FeatureHolder, FeatureWriter
 from .trademachine import RunnerTradeMachine
 from .tradestates import TradeStateTypes
-from .tradetracker import TradeTracker
+from .tradetracker import TradeTracker, UpdateWriter
+from .latency import LatencyRecorder, prometheus_text
 from .runnerhandler import RunnerHandler
 from myutils.edgedetector import EdgeDetector
 
@@ -39,6 +42,21 @@ class MyBaseStrategy(BaseStrategy):
             return True
 
 
+def stream_update_line(market_book: MarketBook) -> str:
+    """get line of market book streaming update in historical stream file format"""
+    # convert datetime to milliseconds since epoch
+    pt = int((market_book.publish_time - datetime.utcfromtimestamp(0)).total_seconds() * 1000)
+    # construct data in historical format
+    update = {
+        'op': 'mcm',
+        'clk': None,
+        'pt': pt,
+        'mc': [market_book.streaming_update]
+    }
+    # convert to string and add newline
+    return json.dumps(update) + '\n'
+
+
 class MyRecorderStrategy(BaseStrategy):
     """
     Record streaming updates by writing to file
@@ -95,17 +113,7 @@ class MyRecorderStrategy(BaseStrategy):
         if market_id in self.closed_markets:
             active_logger.warning(f'received market update for "{market_id}" when market closed')
         else:
-            # convert datetime to milliseconds since epoch
-            pt = int((market_book.publish_time - datetime.utcfromtimestamp(0)).total_seconds() * 1000)
-            # construct data in historical format
-            update = {
-                'op': 'mcm',
-                'clk': None,
-                'pt': pt,
-                'mc': [market_book.streaming_update]
-            }
-            # convert to string and add newline
-            update = json.dumps(update) + '\n'
+            update = shared_book_value(market, market_book, 'stream_update', stream_update_line)
             # write to file
             with open(self.market_paths[market_id], 'a') as f:
                 f.write(update)
@@ -127,6 +135,16 @@ class MarketHandler:
         self.closed = False
 
         self.path_features = ''
+        self.feature_writer: Optional[FeatureWriter] = None
+
+        # buffered writer of order updates, shared by runner trade trackers
+        self.update_writer: Optional[UpdateWriter] = None
+
+        # processing stage timings, None if not recorded
+        self.latency: Optional[LatencyRecorder] = None
+
+        # precomputed feature data to replay, (selection ID => feature data)
+        self.feature_data: Optional[Dict[int, Dict[str, pd.Series]]] = None
 
     def update_flag_feature(self, market_book: MarketBook, feature_seconds):
         """
@@ -201,10 +219,23 @@ class MyFeatureStrategy(MyBaseStrategy):
             store_features: bool = False,
             db_kwargs: Optional[Dict] = None,
             oc_seconds: Optional[int] = None,
+            oc_lead_seconds: float = 5,
+            lazy_features: bool = False,
+            strategy_id: Optional[Union[str, uuid.UUID]] = None,
+            feature_source: Optional[Callable[[str], Optional[Dict[int, Dict[str, pd.Series]]]]] = None,
+            update_flush_count: int = 1000,
+            update_flush_seconds: float = 5,
+            update_writer_thread: bool = False,
+            latency_capacity: int = 0,
+            user_data_sources: Optional[List[str]] = None,
+            framework_name: Optional[str] = None,
             **kwargs,
     ):
-        super().__init__(**kwargs)
-        self.strategy_id = uuid.uuid4()
+        # flumine strategy name (defaults to class name), must be distinct for instances placing orders on the same
+        # account at the same time as flumine matches orders to strategies by name
+        super().__init__(name=framework_name, **kwargs)
+        # strategy ID can be specified for multiple strategy instances writing to the same strategy
+        self.strategy_id = uuid.UUID(str(strategy_id)) if strategy_id else uuid.uuid4()
         self.pre_seconds = pre_seconds
         self.cutoff_seconds = cutoff_seconds
         self.feature_seconds = feature_seconds
@@ -213,13 +244,35 @@ class MyFeatureStrategy(MyBaseStrategy):
         self._db = bettingdb.BettingDB(**(db_kwargs or {}))
         self.historic = historic
         self.store_features = store_features
+        if lazy_features and store_features:
+            active_logger.warning('cannot use lazy feature evaluation when storing features, disabling lazy')
+            lazy_features = False
+        self.lazy_features = lazy_features
+        if feature_source and store_features:
+            active_logger.warning('cannot store features when replaying precomputed features, disabling store')
+            self.store_features = False
+        # function to get precomputed feature data for a market ID, replayed instead of processing features
+        self.feature_source = feature_source
+        # order updates buffering, written when number of lines or seconds since last write reached, or market closes
+        self.update_flush_count = update_flush_count
+        self.update_flush_seconds = update_flush_seconds
+        self.update_writer_thread = update_writer_thread
+        # number of market books of processing stage timings recorded per market, 0 to disable
+        self.latency_capacity = latency_capacity
         oc_td = timedelta(seconds=oc_seconds) if oc_seconds else None
         if historic:
             active_logger.info('client is historic, using recorded user data "UserDataLoader"')
-            self._usr_data = UserDataLoader(self._db, oc_td)
+            self._usr_data = UserDataLoader(self._db, oc_td, user_data_sources)
         else:
             active_logger.info('client is live, using streaming user data "UserData')
-            self._usr_data = UserDataStreamer(self._db, oc_td)
+            self._usr_data = UserDataStreamer(self._db, oc_td, timedelta(seconds=oc_lead_seconds))
+
+    def add(self) -> None:
+        """when historic, load user data of all markets in stream files of market filter in bulk"""
+        super().add()
+        if isinstance(self._usr_data, UserDataLoader) and isinstance(self.market_filter, dict):
+            paths = self.market_filter.get('markets') or []
+            self._usr_data.preload(stream_market_id(p) for p in paths)
 
     def strategy_write_info(self, init_kwargs):
         """write strategy information to file"""
@@ -286,24 +339,17 @@ class MyFeatureStrategy(MyBaseStrategy):
         """generate feature holder dictionary of feature instance for new runner"""
         raise NotImplementedError
 
-    def _feature_process(self, mb: MarketBook, mh: MarketHandler, selection_id, runner_index):
-        """process features for a given runner for new market book"""
-        # TODO - write feature values to file?
+    def _feature_process(self, mb: BookSnapshot, mh: MarketHandler, selection_id, runner_index):
+        """process features for a given runner for new market book snapshot"""
         def _dump(feature):
             feature.out_cache.clear()
-            for sub_ftr in feature.sub_features.items():
-                feature.out_cache.clear()
+            for sub_feature in feature.sub_features.values():
+                _dump(sub_feature)
 
-        lines = []
         def _add(feature):
             while len(feature.out_cache):
                 dt, val = feature.out_cache.popleft()
-                lines.append(json.dumps({
-                    'selection_id': selection_id,
-                    'dt': dt.isoformat(),
-                    'ftr_identifier': feature.ftr_identifier,
-                    'value': val
-                }) + '\n')
+                mh.feature_writer.add(selection_id, feature.ftr_identifier, dt, val)
             for sub_feature in feature.sub_features.values():
                 _add(sub_feature)
 
@@ -311,16 +357,15 @@ class MyFeatureStrategy(MyBaseStrategy):
         for feature in mh.runner_handlers[selection_id].features.values():
             feature.process_runner(mb, runner_index)
             func(feature)
-        if self.store_features:
-            with open(mh.path_features, 'a') as f:
-                f.writelines(lines)
-
 
     def _user_data_process(self, mb: MarketBook, mkt: Market, mh: MarketHandler):
+        """get user data for new market book, if updated then pass to runner handlers and subscribing features"""
         user_data = self._usr_data.get_user_data(mkt, mb)
+        if user_data is None:
+            return
         for rh in mh.runner_handlers.values():
             rh.user_data = user_data
-            for ftr in rh.features.values():
+            for ftr in rh.features.user_data_subscribers():
                 ftr.update_user_data(user_data)
 
     def _runner_handler_create(
@@ -329,7 +374,8 @@ class MyFeatureStrategy(MyBaseStrategy):
             feature_holder: FeatureHolder,
             update_path: str,
             trade_machine: RunnerTradeMachine,
-            market_id
+            market_id,
+            update_writer: Optional[UpdateWriter] = None
     ) -> RunnerHandler:
         """create runner handler instance on new runner"""
         return RunnerHandler(
@@ -338,7 +384,8 @@ class MyFeatureStrategy(MyBaseStrategy):
                 selection_id=runner_book.selection_id,
                 strategy=self,
                 market_id=market_id,
-                file_path=update_path
+                file_path=update_path,
+                writer=update_writer
             ),
             trade_machine=trade_machine,
             features=feature_holder
@@ -367,6 +414,21 @@ class MyFeatureStrategy(MyBaseStrategy):
             os.makedirs(d)
             _mh = self._market_handler_create(market, market_book)
             _mh.path_features = self._db.path_strat_features(market.market_id, self.strategy_id)
+            if self.store_features:
+                _mh.feature_writer = FeatureWriter(_mh.path_features)
+            _mh.update_writer = UpdateWriter(
+                udt_path,
+                flush_count=self.update_flush_count,
+                flush_seconds=self.update_flush_seconds,
+                background=self.update_writer_thread
+            )
+            if self.latency_capacity:
+                _mh.latency = LatencyRecorder(market.market_id, self.latency_capacity, record_lag=not self.historic)
+            if self.feature_source:
+                _mh.feature_data = self.feature_source(market.market_id)
+                if _mh.feature_data is None:
+                    active_logger.warning(f'no precomputed features found for market "{market.market_id}", '
+                                          f'processing features')
             self.market_handlers[market.market_id] = _mh
 
         # check market not closed
@@ -375,21 +437,38 @@ class MyFeatureStrategy(MyBaseStrategy):
             active_logger.warning(f'process_market_book called on market "{market.market_id}" which is closed already')
             return
 
+        lr = mh.latency
+        if lr is not None:
+            lr.start(market_book.publish_time)
+
         # update flags
         mh.update_flag_feature(market_book, self.feature_seconds)
         mh.update_flag_allow(market_book, self.pre_seconds)
         mh.update_flag_cutoff(market_book, self.cutoff_seconds)
+        if lr is not None:
+            lr.stage('flags')
 
         # check that features are to be processed, loop runners
         if mh.flag_feature.current_value:
+            # convert market book to snapshot once for all runner features, replayed features only read publish time so
+            # do not need converting
+            if mh.feature_data is None:
+                snapshot = market_snapshot(market, market_book)
+            else:
+                snapshot = market_book
+
             # initialise runners if not tracked
             for runner_index, runner_book in enumerate(market_book.runners):
                 if runner_book.selection_id not in mh.runner_handlers:
                     # create runner features
                     feature_holder = self._feature_holder_create(market, market_book, runner_book, runner_index)
+                    if mh.feature_data is not None:
+                        feature_holder = feature_holder.replay(mh.feature_data.get(runner_book.selection_id, {}))
+                    elif self.lazy_features:
+                        feature_holder.set_lazy(True)
                     # initialise for race
                     for feature in feature_holder.values():
-                        feature.race_initializer(runner_book.selection_id, market_book)
+                        feature.race_initializer(runner_book.selection_id, snapshot)
                     # create runner handler
                     tm = self._trade_machine_create(market, market_book, runner_book, runner_index)
                     mh.runner_handlers[runner_book.selection_id] = self._runner_handler_create(
@@ -397,21 +476,37 @@ class MyFeatureStrategy(MyBaseStrategy):
                         feature_holder=feature_holder,
                         update_path=udt_path,
                         trade_machine=tm,
-                        market_id=market.market_id
+                        market_id=market.market_id,
+                        update_writer=mh.update_writer
                     )
-            # process user data and runner features
+            if lr is not None:
+                lr.stage('runner_init')
+
+            # process user data once for market book, then runner features
+            self._user_data_process(market_book, market, mh)
+            if lr is not None:
+                lr.stage('user_data')
             for runner_index, runner_book in enumerate(market_book.runners):
-                self._user_data_process(market_book, market, mh)
-                self._feature_process(market_book, mh, runner_book.selection_id, runner_index)
+                self._feature_process(snapshot, mh, runner_book.selection_id, runner_index)
+            if lr is not None:
+                lr.stage('features')
 
             # check if trading is to be performed (features flag *should* always be true if allow flag is)
             for runner_index, runner_book in enumerate(market_book.runners):
                 rh = mh.runner_handlers[runner_book.selection_id]
-                # run trade machine if permitted
-                if self._trade_machine_allow(market_book, runner_book, mh, rh):
+                # run trade machine if permitted, and not waiting in a state for a wake condition
+                if self._trade_machine_allow(market_book, runner_book, mh, rh) and \
+                        rh.trade_machine.is_awake(market_book, runner_index):
                     self._trade_machine_run(market, market_book, runner_book, runner_index)
+                if lr is not None:
+                    lr.stage('trade_machine')
                 # update order tracker
                 rh.trade_tracker.update_order_tracker(market_book.publish_time)
+                if lr is not None:
+                    lr.stage('order_tracker')
+
+        if lr is not None:
+            lr.end()
 
     def process_closed_market(self, market: Market, market_book: MarketBook) -> None:
         # check market that is closing is in trade trackers
@@ -429,4 +524,23 @@ class MyFeatureStrategy(MyBaseStrategy):
         # loop runners -> trades -> orders
         for selection_id, rh in mh.runner_handlers.items():
             rh.trade_tracker.log_close(market_book.publish_time)
+        if mh.latency and mh.update_writer:
+            mh.update_writer.write(mh.latency.update_line(market_book.publish_time))
+        if mh.update_writer:
+            mh.update_writer.close()
+        if mh.feature_writer:
+            mh.feature_writer.flush()
         del mh.runner_handlers
+
+    def latency_metrics(self) -> str:
+        """get Prometheus text exposition of processing stage timings for markets recording latency"""
+        return prometheus_text(mh.latency for mh in self.market_handlers.values() if mh.latency)
+
+    def finish(self, flumine) -> None:
+        # write buffered order updates and feature values of markets that have not closed
+        for mh in self.market_handlers.values():
+            if mh.update_writer:
+                mh.update_writer.close()
+            if mh.feature_writer:
+                mh.feature_writer.flush()
+        self._usr_data.close()
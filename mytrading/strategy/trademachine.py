@@ -1,17 +1,73 @@
 from mytrading.strategy.messages import MessageTypes
 from myutils import statemachine as stm
 from flumine.markets.market import Market
+from flumine.order.order import BetfairOrder
+from betfairlightweight.resources.bettingresources import MarketBook
 import logging
-from typing import Dict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 
 active_logger = logging.getLogger(__name__)
 active_logger.setLevel(logging.INFO)
 
 
+def _order_state(order: BetfairOrder) -> Tuple:
+    return order.status, order.size_matched, order.order_type.price
+
+
+def _best_price(available: List[Dict]) -> float:
+    return available[0]['price'] if available else 0
+
+
+class WakeCondition:
+    """
+    conditions on which to wake a trade machine that is waiting in a state, so it is not run on every market book -
+    wakes when any of:
+    - publish time reaches `deadline`
+    - any of `orders` change status, matched size or price from when the condition was created
+    - runner best back (or best lay) price, 0 if none available, moves outside of inclusive range `back_band` (or
+    `lay_band`) of (lower, upper) prices
+
+    a condition with none of the above set only wakes when the trade machine is forced to change state
+    """
+    __slots__ = ['deadline', 'orders', 'back_band', 'lay_band']
+
+    def __init__(
+            self,
+            deadline: Optional[datetime] = None,
+            orders: Optional[List[BetfairOrder]] = None,
+            back_band: Optional[Tuple[float, float]] = None,
+            lay_band: Optional[Tuple[float, float]] = None
+    ):
+        self.deadline = deadline
+        self.orders = [(o, _order_state(o)) for o in orders or [] if o is not None]
+        self.back_band = back_band
+        self.lay_band = lay_band
+
+    def fired(self, market_book: MarketBook, runner_index: int) -> bool:
+        """determine if condition met for runner at `runner_index` in market book"""
+        if self.deadline is not None and market_book.publish_time >= self.deadline:
+            return True
+        for order, state in self.orders:
+            if _order_state(order) != state:
+                return True
+        if self.back_band or self.lay_band:
+            ex = market_book.runners[runner_index].ex
+            if self.back_band and not (self.back_band[0] <= _best_price(ex.available_to_back) <= self.back_band[1]):
+                return True
+            if self.lay_band and not (self.lay_band[0] <= _best_price(ex.available_to_lay) <= self.lay_band[1]):
+                return True
+        return False
+
+
 class RunnerTradeMachine(stm.StateMachine):
     """
     implement state machine for runners, logging state changes with runner ID
+
+    after running, the current state can set a wake condition (see `TradeStateBase.wake_condition()`), where the
+    machine does not need to run again until it fires (see `is_awake()`) - the condition is cleared if the machine is
+    flushed or forced to change state
     """
 
     # override state types
@@ -20,6 +76,23 @@ class RunnerTradeMachine(stm.StateMachine):
     def __init__(self, states: Dict, initial_state: Enum, selection_id: int):
         super().__init__(states, initial_state)
         self.selection_id = selection_id
+        self.wake: Optional[WakeCondition] = None
+
+    def is_awake(self, market_book: MarketBook, runner_index: int) -> bool:
+        """determine if trade machine needs to be run for market book"""
+        return self.wake is None or self.wake.fired(market_book, runner_index)
+
+    def flush(self):
+        super().flush()
+        self.wake = None
+
+    def force_change(self, new_states: List[Enum]):
+        super().force_change(new_states)
+        self.wake = None
+
+    def run(self, market: Market, runner_index: int, runner_handler):
+        super().run(market=market, runner_index=runner_index, runner_handler=runner_handler)
+        self.wake = self.states[self.current_state_key].wake_condition(market, runner_index, runner_handler)
 
     def process_state_change(
             self, old_state: Enum, new_state: Enum, market: Market, runner_index: int, runner_handler
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Union
+from typing import List, Union, Optional
 from datetime import datetime, timedelta
 from flumine.controls.clientcontrols import MaxTransactionCount
 
@@ -10,11 +10,12 @@ from flumine.order.ordertype import LimitOrder, OrderTypes
 from flumine.order.trade import TradeStatus
 from betfairlightweight.resources.bettingresources import RunnerBook
 
-from ..process import MatchBetSums, get_order_profit, get_side_operator, get_side_ladder, side_invert, closest_tick, \
-    LTICKS_DECODED
+from ..process import MatchBetSums, get_order_profit, get_side_operator, get_side_ladder, side_invert, \
+    side_tick_offset, TICK_INDEX, get_best_price
 from ..exceptions import TradeStateException
 from mytrading.strategy.messages import MessageTypes
 from .runnerhandler import RunnerHandler
+from .trademachine import WakeCondition
 from myutils import statemachine as stm
 
 
@@ -85,6 +86,16 @@ class TradeStateBase(stm.State):
         """
         raise NotImplementedError
 
+    def wake_condition(
+            self, market: Market, runner_index: int, runner_handler: RunnerHandler
+    ) -> Optional[WakeCondition]:
+        """
+        called after run() where the state has not changed, return a condition on which the state needs to run again,
+        where until it fires run() would remain in the same state without any other effect - return None (default) to
+        run on every market book
+        """
+        return None
+
     def __str__(self):
         return f'Trade state: {self.name}'
 
@@ -118,6 +129,14 @@ class TradeStatePending(TradeStateIntermediary):
     def enter(self, market: Market, runner_index: int, runner_handler: RunnerHandler):
         self.first_call = True
 
+    def _orders(self, runner_handler: RunnerHandler) -> List[BetfairOrder]:
+        # select either active order or all active trade orders
+        trk = runner_handler.trade_tracker
+        if not self.all_trade_orders:
+            return [trk.active_order]
+        else:
+            return trk.active_trade.orders if trk.active_trade else []
+
     def run(self, market: Market, runner_index: int, runner_handler: RunnerHandler):
         """called to operate state - return None to remain in same state, or return string for new state"""
         # hold for 1 state
@@ -126,15 +145,8 @@ class TradeStatePending(TradeStateIntermediary):
             if self.delay_once:
                 return False
 
-        # select either active order or all active trade orders
-        trk = runner_handler.trade_tracker
-        if not self.all_trade_orders:
-            orders = [trk.active_order]
-        else:
-            orders = trk.active_trade.orders if trk.active_trade else []
-
         # loop orders
-        for order in orders:
+        for order in self._orders(runner_handler):
             # ignore, go to next order if doesn't exist
             if order is None:
                 continue
@@ -145,6 +157,14 @@ class TradeStatePending(TradeStateIntermediary):
         # exit state if all order(s) not pending
         return True
 
+    def wake_condition(
+            self, market: Market, runner_index: int, runner_handler: RunnerHandler
+    ) -> Optional[WakeCondition]:
+        orders = self._orders(runner_handler)
+        if any(o is not None and o.status in order_pending_states for o in orders):
+            return WakeCondition(orders=orders)
+        return None
+
 
 class TradeStateBin(TradeStateIntermediary):
     """
@@ -215,6 +235,11 @@ class TradeStateWait(TradeStateIntermediary):
     def run(self, market: Market, runner_index: BaseStrategy, runner_handler: RunnerHandler):
         return (market.market_book.publish_time - self.start_time) >= self.td
 
+    def wake_condition(
+            self, market: Market, runner_index: int, runner_handler: RunnerHandler
+    ) -> Optional[WakeCondition]:
+        return WakeCondition(deadline=self.start_time + self.td)
+
 
 # core states
 class TradeStateCreateTrade(TradeStateBase):
@@ -399,7 +424,7 @@ class TradeStateHedgePlaceBase(TradeStateBase):
         green_price = round(green_price, ndigits=2)
 
         # if function returns 0 or invalid then error
-        if green_price <= 0 or green_price and green_price not in LTICKS_DECODED:
+        if green_price <= 0 or green_price and green_price not in TICK_INDEX:
             runner_handler.trade_tracker.log_update(
                 msg_type=MessageTypes.MSG_GREEN_INVALID,
                 msg_attrs={
@@ -624,13 +649,7 @@ class TradeStateHedgePlaceQueue(TradeStateHedgePlaceBase):
         if not self.tick_offset:
             return price
 
-        index = closest_tick(price, return_index=True)
-        if close_side == 'BACK':
-            index = max(index - self.tick_offset, 0)
-        else:
-            index = min(index + self.tick_offset, len(LTICKS_DECODED) - 1)
-
-        return LTICKS_DECODED[index]
+        return side_tick_offset(price, self.tick_offset, close_side)
 
 
 class TradeStateHedgeWaitQueue(TradeStateHedgeWaitBase):
@@ -703,15 +722,10 @@ class TradeStateHedgeWaitQueue(TradeStateHedgeWaitBase):
             return 0
 
         # get available price
-        new_price = available[0]['price']
-        price_index = closest_tick(new_price, return_index=True)
+        new_price = side_tick_offset(available[0]['price'], self.tick_offset, order.side)
         if order.side == 'BACK':
-            price_index = max(price_index - self.tick_offset, 0)
-            new_price = LTICKS_DECODED[price_index]
             proceed = new_price < order.order_type.price
         else:
-            price_index = min(price_index + self.tick_offset, len(LTICKS_DECODED) - 1)
-            new_price = LTICKS_DECODED[price_index]
             proceed = new_price > order.order_type.price
 
         if not self.moving:
@@ -729,6 +743,24 @@ class TradeStateHedgeWaitQueue(TradeStateHedgeWaitBase):
         # price not moved
         return 0
 
+    def wake_condition(
+            self, market: Market, runner_index: int, runner_handler: RunnerHandler
+    ) -> Optional[WakeCondition]:
+        # only wait for changes when hedge is matching, where new price depends only on order, best price on hedging
+        # side of book and time since price started moving
+        order = runner_handler.trade_tracker.active_order
+        if not order or order.status != OrderStatus.EXECUTABLE:
+            return None
+        hedge_side = side_invert(order.side)
+        price = get_best_price(get_side_ladder(market.market_book.runners[runner_index].ex, hedge_side)) or 0
+        band = (price, price)
+        return WakeCondition(
+            deadline=self.reset_time + timedelta(milliseconds=self.hold_time_ms) if self.moving else None,
+            orders=[order],
+            back_band=band if hedge_side == 'BACK' else None,
+            lay_band=band if hedge_side == 'LAY' else None,
+        )
+
 
 class TradeStateClean(TradeStateBase):
 
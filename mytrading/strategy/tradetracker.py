@@ -1,14 +1,17 @@
 from __future__ import annotations
-from flumine.order.order import BetfairOrder, OrderStatus
+from flumine.order.order import BetfairOrder, OrderStatus, COMPLETE_STATUS
 from flumine.order.trade import Trade, TradeStatus
 from flumine.order.ordertype import LimitOrder
 
 import logging
+import queue
+import threading
+import time
 from enum import Enum
 import pandas as pd
 from datetime import datetime
 from uuid import UUID
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from os import path
 import json
 from dataclasses import dataclass, field
@@ -20,6 +23,39 @@ from ..process import get_order_profit
 active_logger = logging.getLogger(__name__)
 active_logger.setLevel(logging.INFO)
 
+# compact order update record keys, mapped to their locations in serialized order info
+ORDER_UPDATE_PATHS = {
+    'status': [('status', )],
+    'bet_id': [('bet_id', )],
+    'size_matched': [('info', 'size_matched')],
+    'size_remaining': [('info', 'size_remaining')],
+    'size_cancelled': [('info', 'size_cancelled')],
+    'size_lapsed': [('info', 'size_lapsed')],
+    'size_voided': [('info', 'size_voided')],
+    'average_price_matched': [('average_price_matched', ), ('info', 'average_price_matched')],
+    'runner_status': [('runner_status', )],
+    'violation_msg': [('violation_msg', )],
+    'trade_status': [('trade', 'status')],
+}
+
+
+def apply_order_update(order_info: Dict, order_update: Dict) -> Dict:
+    """
+    get new serialized order info from existing with changed values of compact order update record applied (existing
+    order info is not modified)
+    """
+    order_info = order_info | {
+        'info': order_info['info'].copy(),
+        'trade': order_info['trade'].copy()
+    }
+    for k, v in order_update.items():
+        for keys in ORDER_UPDATE_PATHS.get(k, []):
+            d = order_info
+            for key in keys[:-1]:
+                d = d[key]
+            d[keys[-1]] = v
+    return order_info
+
 
 @dataclass
 class OrderTracker:
@@ -30,9 +66,103 @@ class OrderTracker:
 
 @dataclass
 class TradeFollower:
-    """track the status of a trade"""
+    """
+    track the status of a trade, with number of trade orders already scanned and limit orders that are not yet
+    complete
+    """
     status: TradeStatus = field(default=None)
     order_trackers: Dict[str, OrderTracker] = field(default_factory=dict)
+    n_orders: int = 0
+    live_orders: Dict[str, BetfairOrder] = field(default_factory=dict)
+
+
+class UpdateWriter:
+    """
+    buffered writer of order update lines to a strategy updates file, shared by trade trackers of all runners in a
+    market
+
+    lines are buffered and appended to file in a single write when `flush_count` lines are buffered, when
+    `flush_seconds` have elapsed since the last write or when `flush()`/`close()` are called
+
+    if `background` is True, lines are passed to a writer thread via a queue so that file writes happen off the thread
+    calling `write()`
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(
+            self,
+            file_path: str,
+            flush_count: int = 1000,
+            flush_seconds: float = 5.0,
+            background: bool = False
+    ):
+        self.file_path = file_path
+        self.flush_count = flush_count
+        self.flush_seconds = flush_seconds
+        self._lines: List[str] = []
+        self._last_write = time.monotonic()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='update-writer', daemon=True)
+            self._thread.start()
+
+    def _add(self, line: str) -> None:
+        self._lines.append(line)
+        if len(self._lines) >= self.flush_count or time.monotonic() - self._last_write >= self.flush_seconds:
+            self._write()
+
+    def _write(self) -> None:
+        if self._lines:
+            with open(self.file_path, mode='a') as f:
+                f.write('\n'.join(self._lines) + '\n')
+            self._lines = []
+        self._last_write = time.monotonic()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                item = None
+            try:
+                if item is None or item is self._FLUSH or item is self._STOP:
+                    self._write()
+                else:
+                    self._add(item)
+            except OSError as e:
+                active_logger.error(f'failed to write order updates to file "{self.file_path}": {e}')
+            finally:
+                if item is not None:
+                    self._queue.task_done()
+            if item is self._STOP:
+                return
+
+    def write(self, line: str) -> None:
+        """add line (without newline) to be written to file"""
+        if self._queue is not None:
+            self._queue.put(line)
+        else:
+            self._add(line)
+
+    def flush(self) -> None:
+        """write all buffered lines to file, waiting for writer thread to catch up if running in background"""
+        if self._queue is not None:
+            self._queue.put(self._FLUSH)
+            self._queue.join()
+        else:
+            self._write()
+
+    def close(self) -> None:
+        """write all buffered lines to file and stop writer thread if running"""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        self._write()
 
 
 class TradeTracker:
@@ -45,12 +175,28 @@ class TradeTracker:
 
     `open_side` indicates the side of the open order for the current trade
 
-    if `file_path` is specified, it is used as the path to log updates to as well as logging to stream
+    if `file_path` is specified, it is used as the path to log updates to as well as logging to stream - updates are
+    written with `writer` if specified (so a buffered writer can be shared between runners in a market), otherwise
+    each update is written to file immediately
+
+    the first update written for an order has full serialized order info under 'order_info', subsequent updates for
+    the order have a compact record under 'order_update' of the order ID and values in `ORDER_UPDATE_PATHS` that have
+    changed since last written (use `read_updates()` to get updates with full order info)
     """
-    def __init__(self, selection_id: int, strategy, market_id, file_path: Optional[str] = None):
+    def __init__(
+            self,
+            selection_id: int,
+            strategy,
+            market_id,
+            file_path: Optional[str] = None,
+            writer: Optional[UpdateWriter] = None
+    ):
         active_logger.info(f'creating trade tracker with selection ID "{selection_id}" and file path "{file_path}"')
         self.selection_id = selection_id
         self.file_path = file_path
+        if writer is None and file_path:
+            writer = UpdateWriter(file_path, flush_count=1)
+        self.writer = writer
 
         self._trades: List[Trade] = list()
         self.active_trade: Optional[Trade] = None
@@ -62,7 +208,13 @@ class TradeTracker:
 
         # indexed by trade ID
         self._trade_followers: Dict[UUID, TradeFollower] = dict()
-        self._followed_orders = list()
+        self._followed_orders: Set[str] = set()
+
+        # trades that are not complete or have orders not complete, indexed by trade ID
+        self._live_trades: Dict[UUID, Trade] = dict()
+
+        # last written compact order update values, indexed by order ID
+        self._order_values: Dict[str, Dict] = dict()
 
     def create_trade(self, handicap):
         trade = Trade(
@@ -73,6 +225,7 @@ class TradeTracker:
         )
         self._trades.append(trade)
         self._trade_followers[trade.id] = TradeFollower()
+        self._live_trades[trade.id] = trade
         self.active_trade = trade
 
     @staticmethod
@@ -82,16 +235,13 @@ class TradeTracker:
         # copy order info so modifications don't change original object
         info = order.info.copy()
 
-        # convert trade ID to string
-        info['trade']['id'] = str(info['trade']['id'])
-
-        # dont store strategy info
-        # convert strategy object in trade to dict of info
-        # info['trade']['strategy'] = info['trade']['strategy'].info
-        del info['trade']['strategy']
-
-        # convert strategy status to string
-        info['trade']['status'] = str(info['trade']['status'])
+        # build new trade info rather than modifying nested dict, dont store strategy info and convert trade ID and
+        # status to strings
+        trade = info['trade']
+        info['trade'] = {k: v for k, v in trade.items() if k != 'strategy'} | {
+            'id': str(trade['id']),
+            'status': str(trade['status'])
+        }
 
         # add runner status to order
         info['runner_status'] = str(order.runner_status)
@@ -102,6 +252,23 @@ class TradeTracker:
 
         return info
 
+    @staticmethod
+    def order_update_values(order: BetfairOrder) -> Dict:
+        """get values of order that change during its lifetime, as written in compact order update records"""
+        return {
+            'status': order.status.value if order.status else None,
+            'bet_id': order.bet_id,
+            'size_matched': order.size_matched,
+            'size_remaining': order.size_remaining,
+            'size_cancelled': order.size_cancelled,
+            'size_lapsed': order.size_lapsed,
+            'size_voided': order.size_voided,
+            'average_price_matched': order.average_price_matched,
+            'runner_status': str(order.runner_status),
+            'violation_msg': order.violation_msg,
+            'trade_status': str(order.trade.status.value if order.trade.status else None),
+        }
+
     @staticmethod
     def get_runner_profits(updates_path: str) -> Dict:
         df = TradeTracker.get_order_updates(updates_path)
@@ -115,14 +282,32 @@ class TradeTracker:
 
 
     @staticmethod
-    def get_orders_from_buffer(buffer: str) -> pd.DataFrame:
-        lines = buffer.splitlines()
+    def read_updates(buffer: str) -> List[Dict]:
+        """
+        parse lines of buffer written by `TradeTracker.log_update`, expanding compact order update records so that each
+        update with an order has full serialized order info under 'order_info' as it was at the time of update
+        """
         try:
-            order_data = [json.loads(line) for line in lines]
+            lines = [json.loads(line) for line in buffer.splitlines()]
         except (ValueError, TypeError) as e:
             raise TradeTrackerException(f'Cannot json parse order updates: {e}')
 
-        order_df = pd.DataFrame(order_data)
+        # latest order info, indexed by order ID
+        orders: Dict[str, Dict] = dict()
+        for line in lines:
+            order_update = line.pop('order_update', None)
+            if order_update:
+                order_id = order_update['id']
+                if order_id not in orders:
+                    raise TradeTrackerException(f'Order update for "{order_id}" has no preceding order info')
+                line['order_info'] = orders[order_id] = apply_order_update(orders[order_id], order_update)
+            elif line.get('order_info'):
+                orders[line['order_info']['id']] = line['order_info']
+        return lines
+
+    @staticmethod
+    def get_orders_from_buffer(buffer: str) -> pd.DataFrame:
+        order_df = pd.DataFrame(TradeTracker.read_updates(buffer))
         if order_df.shape[0]:
             order_df.index = order_df['dt'].apply(datetime.fromtimestamp)
         return order_df
@@ -157,13 +342,16 @@ class TradeTracker:
 
     def update_order_tracker(self, publish_time: datetime):
         """
-        loop orders in each trade instance, and log update message where order amount matched or status has changed
+        loop live trades and their orders, and log update message where order amount matched or status has changed
         since last call of function
+
+        orders are retired from tracking once complete and trades once complete with no live orders (unless it is the
+        active trade, which may still have orders added), so cost is proportional to live orders rather than all orders
         """
         tfs = self._trade_followers
 
         # loop trades
-        for trade in self._trades:
+        for trade in list(self._live_trades.values()):
             # log trade status updates
             tf = tfs[trade.id]
             if tf.status != trade.status:
@@ -177,27 +365,12 @@ class TradeTracker:
                 )
             tf.status = trade.status
 
-            # loop limit orders in trade
-            for order in [o for o in trade.orders if type(o.order_type) == LimitOrder]:
-                # if order untracked, create order tracker and track
-                if order.id not in self._followed_orders:
-                    self.log_update(
-                        msg_type=MessageTypes.MSG_TRACK_ORDER,
-                        dt=publish_time,
-                        msg_attrs={
-                            "order_id": order.id
-                        },
-                        order=order
-                    )
-                    tf.order_trackers[order.id] = OrderTracker(
-                        matched=order.size_matched,
-                        status=order.status
-                    )
-                    self._followed_orders.append(order.id)
-                    continue
+            # loop live limit orders in trade
+            for order in list(tf.live_orders.values()):
+                order_tracker = tf.order_trackers[order.id]
 
                 # check if size matched change
-                if order.size_matched != tf.order_trackers[order.id].matched:
+                if order.size_matched != order_tracker.matched:
                     self.log_update(
                         msg_type=MessageTypes.MSG_MATCHED_SIZE,
                         dt=publish_time,
@@ -213,7 +386,7 @@ class TradeTracker:
                     )
 
                 # check for status change
-                if order.status != tf.order_trackers[order.id].status:
+                if order.status != order_tracker.status:
 
                     msg = ''
                     if order.status == OrderStatus.VIOLATION:
@@ -235,8 +408,38 @@ class TradeTracker:
                     )
 
                 # update cached order status and size matched values
-                tf.order_trackers[order.id].status = order.status
-                tf.order_trackers[order.id].matched = order.size_matched
+                order_tracker.status = order.status
+                order_tracker.matched = order.size_matched
+
+                # retire complete orders
+                if order.status in COMPLETE_STATUS:
+                    del tf.live_orders[order.id]
+
+            # orders are only appended to trade, so only check orders added since last call
+            new_orders = trade.orders[tf.n_orders:]
+            tf.n_orders = len(trade.orders)
+            for order in new_orders:
+                # if limit order untracked, create order tracker and track
+                if type(order.order_type) == LimitOrder and order.id not in self._followed_orders:
+                    self.log_update(
+                        msg_type=MessageTypes.MSG_TRACK_ORDER,
+                        dt=publish_time,
+                        msg_attrs={
+                            "order_id": order.id
+                        },
+                        order=order
+                    )
+                    tf.order_trackers[order.id] = OrderTracker(
+                        matched=order.size_matched,
+                        status=order.status
+                    )
+                    self._followed_orders.add(order.id)
+                    if order.status not in COMPLETE_STATUS:
+                        tf.live_orders[order.id] = order
+
+            # retire complete trade with no live orders
+            if trade.status == TradeStatus.COMPLETE and not tf.live_orders and trade is not self.active_trade:
+                del self._live_trades[trade.id]
 
     def log_close(self, publish_time: datetime):
         for trade in self._trades:
@@ -272,8 +475,9 @@ class TradeTracker:
         - order: instance of BetfairOrder which will be logged to file
         """
 
-        # print update to stream
-        active_logger.log(level, f'{dt} {self.selection_id} {format_message(msg_type.name, msg_attrs)}')
+        # print update to stream, only formatting message if it will be logged
+        if active_logger.isEnabledFor(level):
+            active_logger.log(level, f'{dt} {self.selection_id} {format_message(msg_type.name, msg_attrs)}')
 
         # use previous log odds if not given and update
         if not display_odds and self._prv_display_odds:
@@ -291,13 +495,7 @@ class TradeTracker:
         trade_id = trade.id if trade else None
 
         # write to file if path specified
-        if self.file_path and to_file:
-
-            # get order serialized info (if exist)
-            if order:
-                order_info = self.serializable_order_info(order)
-            else:
-                order_info = None
+        if self.writer and to_file:
 
             # convert message attrs to empty dict if not set
             msg_attrs = msg_attrs or {}
@@ -308,12 +506,24 @@ class TradeTracker:
                 'msg_type': msg_type.name,
                 'msg_attrs': msg_attrs,
                 'display_odds': display_odds,
-                'order_info': order_info,
                 'trade_id': str(trade_id)
             }
-            with open(self.file_path, mode='a') as f:
-                try:
-                    json_data = json.dumps(data)
-                except TypeError as e:
-                    raise TradeTrackerException(f'failed to serialise data writing to file: "{self.file_path}"\n{e}')
-                f.writelines([json_data + '\n'])
+
+            # get order serialized info on first update of order, then only changed values (if order exists)
+            if order:
+                values = self.order_update_values(order)
+                prv_values = self._order_values.get(order.id)
+                if prv_values is None:
+                    data['order_info'] = self.serializable_order_info(order)
+                else:
+                    data['order_update'] = {'id': order.id} | {
+                        k: v for k, v in values.items() if v != prv_values[k]
+                    }
+                self._order_values[order.id] = values
+            else:
+                data['order_info'] = None
+            try:
+                json_data = json.dumps(data)
+            except TypeError as e:
+                raise TradeTrackerException(f'failed to serialise data writing to file: "{self.writer.file_path}"\n{e}')
+            self.writer.write(json_data)
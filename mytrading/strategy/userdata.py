@@ -1,9 +1,10 @@
+import bisect
 import json
 import os
-from collections import deque
+import queue
 from datetime import timedelta, datetime
 from os import path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Iterable, Tuple
 import logging
 import pytz
 from flumine.markets.market import Market, MarketBook, MarketCatalogue
@@ -26,42 +27,127 @@ class UserDataBase:
     def get_user_data(self, market: Market, market_book: MarketBook) -> Optional[Dict]:
         raise NotImplementedError
 
+    def close(self) -> None:
+        """release any resources used retrieving user data"""
+        pass
+
+
+def stream_market_id(file_path: str) -> str:
+    """get market ID from first update of market stream file"""
+    with open(file_path, 'r') as f:
+        return json.loads(f.readline())['mc'][0]['id']
+
+
+def _entry_dt(timestamp) -> datetime:
+    """
+    get naive UTC datetime of user data entry timestamp, either float as written by `UserDataStreamer` (from naive
+    publish time via `datetime.timestamp()`, so is inverted with `datetime.fromtimestamp()`) or ISO format string
+    """
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp)
+    return datetime.fromtimestamp(timestamp)
+
 
 class UserDataLoader(UserDataBase):
-    """load historic recorded user data from database cache"""
-    def __init__(self, db: bettingdb.BettingDB, oc_td: timedelta):
+    """
+    load historic recorded user data from database cache
+
+    updates of each market are read from each of the `sources` market stream cache columns (default just "user_data")
+    and indexed by timestamp, then all updates due up to the publish time of a market book are returned together, with
+    later updates overriding keys of earlier updates - markets can be loaded in bulk before running with `preload()`
+    """
+    def __init__(self, db: bettingdb.BettingDB, oc_td: timedelta, sources: Optional[List[str]] = None):
         super().__init__(db, oc_td)
-        active_logger.warning(f'timedelta passed to user data loader "{oc_td}" has no effect in historic mode')
-        self._usr_mkt_data = dict()
+        if oc_td is not None:
+            active_logger.warning(f'timedelta passed to user data loader "{oc_td}" has no effect in historic mode')
+        self._sources = sources or ['user_data']
+        # sorted update timestamps and updates, indexed by market ID
+        self._mkt_times: Dict[str, List[datetime]] = dict()
+        self._mkt_updates: Dict[str, List[Dict]] = dict()
+        # index of next update not yet returned, indexed by market ID
+        self._mkt_index: Dict[str, int] = dict()
+
+    def _read_source(self, market_id: str, source: str) -> List[Tuple[datetime, Dict]]:
+        p = self._db.path_mkt_usr_updates(market_id, source)
+        if not (path.exists(p) and path.isfile(p)):
+            active_logger.debug(f'market "{market_id}", user data path "{p}" does not exist')
+            return []
+        entries = []
+        with open(p, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'timestamp' not in entry or 'user_update' not in entry:
+                    active_logger.warning(f'market "{market_id}", "timestamp" or "user_update" not in user data entry')
+                    continue
+                entries.append((_entry_dt(entry['timestamp']), entry['user_update']))
+        return entries
+
+    def load(self, market_id: str) -> None:
+        """read and index user data updates of market from all sources"""
+        entries = []
+        for source in self._sources:
+            entries.extend(self._read_source(market_id, source))
+        # stable sort, so updates with equal timestamps are kept in source order
+        entries.sort(key=lambda e: e[0])
+        self._mkt_times[market_id] = [e[0] for e in entries]
+        self._mkt_updates[market_id] = [e[1] for e in entries]
+        self._mkt_index[market_id] = 0
+        active_logger.debug(f'market "{market_id}", loaded {len(entries)} user data updates')
+
+    def preload(self, market_ids: Iterable[str]) -> None:
+        """load user data updates of markets not already loaded"""
+        n = 0
+        for market_id in market_ids:
+            if market_id not in self._mkt_times:
+                self.load(market_id)
+                n += len(self._mkt_times[market_id])
+        active_logger.info(f'preloaded {n} user data updates')
 
     def get_user_data(self, market: Market, market_book: MarketBook) -> Optional[Dict]:
-        if market.market_id not in self._usr_mkt_data:
-            p = self._p_cache(market.market_id)
-            self._usr_mkt_data[market.market_id] = deque()
-            if not (path.exists(p) and path.isfile(p)):
-                active_logger.warning(f'market "{market.market_id}", path "{p}" does not exist')
-            else:
-                with open(p, 'r') as f:
-                    for line in f:
-                        entry = json.loads(line)
-                        if 'timestamp' or 'user_update' not in entry:
-                            active_logger.warning(f'"timestamp" or "user_data" not in user data entry')
-                        else:
-                            entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
-                            self._usr_mkt_data[market.market_id].append(entry)
-        dq = self._usr_mkt_data[market.market_id]
-        if len(dq):
-            if market_book.publish_time >= dq[0]['timestamp']:
-                return dq.popleft()['user_update']
-        return None
+        market_id = market.market_id
+        if market_id not in self._mkt_times:
+            self.load(market_id)
+        times = self._mkt_times[market_id]
+        i = self._mkt_index[market_id]
+        if i >= len(times) or market_book.publish_time < times[i]:
+            return None
+        j = bisect.bisect_right(times, market_book.publish_time, lo=i)
+        self._mkt_index[market_id] = j
+        updates = self._mkt_updates[market_id]
+        if j - i == 1:
+            return updates[i]
+        user_data = dict()
+        for update in updates[i:j]:
+            user_data.update(update)
+        return user_data
 
 
 class UserDataStreamer(UserDataBase):
-    """stream user data and record"""
-    def __init__(self, db: bettingdb.BettingDB, oc_td: timedelta):
+    """
+    stream user data and record
+
+    oddschecker odds are requested by a background fetcher, so that a slow response does not block processing of
+    markets, when a market book is received within `oc_td` plus `oc_lead` of the market start - the odds are then
+    returned with the first book of that market received after the response has arrived
+    """
+    def __init__(
+            self,
+            db: bettingdb.BettingDB,
+            oc_td: timedelta,
+            oc_lead: timedelta = timedelta(seconds=5),
+            oc_base_url: str = oc.OC_URL,
+            oc_timeout: float = 10
+    ):
         super().__init__(db, oc_td)
-        self._oc_mkts = list()
+        self._oc_mkts = set()
         self._ldn = pytz.timezone('Europe/London')
+        self._oc_lead = oc_lead
+        self._oc_base_url = oc_base_url
+        self._oc_fetcher = oc.OCFetcher(timeout=oc_timeout)
+        # received odds not yet returned, indexed by market ID
+        self._oc_results: Dict[str, Dict] = dict()
 
     def _write_data(self, data: Dict, market_id: str, dt: datetime):
         p = self._p_cache(market_id)
@@ -75,43 +161,54 @@ class UserDataStreamer(UserDataBase):
         with open(p, 'a') as f:
             f.write(update)
 
-    def _get_oc_data(self, market: Market, market_book: MarketBook) -> Optional[Dict]:
-        if market.market_id in self._oc_mkts:
-            return None  # exit if already processed
+    def _submit_oc(self, market: Market, market_book: MarketBook) -> None:
+        if self._oc_td is None or market.market_id in self._oc_mkts:
+            return  # exit if oddschecker not used or already processed
 
         if market.market_type != 'WIN':
             active_logger.warning(f'market: "{market.market_id}", currently oddschecker only handles win markets')
-            self._oc_mkts.append(market.market_id)
-            return None
+            self._oc_mkts.add(market.market_id)
+            return
 
         now_utc = datetime.utcnow() # naive UTC datetime
         mkt_utc = market_book.market_definition.market_time
-        if (mkt_utc - now_utc) > self._oc_td:
-            return None
+        if (mkt_utc - now_utc) > (self._oc_td + self._oc_lead):
+            return
 
-        active_logger.info(f'UTC time now "{now_utc}" within {self._oc_td} of start time {mkt_utc}')
+        active_logger.info(f'UTC time now "{now_utc}" within {self._oc_td} (+{self._oc_lead}) of start time {mkt_utc}')
         cat: MarketCatalogue = market.market_catalogue
         if cat is None:
             active_logger.warning(f'market "{market.market_id}" within "{self._oc_td}" of start but no catalogue')
-            self._oc_mkts.append(market.market_id)
-            return None
+            self._oc_mkts.add(market.market_id)
+            return
 
         mkt_local = mkt_utc.replace(tzinfo=pytz.utc).astimezone(self._ldn)  # convert UTC market to local time
-        url = oc.oc_url(cat.event_type.name, mkt_local, cat.event.venue)
-        oc_data = None
-        try:
-            raw_data = oc.oc(url)
-            names = {r.selection_id: r.runner_name for r in cat.runners}
-            oc_data = oc.convert_names(raw_data, names)
-            self._write_data({'oddschecker': oc_data}, market.market_id, market_book.publish_time)
-        except oc.OCException as e:
-            active_logger.warning(f'failed to retrieve oddschecker url: "{url}"\n{e}')
-        self._oc_mkts.append(market.market_id)
-        return oc_data
+        url = oc.oc_url(cat.event_type.name, mkt_local, cat.event.venue, base_url=self._oc_base_url)
+        names = {r.selection_id: r.runner_name for r in cat.runners}
+        self._oc_fetcher.submit((market.market_id, url), url, names)
+        self._oc_mkts.add(market.market_id)
+
+    def _receive_oc(self) -> None:
+        while True:
+            try:
+                (market_id, url), oc_data, error = self._oc_fetcher.results.get_nowait()
+            except queue.Empty:
+                return
+            if error is not None:
+                active_logger.warning(f'failed to retrieve oddschecker url: "{url}"\n{error}')
+            else:
+                self._oc_results[market_id] = oc_data
 
     def get_user_data(self, market: Market, market_book: MarketBook) -> Optional[Dict]:
-        oc_data = self._get_oc_data(market, market_book)
+        self._submit_oc(market, market_book)
+        self._receive_oc()
+        oc_data = self._oc_results.pop(market.market_id, None)
         if oc_data:
-            return {'oddschecker_data': oc_data}
+            user_data = {'oddschecker': oc_data}
+            self._write_data(user_data, market.market_id, market_book.publish_time)
+            return user_data
         else:
-            return None
\ No newline at end of file
+            return None
+
+    def close(self) -> None:
+        self._oc_fetcher.stop()
@@ -18,11 +18,12 @@ from sqlalchemy_filters.filters import Operator as SqlOperator
 from sqlalchemy.orm.query import Query
 from queue import Queue
 import logging
-from typing import Optional, Dict, List, Callable, Any, Tuple, Union, Literal, TypedDict
+from typing import Optional, Dict, List, Callable, Any, Tuple, Union, Literal, TypedDict, Iterator
 from os import path
 import os
 from datetime import datetime, timedelta
 import zlib
+import itertools
 import yaml
 import json
 import sys
@@ -581,13 +582,14 @@ class BettingDB:
             data=data
         )
 
-    def path_mkt_usr_updates(self, market_id) -> str:
+    def path_mkt_usr_updates(self, market_id, col: str = 'user_data') -> str:
+        """get path to user data updates file of market, where `col` is the user data source cache column"""
         return self._dbc.cache_col(
             tbl_nm='marketstream',
             pkey_flts={
                 'market_id': market_id
             },
-            col='user_data'
+            col=col
         )
 
     def path_mkt_cat(self, market_id) -> str:
@@ -628,20 +630,47 @@ class BettingDB:
             col='strategy_updates'
         )
 
-    def paths_market_updates(self, filter_spec: List[QueryFilter], limit=200):
+    def path_feature_cache(self) -> str:
+        return path.join(self._dbc.cache_root, 'featurecache')
+
+    def iter_market_ids(self, filter_spec: List[QueryFilter], page_size=200) -> Iterator[str]:
+        """
+        yield market IDs from filtered market meta rows, paginated by market ID so that only `page_size` rows are held
+        in memory at a time
+        """
         tbl = self._dbc.tables['marketmeta']
-        q = self._dbc.session.query(tbl)
-        q_flt = apply_filter_spec(tbl, q, filter_spec)
-        rows = q_flt.limit(limit).all()
-        update_paths = []
-        for row in rows:
-            mkt_flt = {'market_id': row.market_id}
+        col = tbl.columns['market_id']
+        q_flt = apply_filter_spec(tbl, self._dbc.session.query(col), filter_spec)
+        last_id = None
+        while True:
+            q = q_flt if last_id is None else q_flt.filter(col > last_id)
+            rows = q.order_by(col).limit(page_size).all()
+            for row in rows:
+                yield row.market_id
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1].market_id
+
+    def iter_market_updates(self, filter_spec: List[QueryFilter], page_size=200) -> Iterator[str]:
+        """
+        yield paths to market stream update files from filtered market meta rows, reading each market stream to cache
+        if not already present
+        """
+        for market_id in self.iter_market_ids(filter_spec, page_size):
+            mkt_flt = {'market_id': market_id}
             self._dbc.read_to_cache('marketstream', mkt_flt)
             p = self._dbc.cache_col('marketstream', mkt_flt, 'stream_updates')
             if not path.isfile(p):
                 raise DBException(f'expected file at stream update path: "{p}"')
-            update_paths.append(p)
-        return update_paths
+            yield p
+
+    def paths_market_updates(self, filter_spec: List[QueryFilter], limit: Optional[int] = None) -> List[str]:
+        """
+        get list of paths to market stream update files from filtered market meta rows, optionally limiting number of
+        markets with `limit`
+        """
+        paths = self.iter_market_updates(filter_spec)
+        return list(itertools.islice(paths, limit))
 
     def rows_runners(self, market_id, strategy_id) -> List[Dict]:
         """
@@ -0,0 +1,135 @@
+"""
+local HTTP stand-in for oddschecker, serving synthetic race pages in the oddschecker "eventTable" format so that odds
+retrieval (see `mytrading.process.oddschecker`) can be tested and benchmarked without network access
+"""
+import logging
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+active_logger = logging.getLogger(__name__)
+
+OC_BOOKMAKERS = [
+    'B3', 'SK', 'PP', 'WH', 'EE', 'FB', 'VC', 'UN', 'BY', 'OE', 'LD', 'SX', 'QN', 'RK', 'BF', 'MK', 'MA', 'BD', 'BQ'
+]
+
+
+def oc_page(
+        names: List[str],
+        bookmakers: Optional[List[str]] = None,
+        seed: int = 0,
+        filler_rows: int = 200,
+        missing_prob: float = 0.05
+) -> str:
+    """
+    get synthetic oddschecker page html, with an event table row of bookmaker odds for each runner name, surrounded by
+    `filler_rows` rows of unrelated page content (navigation, other tables) as on a real page - each bookmaker odds
+    cell has a chance of `missing_prob` of having no odds
+    """
+    rng = random.Random(seed)
+    bookmakers = bookmakers or OC_BOOKMAKERS
+    filler = ''.join(
+        f'<li class="nav-item"><a href="/racing/meeting-{i}" data-id="{i}"><span>Meeting {i}</span>'
+        f'<span class="time">{i % 24:02d}:{(i * 5) % 60:02d}</span></a></li>'
+        for i in range(filler_rows)
+    )
+    other_table = ''.join(
+        f'<tr class="result-row"><td>{i}</td><td>Result {i}</td><td data-odig="{rng.uniform(1, 50):.2f}">x</td></tr>'
+        for i in range(filler_rows // 4)
+    )
+    header = ''.join(f'<td class="bk-logo" data-bk="{bk}"><a title="{bk}"></a></td>' for bk in bookmakers)
+    rows = []
+    for name in names:
+        price = rng.uniform(1.5, 40)
+        cells = []
+        for bk in bookmakers:
+            if rng.random() < missing_prob:
+                cells.append(f'<td class="np" data-bk="{bk}" data-odig="0" data-o=""></td>')
+            else:
+                odds = round(price * rng.uniform(0.9, 1.1), 2)
+                cells.append(f'<td class="bc bs oi" data-bk="{bk}" data-odig="{odds}" data-o="{odds - 1:.2f}/1" '
+                             f'data-hcap="" data-fodds="{odds}"><p>{odds}</p></td>')
+        rows.append(
+            f'<tr class="diff-row evTabRow bc" data-bname="{escape(name)}" data-bid="{rng.randint(1, 10**9)}">'
+            f'<td class="sel nm basket-active"><span class="selTxt">{escape(name)}</span></td>'
+            f'<td class="bet-btn"></td>' + ''.join(cells) + '</tr>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Synthetic Odds</title>'
+        '<script type="text/javascript">var config = {"page": "event", "items": [1, 2, 3]};</script></head><body>'
+        f'<div id="nav"><ul class="nav-list">{filler}</ul></div>'
+        f'<table class="results"><tbody>{other_table}</tbody></table>'
+        '<div id="oddsTableContainer"><table class="eventTable">'
+        f'<thead><tr class="eventTableHeader"><td></td><td></td>{header}</tr></thead>'
+        f'<tbody id="t1">{"".join(rows)}</tbody></table></div>'
+        f'<div id="footer"><ul>{filler}</ul></div></body></html>'
+    )
+
+
+class OCStandIn:
+    """
+    local HTTP server on a background thread serving `oc_page(names)` for every GET request path, after waiting
+    `delay` seconds to simulate a slow response (or responding with error code `status` if not 200)
+
+    use as a context manager, passing `base_url` to `oddschecker.oc_url()` - paths requested are stored in `requests`
+    """
+    def __init__(
+            self,
+            names: List[str],
+            delay: float = 0.0,
+            status: int = 200,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            **page_kwargs
+    ):
+        self.page = oc_page(names, **page_kwargs).encode()
+        self.delay = delay
+        self.status = status
+        self.requests: List[str] = []
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin.requests.append(self.path)
+                if standin.delay:
+                    time.sleep(standin.delay)
+                if standin.status != 200:
+                    self.send_error(standin.status)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(standin.page)))
+                self.end_headers()
+                self.wfile.write(standin.page)
+
+            def log_message(self, fmt, *args):
+                active_logger.debug(fmt % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='oc-standin', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'OCStandIn':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
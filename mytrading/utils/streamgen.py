@@ -0,0 +1,254 @@
+"""
+Generate synthetic market streams in betfair historical "mcm" format, for load testing the database cache, feature
+engine, strategies and browser without betfair files or a live connection
+
+Streams can be read with `BufferStream`, `BettingDB.get_first_book()` and flumine historical backtests
+"""
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from os import path
+from typing import Dict, Iterator, List, Optional
+
+from ..process.ticks import LTICKS_DECODED
+from .bettingdb import BettingDB
+
+active_logger = logging.getLogger(__name__)
+
+EPOCH = datetime.utcfromtimestamp(0)
+
+
+@dataclass
+class StreamConfig:
+    """
+    synthetic market stream configuration, runner prices follow a random walk in ticks (with occasional jumps) and
+    traded volume accumulates at the last traded price
+    """
+    market_id: str = '1.100000000'
+    market_time: datetime = datetime(2021, 1, 1, 12, 0)
+    n_runners: int = 6
+    # seconds of pre-race updates before market time
+    pre_seconds: float = 600
+    # seconds of in-play updates after market time, 0 for no in-play transition
+    inplay_seconds: float = 0
+    # milliseconds between updates
+    update_ms: int = 200
+    # number of price levels in available to back/lay ladders
+    ladder_depth: int = 3
+    # probability that a runner changes in each update
+    change_prob: float = 0.5
+    # probability that a changing runner price jumps by `jump_ticks` instead of moving at most 1 tick
+    jump_prob: float = 0.02
+    jump_ticks: int = 6
+    # maximum amount traded per runner update
+    trade_size: float = 20
+    # maximum size available at each ladder price
+    ladder_size: float = 200
+    seed: int = 0
+    event_type_id: str = '4339'
+    event_id: str = '1'
+    event_name: str = 'Synthetic'
+    market_type: str = 'WIN'
+    venue: str = 'Synthetic'
+    country_code: str = 'GB'
+
+
+def _ms(dt: datetime) -> int:
+    return int((dt - EPOCH).total_seconds() * 1000)
+
+
+def _dt_str(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _market_definition(
+        cfg: StreamConfig,
+        selection_ids: List[int],
+        status: str,
+        in_play: bool,
+        winner: Optional[int] = None
+) -> Dict:
+    if status == 'CLOSED':
+        runner_status = {sel_id: 'WINNER' if sel_id == winner else 'LOSER' for sel_id in selection_ids}
+    else:
+        runner_status = {sel_id: 'ACTIVE' for sel_id in selection_ids}
+    return {
+        'bspMarket': False,
+        'turnInPlayEnabled': cfg.inplay_seconds > 0,
+        'persistenceEnabled': True,
+        'marketBaseRate': 5,
+        'eventId': cfg.event_id,
+        'eventTypeId': cfg.event_type_id,
+        'numberOfWinners': 1,
+        'bettingType': 'ODDS',
+        'marketType': cfg.market_type,
+        'marketTime': _dt_str(cfg.market_time),
+        'suspendTime': _dt_str(cfg.market_time),
+        'bspReconciled': False,
+        'complete': True,
+        'inPlay': in_play,
+        'crossMatching': False,
+        'runnersVoidable': False,
+        'numberOfActiveRunners': len(selection_ids),
+        'betDelay': 1 if in_play else 0,
+        'status': status,
+        'runners': [{
+            'status': runner_status[sel_id],
+            'sortPriority': i + 1,
+            'id': sel_id,
+            'name': f'{i + 1}. Runner {i + 1}',
+        } for i, sel_id in enumerate(selection_ids)],
+        'regulators': ['MR_INT'],
+        'venue': cfg.venue,
+        'countryCode': cfg.country_code,
+        'discountAllowed': True,
+        'timezone': 'Europe/London',
+        'openDate': _dt_str(cfg.market_time),
+        'version': 1,
+        'name': cfg.market_type,
+        'eventName': cfg.event_name,
+    }
+
+
+class _RunnerWalk:
+    """random walk of runner ladder ticks, producing runner change dictionaries"""
+    def __init__(self, selection_id: int, tick: int, cfg: StreamConfig, rng: random.Random):
+        self.selection_id = selection_id
+        self.tick = tick
+        self.cfg = cfg
+        self.rng = rng
+        self.traded: Dict[float, float] = {}
+        self.back_prices = set()
+        self.lay_prices = set()
+
+    def step(self, in_play: bool):
+        rng = self.rng
+        if rng.random() < self.cfg.jump_prob * (5 if in_play else 1):
+            step = rng.choice([-1, 1]) * self.cfg.jump_ticks
+        else:
+            step = rng.choice([-1, 0, 0, 0, 1])
+        depth = self.cfg.ladder_depth
+        self.tick = max(depth, min(len(LTICKS_DECODED) - depth - 2, self.tick + step))
+
+    def change(self) -> Dict:
+        rng = self.rng
+        cfg = self.cfg
+        depth = range(cfg.ladder_depth)
+        atb = [[LTICKS_DECODED[self.tick - i], round(rng.uniform(2, cfg.ladder_size), 2)] for i in depth]
+        atl = [[LTICKS_DECODED[self.tick + 1 + i], round(rng.uniform(2, cfg.ladder_size), 2)] for i in depth]
+        ltp = LTICKS_DECODED[self.tick + rng.choice([0, 1])]
+        self.traded[ltp] = round(self.traded.get(ltp, 0) + rng.uniform(1, cfg.trade_size), 2)
+
+        # prices no longer in ladder are removed with zero size
+        back_prices = {p for p, _ in atb}
+        lay_prices = {p for p, _ in atl}
+        atb = [[p, 0] for p in sorted(self.back_prices - back_prices)] + atb
+        atl = [[p, 0] for p in sorted(self.lay_prices - lay_prices)] + atl
+        self.back_prices = back_prices
+        self.lay_prices = lay_prices
+        return {
+            'id': self.selection_id,
+            'atb': atb,
+            'atl': atl,
+            'trd': [[ltp, self.traded[ltp]]],
+            'ltp': ltp,
+            'tv': round(sum(self.traded.values()), 2),
+        }
+
+
+def generate_stream(cfg: StreamConfig) -> Iterator[str]:
+    """
+    generate lines of synthetic market stream:
+    - first line is the market definition with image of all runner ladders
+    - updates every `update_ms` with changes for a random subset of runners until market time
+    - if `inplay_seconds` is set, market definition turns in-play at market time, followed by in-play updates
+    - market is suspended and then closed, where the runner with the shortest price is the winner
+    """
+    rng = random.Random(cfg.seed)
+    selection_ids = [1000 + i for i in range(cfg.n_runners)]
+    # spread runners from favourite to outsider
+    max_tick = len(LTICKS_DECODED) - cfg.ladder_depth - 2
+    runners = [
+        _RunnerWalk(sel_id, max(cfg.ladder_depth, min(60 + 15 * i, max_tick)), cfg, rng)
+        for i, sel_id in enumerate(selection_ids)
+    ]
+    clk = 0
+
+    def line(dt: datetime, mc: Dict) -> str:
+        nonlocal clk
+        clk += 1
+        return json.dumps({'op': 'mcm', 'clk': str(clk), 'pt': _ms(dt), 'mc': [{'id': cfg.market_id} | mc]})
+
+    dt = cfg.market_time - timedelta(seconds=cfg.pre_seconds)
+    yield line(dt, {
+        'marketDefinition': _market_definition(cfg, selection_ids, 'OPEN', False),
+        'img': True,
+        'rc': [r.change() for r in runners]
+    })
+
+    def updates(end: datetime, in_play: bool) -> Iterator[str]:
+        nonlocal dt
+        while dt + timedelta(milliseconds=cfg.update_ms) <= end:
+            dt += timedelta(milliseconds=cfg.update_ms)
+            changed = [r for r in runners if rng.random() < cfg.change_prob] or [rng.choice(runners)]
+            for r in changed:
+                r.step(in_play)
+            yield line(dt, {'rc': [r.change() for r in changed]})
+
+    yield from updates(cfg.market_time, False)
+    if cfg.inplay_seconds > 0:
+        dt = max(dt, cfg.market_time)
+        yield line(dt, {'marketDefinition': _market_definition(cfg, selection_ids, 'OPEN', True)})
+        yield from updates(cfg.market_time + timedelta(seconds=cfg.inplay_seconds), True)
+
+    in_play = cfg.inplay_seconds > 0
+    winner = min(runners, key=lambda r: r.tick).selection_id
+    dt += timedelta(seconds=1)
+    yield line(dt, {'marketDefinition': _market_definition(cfg, selection_ids, 'SUSPENDED', in_play)})
+    dt += timedelta(seconds=1)
+    yield line(dt, {'marketDefinition': _market_definition(cfg, selection_ids, 'CLOSED', in_play, winner)})
+
+
+def market_stream(cfg: StreamConfig) -> str:
+    """get synthetic market stream as buffer"""
+    return '\n'.join(generate_stream(cfg))
+
+
+def write_stream(file_path: str, cfg: StreamConfig) -> None:
+    """write synthetic market stream to file"""
+    with open(file_path, 'w') as f:
+        for ln in generate_stream(cfg):
+            f.write(ln + '\n')
+
+
+def write_cache_streams(
+        db: BettingDB,
+        n_markets: int,
+        cfg: StreamConfig,
+        market_id_start: int = 100000000,
+        market_interval: timedelta = timedelta(minutes=5)
+) -> List[str]:
+    """
+    write `n_markets` synthetic market streams to database market stream cache, using configuration with sequential
+    market IDs, market times spaced by `market_interval` and a different random seed for each market - streams can
+    then be uploaded to the database with `BettingDB.scan_mkt_cache()`
+
+    returns list of market IDs
+    """
+    market_ids = []
+    for i in range(n_markets):
+        market_id = f'1.{market_id_start + i}'
+        mkt_cfg = StreamConfig(**(cfg.__dict__ | {
+            'market_id': market_id,
+            'market_time': cfg.market_time + i * market_interval,
+            'seed': cfg.seed + i,
+        }))
+        p = db.path_mkt_updates(market_id)
+        os.makedirs(path.dirname(p), exist_ok=True)
+        active_logger.info(f'writing synthetic market "{market_id}" to "{p}"')
+        write_stream(p, mkt_cfg)
+        market_ids.append(market_id)
+    return market_ids
@@ -559,3 +559,16 @@ class FeatureFigure:
             'nticks': 10,
         }, secondary_y=True)
 
+
+def latency_figure(df: pd.DataFrame, title: str) -> go.Figure:
+    """
+    create figure of strategy processing stage timings (as returned by `mytrading.strategy.latency.read_latency()`) in
+    milliseconds against market book publish time, stages with no timings are not plotted
+    """
+    fig = go.Figure(layout={'title': title})
+    for stage in df.columns:
+        values = df[stage].dropna() * 1e3
+        if values.shape[0]:
+            fig.add_trace(go.Scatter(x=values.index, y=values.values, mode='lines', name=stage))
+    fig.update_yaxes({'title': 'milliseconds'})
+    return fig
@@ -1,18 +1,25 @@
-import queue
 import logging
+from collections import deque
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Deque, Callable, Union, Optional
 from .exceptions import StateMachineException
 
 active_logger = logging.getLogger(__name__)
 active_logger.setLevel(logging.INFO)
 
+# values returned from State.run():
+# - None, False or current state key to remain in same state
+# - state key to queue a new state
+# - list of state keys to queue multiple new states
+# - True to move to next state in queue
+StateResult = Optional[Union[bool, Enum, List[Enum]]]
+
 
 class State:
     def enter(self, **inputs):
         pass
 
-    def run(self, **inputs):
+    def run(self, **inputs) -> StateResult:
         raise NotImplementedError
 
 
@@ -23,60 +30,73 @@ class StateMachine:
         self.previous_state_key: Enum = initial_state
         self.initial_state_key: Enum = initial_state
         self.is_state_change: bool = True
-        self.state_queue = queue.Queue()
+        self.state_queue: Deque[Enum] = deque()
+        # handlers of state run() return values, indexed by return type - state key types are added from `states`, any
+        # other enum types on first return
+        self._transitions: Dict[type, Callable[[StateResult], None]] = {
+            type(None): self._transition_none,
+            bool: self._transition_bool,
+            list: self._transition_list,
+        } | {
+            type(k): self._transition_state for k in states
+        }
+
+    def _next_state(self) -> None:
+        if not self.state_queue:
+            raise StateMachineException('state machine queue has no size')
+        self.current_state_key = self.state_queue.popleft()
+
+    def _transition_none(self, ret: None) -> None:
+        pass
+
+    def _transition_bool(self, ret: bool) -> None:
+        # True means go to next state in queue, False means remain in current
+        if ret:
+            self._next_state()
+
+    def _transition_list(self, ret: List[Enum]) -> None:
+        self.state_queue.extend(ret)
+        self._next_state()
+
+    def _transition_state(self, ret: Enum) -> None:
+        if ret != self.current_state_key:
+            self.state_queue.append(ret)
+            self._next_state()
+
+    def _get_transition(self, ret: StateResult) -> Callable[[StateResult], None]:
+        if isinstance(ret, Enum):
+            transition = self._transitions[type(ret)] = self._transition_state
+            return transition
+        raise StateMachineException(f'return value "{ret}" in state machine not recognised')
 
     def flush(self):
         """
         clear state queue
         """
-        self.state_queue.queue.clear()
+        self.state_queue.clear()
 
     def force_change(self, new_states: List[Enum]):
         """
         updating current state to first in queue and forcibly add a list of new states to queue
         """
-        for state_key in new_states:
-            self.state_queue.put(state_key)
-        self.current_state_key = self.state_queue.get()
+        self.state_queue.extend(new_states)
+        self._next_state()
         self.is_state_change = True
 
     def run(self, **kwargs):
         """
         run state machine with `kwargs` dictionary repeatedly until no state change is detected
         """
-
+        transitions = self._transitions
         while 1:
-
+            state = self.states[self.current_state_key]
             if self.is_state_change:
-                self.states[self.current_state_key].enter(**kwargs)
+                state.enter(**kwargs)
 
             self.previous_state_key = self.current_state_key
-
-            ret = self.states[self.current_state_key].run(**kwargs)
-
-            if type(ret) == list:
-                # list returned, add all to queue
-                for s in ret:
-                    self.state_queue.put(s)
-                self.current_state_key = self.state_queue.get()
-            elif ret is None or ret is False or ret == self.current_state_key:
-                # no value returned or same state returned, same state
-                pass
-            elif isinstance(ret, Enum):
-                # True means go to next state, None means use existing, otherwise single state value has been
-                # returned so add to queue
-                self.state_queue.put(ret)
-                self.current_state_key = self.state_queue.get()
-            elif ret is True:
-                # returned value implies state change (True, list of states, or single new state)
-                if not self.state_queue.qsize():
-                    # state has returned true when nothing in queue! (this shouldn't happen)
-                    raise StateMachineException('state machine queue has no size')
-                # get next state from queue
-                self.current_state_key = self.state_queue.get()
-            else:
-                # unrecognized return type
-                raise StateMachineException(f'return value "{ret}" in state machine not recognised')
+            ret = state.run(**kwargs)
+            transition = transitions.get(type(ret)) or self._get_transition(ret)
+            transition(ret)
 
             self.is_state_change = self.previous_state_key != self.current_state_key
             if self.is_state_change:
@@ -88,4 +108,3 @@ class StateMachine:
 
     def process_state_change(self, old_state, new_state, **kwargs):
         pass
-
@@ -1,11 +1,10 @@
 import functools
+import math
 import time
 from datetime import timedelta
 import logging
-import pandas as pd
 from typing import List, Dict, Callable, Any, TypedDict, Optional
 from .exceptions import TimingException
-import copy
 
 
 active_logger = logging.getLogger(__name__)
@@ -17,16 +16,114 @@ class TimingResult(TypedDict):
     mean: timedelta
     min: timedelta
     max: timedelta
+    p50: timedelta
+    p95: timedelta
+    p99: timedelta
+
+
+class TimingHistogram:
+    """
+    fixed size histogram of execution times, with logarithmically spaced buckets between `min_s` and `max_s` seconds
+    (each bucket upper bound is `factor` times the lower bound), so memory does not grow with the number of results
+    logged
+
+    count, sum, min and max are exact whereas percentiles are approximated to within the resolution of a bucket
+    """
+    def __init__(self, min_s: float = 1e-7, max_s: float = 100.0, factor: float = 1.05):
+        if not(0 < min_s < max_s) or factor <= 1:
+            raise TimingException(f'invalid histogram spec: min "{min_s}", max "{max_s}", factor "{factor}"')
+        self.min_s = min_s
+        self.max_s = max_s
+        self.factor = factor
+        self._log_factor = math.log(factor)
+        # first bucket holds values below minimum, last bucket holds values above maximum
+        self.n_buckets = int(math.ceil(math.log(max_s / min_s) / self._log_factor)) + 2
+        self.buckets: List[int] = [0] * self.n_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, seconds: float) -> int:
+        if seconds <= self.min_s:
+            return 0
+        return min(int(math.log(seconds / self.min_s) / self._log_factor) + 1, self.n_buckets - 1)
+
+    def _value(self, index: int) -> float:
+        """
+        representative value of bucket (geometric centre), clamped to min/max values logged - buckets below minimum and
+        above maximum have no resolution so are represented by the min/max values logged
+        """
+        if index == 0:
+            return self.min
+        if index == self.n_buckets - 1:
+            return self.max
+        v = self.min_s * self.factor ** (index - 0.5)
+        return min(max(v, self.min), self.max)
+
+    def log_result(self, elapsed_seconds: float) -> None:
+        self.buckets[self._index(elapsed_seconds)] += 1
+        self.count += 1
+        self.total += elapsed_seconds
+        if elapsed_seconds < self.min:
+            self.min = elapsed_seconds
+        if elapsed_seconds > self.max:
+            self.max = elapsed_seconds
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """get approximate percentile `q` (between 0 and 100) of execution times in seconds"""
+        if not self.count:
+            return 0.0
+        if not(0 <= q <= 100):
+            raise TimingException(f'percentile "{q}" not between 0 and 100')
+        rank = max(math.ceil(q / 100 * self.count), 1)
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            cumulative += n
+            if cumulative >= rank:
+                return self._value(i)
+        return self.max
+
+    def summary(self, name: str) -> TimingResult:
+        return TimingResult(
+            function=name,
+            count=self.count,
+            mean=timedelta(seconds=self.mean()),
+            min=timedelta(seconds=self.min),
+            max=timedelta(seconds=self.max),
+            p50=timedelta(seconds=self.percentile(50)),
+            p95=timedelta(seconds=self.percentile(95)),
+            p99=timedelta(seconds=self.percentile(99)),
+        )
+
+    def __add__(self, other: 'TimingHistogram') -> 'TimingHistogram':
+        if (self.min_s, self.max_s, self.factor) != (other.min_s, other.max_s, other.factor):
+            raise TimingException('cannot merge histograms with different bucket specifications')
+        result = TimingHistogram(self.min_s, self.max_s, self.factor)
+        result.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        result.count = self.count + other.count
+        result.total = self.total + other.total
+        result.min = min(self.min, other.min)
+        result.max = max(self.max, other.max)
+        return result
 
 
 class TimingRegistrar:
-    def __init__(self, timings: Optional[Dict[str, List[timedelta]]] = None):
-        self._function_timings: Dict[str, List[timedelta]] = timings or {}
+    """
+    register execution times of functions, each key is recorded into a `TimingHistogram` so memory use is fixed per key
+    regardless of how many times a function is called
+    """
+    def __init__(self, timings: Optional[Dict[str, TimingHistogram]] = None):
+        self._function_timings: Dict[str, TimingHistogram] = timings or {}
 
     def log_result(self, elapsed_seconds: float, name: str) -> None:
-        if name not in self._function_timings:
-            self._function_timings[name] = []
-        self._function_timings[name].append(timedelta(seconds=elapsed_seconds))
+        hist = self._function_timings.get(name)
+        if hist is None:
+            hist = self._function_timings[name] = TimingHistogram()
+        hist.log_result(elapsed_seconds)
 
     def _call(self, f: Callable,  key: str, *args, **kwargs) -> Any:
         start_time = time.perf_counter()  # gets timestamp in seconds (with decimal places)
@@ -34,9 +131,7 @@ class TimingRegistrar:
         end_time = time.perf_counter()
         elapsed_time = end_time - start_time  # compute time for function execution
         # use object name with method name for key
-        if key not in self._function_timings:
-            self._function_timings[key] = list()
-        self._function_timings[key].append(timedelta(seconds=elapsed_time))
+        self.log_result(elapsed_time, key)
         return val
 
     def register_named_method(self, name_attr: str) -> Callable:
@@ -95,40 +190,27 @@ class TimingRegistrar:
             return self._call(func, func.__name__, *args, **kwargs)
         return inner
 
-    def _series(self, func_name: str) -> pd.Series:
-        """
-        get series of timedeltas for execution time each time function was run
-        """
-        return pd.Series(self._function_timings[func_name])
-
     def timed_functions(self) -> List[str]:
         """
         get list of function names who are being tracked for timing
         """
         return list(self._function_timings.keys())
 
-    def get_timings_summary(self) -> List[Dict]:
+    def get_timings_summary(self) -> List[TimingResult]:
         """
         get a list of dictionaries with function timings information:
-        'Function' is function name
-        'Count' is number of times function was recorded
-        'Mean' is mean of timings as timedelta object
-        'Min' is minimum time as timedelta object
-        'Max' is maximum time as timedelta object
+        'function' is function name
+        'count' is number of times function was recorded
+        'mean' is mean of timings as timedelta object
+        'min' is minimum time as timedelta object
+        'max' is maximum time as timedelta object
+        'p50', 'p95', 'p99' are approximate percentiles as timedelta objects
         """
-        return [
-            TimingResult(
-                function=k,
-                count=len(v),
-                mean=sum(v, timedelta()) / len(v),
-                min=min(v),
-                max=max(v),
-            ) for k, v in self._function_timings.items() if v
-        ]
+        return [h.summary(k) for k, h in self._function_timings.items() if h.count]
 
     def clear(self) -> None:
         """
-        empty lists of timed functions results
+        remove all timed functions results
         """
         self._function_timings = {}
 
@@ -142,11 +224,12 @@ class TimingRegistrar:
         return self._function_timings.__getitem__(item)
 
     def __add__(self, other):
-        result = TimingRegistrar(self._function_timings)
-        for k, v in other.items():
-            if k in result:
-                result[k] += v
-            else:
-                result[k] = v
+        """merge timings into a new registrar, leaving both operands unmodified"""
+        result = TimingRegistrar()
+        for registrar in [self, other]:
+            for k, v in registrar.items():
+                if k in result:
+                    result[k] = result[k] + v
+                else:
+                    result[k] = v + TimingHistogram(v.min_s, v.max_s, v.factor)
         return result
-
@@ -0,0 +1,13 @@
+"""
+pytest suite, run from the project root e.g.
+
+    python -m pytest -q
+
+the project is not installed as a package so the project root is added to the path for test imports
+"""
+import sys
+from os import path
+
+_root = path.dirname(path.dirname(path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
@@ -0,0 +1,94 @@
+import os
+from os import path
+from unittest import mock
+
+import pandas as pd
+
+from mytrading.strategy.feature import cache as feature_cache
+from mytrading.strategy.feature.cache import FeatureCache
+
+
+def test_get_entry_evicted_after_read(tmp_path):
+    fc = FeatureCache(str(tmp_path))
+    fc.put('a', {1: {'x': pd.Series([1.0])}})
+    read_pickle = pd.read_pickle
+
+    def read_then_evict(p):
+        data = read_pickle(p)
+        os.remove(p)
+        return data
+
+    with mock.patch.object(feature_cache.pd, 'read_pickle', read_then_evict):
+        data = fc.get('a')
+    assert data[1]['x'].tolist() == [1.0]
+    assert fc.get('a') is None
+
+
+def _fill(fc, n, max_entries):
+    for i in range(n):
+        fc.put(str(i), {})
+        os.utime(fc._path(str(i)), (i, i))
+    fc.max_entries = max_entries
+
+
+def _scandir_removed(stat_first: bool):
+    # list directory then remove entries, as if removed by another process evicting from the same directory
+    scandir = os.scandir
+
+    def _scandir(p):
+        entries = list(scandir(p))
+        for e in entries:
+            if stat_first:
+                e.stat()
+            os.remove(e.path)
+        return iter(entries)
+    return _scandir
+
+
+def test_evict_entries_removed_before_stat(tmp_path):
+    fc = FeatureCache(str(tmp_path))
+    _fill(fc, 3, 2)
+    with mock.patch.object(feature_cache.os, 'scandir', _scandir_removed(False)):
+        fc.evict()
+    assert os.listdir(tmp_path) == []
+
+
+def test_evict_entries_removed_before_remove(tmp_path):
+    fc = FeatureCache(str(tmp_path))
+    _fill(fc, 3, 2)
+    with mock.patch.object(feature_cache.os, 'scandir', _scandir_removed(True)):
+        fc.evict()
+    assert os.listdir(tmp_path) == []
+
+
+def test_evict_least_recently_used(tmp_path):
+    fc = FeatureCache(str(tmp_path))
+    _fill(fc, 3, 2)
+    fc.evict()
+    assert fc.get('0') is None
+    assert fc.get('1') is not None and fc.get('2') is not None
+
+
+def test_put_only_scans_when_full(tmp_path):
+    fc = FeatureCache(str(tmp_path), max_entries=3)
+    scandir = os.scandir
+    with mock.patch.object(feature_cache.os, 'scandir', side_effect=lambda p: scandir(p)) as m:
+        for i in range(3):
+            fc.put(str(i), {})
+        # overwriting an entry does not add to count
+        fc.put('0', {})
+        assert m.call_count == 0
+        fc.put('3', {})
+        assert m.call_count == 1
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_put_batch_evict(tmp_path):
+    _fill(FeatureCache(str(tmp_path)), 2, 2)
+    # existing entries are counted on creation
+    fc = FeatureCache(str(tmp_path), max_entries=3)
+    for i in range(2, 5):
+        fc.put(str(i), {}, evict=False)
+    assert len(os.listdir(tmp_path)) == 5
+    fc.evict()
+    assert sorted(os.listdir(tmp_path)) == sorted(path.basename(fc._path(str(i))) for i in range(2, 5))
@@ -0,0 +1,346 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from mytrading.configs import feature_configs_spike, feature_configs_smooth
+from mytrading.process.snapshot import BookSnapshot, RunnerSnapshot
+from mytrading.process.ticks import LTICKS_DECODED
+from mytrading.strategy.feature import FeatureHolder, simulate_runners, precompute_features, set_timing, clear_timings, \
+    get_timings_summary
+from mytrading.strategy.feature.features import RFBase, RFSample
+from mytrading.strategy.strategy import MarketHandler, MyFeatureStrategy
+
+FEATURES_CONFIG = {
+    'ltp': {
+        'name': 'RFLTP',
+        'kwargs': {
+            'sub_features_config': {
+                'tick': {'name': 'RFTick'},
+            },
+        },
+    },
+    'best back': {'name': 'RFBck'},
+    'best lay': {'name': 'RFLay'},
+    'wom': {'name': 'RFWOM', 'kwargs': {'wom_ticks': 3}},
+    'spread': {'name': 'RFLadSprd'},
+    'back ladder': {'name': 'RFLadBck', 'kwargs': {'n_elements': 3}},
+    'traded': {'name': 'RFTVTot'},
+    'tv ladder': {
+        'name': 'RFTVLad',
+        'kwargs': {
+            'cache_count': 3,
+            'sub_features_config': {
+                'dif': {
+                    'name': 'RFTVLadDif',
+                    'kwargs': {
+                        'sub_features_config': {
+                            'max': {'name': 'RFTVLadMax'},
+                            'tot': {'name': 'RFTVLadTot'},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+# short windows so that traded volume window is trimmed and samples are filled over gaps between books
+SPIKE_CONFIG = feature_configs_spike(
+    n_ladder_elements=3,
+    n_wom_ticks=3,
+    ltp_window_width_s=5,
+    ltp_window_sampling_ms=200,
+    ltp_window_sampling_count=10,
+    spread_sampling_ms=100,
+    spread_sampling_count=10,
+)
+
+SMOOTH_CONFIG = feature_configs_smooth(
+    spread_sampling_ms=100,
+    spread_sampling_count=10,
+    wom_ticks=3,
+    ltp_window_width_s=5,
+    ltp_window_sampling_ms=200,
+    ltp_window_sampling_count=10,
+    ladder_sampling_ms=200,
+    ladder_sampling_count=10,
+    ltp_sampling_ms=100,
+    ltp_sampling_count=10,
+    n_ladder_elements=3,
+    diff_s=2,
+    split_sum_s=2,
+)
+
+# sampled values with childless features caching by time (inside and outside window) and by count
+SAMPLE_CONFIG = {
+    'ltp': {
+        'name': 'RFLTP',
+        'kwargs': {
+            'sub_features_config': {
+                'smp': {
+                    'name': 'RFSample',
+                    'kwargs': {
+                        'periodic_ms': 100,
+                        'cache_count': 5,
+                        'sub_features_config': {
+                            'avg': {'name': 'RFMvAvg', 'kwargs': {'cache_secs': 1.5, 'cache_insidewindow': False}},
+                            'avg_in': {'name': 'RFMvAvg', 'kwargs': {'cache_secs': 1.5, 'cache_insidewindow': True}},
+                            'sum': {'name': 'RFSum', 'kwargs': {'cache_count': 3}},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def _ladder(rng: random.Random, tick: int, step: int):
+    # empty ladder on some books, so features return None
+    if rng.random() < 0.3:
+        return np.empty(0), np.empty(0)
+    prices = [LTICKS_DECODED[tick + step * i] for i in range(3)]
+    return np.array(prices), np.array([round(rng.uniform(1, 100), 2) for _ in prices])
+
+
+def _books(seed: int, n: int):
+    rng = random.Random(seed)
+    t = datetime(2021, 1, 1)
+    tick = 100
+    tv = {}
+    books = []
+    for i in range(n):
+        tick = max(5, min(300, tick + rng.choice([-1, 0, 1])))
+        if rng.random() < 0.5:
+            p = LTICKS_DECODED[tick]
+            tv[p] = tv.get(p, 0) + round(rng.uniform(1, 10), 2)
+        tv_prices = np.array(sorted(tv)) if rng.random() > 0.2 else np.empty(0)
+        tv_sizes = np.array([tv[p] for p in tv_prices.tolist()])
+        runner = RunnerSnapshot(
+            selection_id=1,
+            status='ACTIVE',
+            last_price_traded=None if rng.random() < 0.3 else LTICKS_DECODED[tick],
+            total_matched=None,
+            back=_ladder(rng, tick, -1),
+            lay=_ladder(rng, tick + 1, 1),
+            tv=(tv_prices, tv_sizes),
+        )
+        books.append(BookSnapshot('1.1', t, None, 'OPEN', False, [runner]))
+        # occasional gaps between books longer than traded volume window
+        t += timedelta(seconds=rng.choice([6, 10])) if rng.random() < 0.02 else timedelta(milliseconds=100)
+    return books
+
+
+def _all_features(features: FeatureHolder):
+    def _iter(feature):
+        yield feature
+        for sub_feature in feature.sub_features.values():
+            yield from _iter(sub_feature)
+    for feature in features.values():
+        yield from _iter(feature)
+
+
+def _last_values(configs, books, lazy: bool, read_indexes):
+    features = FeatureHolder.generator(configs)
+    features.set_lazy(lazy)
+    for feature in features.values():
+        feature.race_initializer(1, books[0])
+    values = []
+    for i, book in enumerate(books):
+        for feature in features.values():
+            feature.process_runner(book, 0)
+        if i in read_indexes:
+            values.append({f.ftr_identifier: f.last_value() for f in _all_features(features)})
+    return features, values
+
+
+def _equal(a, b):
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(np.array_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+@pytest.mark.parametrize('configs', [FEATURES_CONFIG, SPIKE_CONFIG], ids=['features', 'spike'])
+@pytest.mark.parametrize('read_prob', [0.2, 0.01])
+@pytest.mark.parametrize('seed', range(10))
+def test_lazy_last_values_match_eager(configs, read_prob, seed):
+    books = _books(seed, 600)
+    rng = random.Random(seed)
+    # read values intermittently, as strategies do, so lazy features have updates pending between reads
+    read_indexes = {i for i in range(len(books)) if rng.random() < read_prob}
+    _, eager = _last_values(configs, books, False, read_indexes)
+    lazy_features, lazy = _last_values(configs, books, True, read_indexes)
+    assert any(f.lazy and f.nullable for f in _all_features(lazy_features))
+    for eager_values, lazy_values in zip(eager, lazy):
+        for name, value in eager_values.items():
+            assert _equal(value, lazy_values[name]), name
+
+
+def test_lazy_eligible():
+    features = FeatureHolder.generator(SPIKE_CONFIG)
+    features.set_lazy(True)
+    lazy = {f.ftr_identifier for f in _all_features(features) if f.lazy}
+    # samplers keep state so they and their parents are computed on every update, as is traded volume whose
+    # difference child reads its history
+    assert lazy == {
+        'best back', 'best lay', 'back ladder', 'lay ladder', 'wom', 'ltp', 'tv', 'tvlad.dif.spread',
+        'tvlad.dif.max.smp.avg', 'tvlad.dif.min.smp.avg', 'spread.smp.avg'
+    }
+    for feature in _all_features(features):
+        if feature.lazy and feature.nullable:
+            assert not feature.parent_history, feature.ftr_identifier
+
+
+@pytest.mark.parametrize('configs', [FEATURES_CONFIG, SPIKE_CONFIG], ids=['features', 'spike'])
+@pytest.mark.parametrize('seed', range(5))
+def test_replay_matches_live(configs, seed):
+    rng = random.Random(seed)
+    books = []
+    for bk in _books(seed, 600):
+        # some books share a publish time with the previous book
+        pt = books[-1].publish_time if books and rng.random() < 0.05 else bk.publish_time
+        books.append(BookSnapshot('1.1', pt, datetime(2021, 1, 2), 'OPEN', False, bk.runners))
+    _, live = _last_values(configs, books, False, set(range(len(books))))
+    data = precompute_features(configs, [[bk] for bk in books], feature_seconds=86400)
+    features = FeatureHolder.generator(configs).replay(data[1])
+    for feature in features.values():
+        feature.race_initializer(1, books[0])
+    for bk, live_values in zip(books, live):
+        for feature in features.values():
+            feature.process_runner(bk, 0)
+        replayed = {f.ftr_identifier: f.last_value() for f in _all_features(features)}
+        assert replayed.keys() == live_values.keys()
+        for name, value in live_values.items():
+            assert _equal(value, replayed[name]), (bk.publish_time, name)
+
+
+def _market_records(n: int):
+    # records of books with two runners, as passed to simulate functions
+    books = []
+    for a, b in zip(_books(0, n), _books(1, n)):
+        b.runners[0].selection_id = 2
+        books.append([BookSnapshot('1.1', a.publish_time, None, 'OPEN', False, [a.runners[0], b.runners[0]])])
+    return books
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_simulate_runners_timings(processes):
+    records = _market_records(200)
+    t = records[0][0].publish_time
+    windows = {1: (t, records[-1][0].publish_time), 2: (t, records[-1][0].publish_time)}
+    set_timing(True)
+    try:
+        clear_timings()
+        data = simulate_runners(FEATURES_CONFIG, records, windows, buffer_s=0, processes=processes)
+        summary = {s['function']: s['count'] for s in get_timings_summary()}
+    finally:
+        set_timing(False)
+        clear_timings()
+    # each top level feature is timed for every book of both runners, whether processed here or in worker processes
+    assert set(data) == {1, 2}
+    for name in FEATURES_CONFIG:
+        assert summary[name] == 2 * len(records), name
+
+
+def _sample_per_period(self: RFSample, new_book, runner_index):
+    # reference sampling, publishing the parent value at each sample time in turn
+    while int((new_book.publish_time - self.last_timestamp).total_seconds() * 1000) > self.periodic_ms:
+        self.last_timestamp = self.last_timestamp + timedelta(milliseconds=self.periodic_ms)
+        self._compute_update(new_book, runner_index, self.last_timestamp)
+
+
+def _process_caches(configs, books):
+    """get output cache of each feature, and values cache of each feature after every book"""
+    features = FeatureHolder.generator(configs)
+    for feature in features.values():
+        feature.race_initializer(1, books[0])
+    values = []
+    for book in books:
+        for feature in features.values():
+            feature.process_runner(book, 0)
+        values.append({f.ftr_identifier: list(f._values_cache) for f in _all_features(features)})
+    return {f.ftr_identifier: list(f.out_cache) for f in _all_features(features)}, values
+
+
+def _caches_equal(a, b):
+    return len(a) == len(b) and all(x[0] == y[0] and _equal(x[1], y[1]) for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize(
+    'configs', [SPIKE_CONFIG, SMOOTH_CONFIG, SAMPLE_CONFIG], ids=['spike', 'smooth', 'sample']
+)
+@pytest.mark.parametrize('seed', range(3))
+def test_sample_gaps_match_per_period(configs, seed):
+    rng = random.Random(seed)
+    books = []
+    t = datetime(2021, 1, 1)
+    for book in _books(seed, 400):
+        books.append(BookSnapshot('1.1', t, None, 'OPEN', False, book.runners))
+        # gaps of minutes between some books, so samples are filled over many periods
+        if rng.random() < 0.02:
+            t += timedelta(minutes=rng.randint(1, 4), milliseconds=rng.randint(0, 999))
+        else:
+            t += timedelta(milliseconds=rng.choice([50, 100, 250]))
+    caches, values = _process_caches(configs, books)
+    with mock.patch.object(RFSample, '_sample', _sample_per_period):
+        ref_caches, ref_values = _process_caches(configs, books)
+    assert any(len(c) > 1000 for c in caches.values())
+    for name, ref_cache in ref_caches.items():
+        assert _caches_equal(caches[name], ref_cache), name
+    # values caches (and so last values) after each book
+    for i, (v, ref_v) in enumerate(zip(values, ref_values)):
+        for name, ref_cache in ref_v.items():
+            assert _caches_equal(v[name], ref_cache), (i, name)
+
+
+class _UserDataRecorder(RFBase):
+    """feature recording user data updates it is passed"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updates = []
+
+    def update_user_data(self, user_data):
+        super().update_user_data(user_data)
+        self.updates.append(user_data)
+
+
+class _UserDataSubscriber(_UserDataRecorder):
+    user_data_subscriber = True
+
+
+def _user_data_features():
+    parent = _UserDataRecorder(ftr_identifier='parent')
+    parent.sub_features = {
+        'sub': _UserDataSubscriber(parent=parent, ftr_identifier='sub'),
+        'other': _UserDataRecorder(parent=parent, ftr_identifier='other'),
+    }
+    return FeatureHolder({'parent': parent, 'subscriber': _UserDataSubscriber(ftr_identifier='subscriber')})
+
+
+def test_user_data_subscribers():
+    features = _user_data_features()
+    assert [f.ftr_identifier for f in features.user_data_subscribers()] == ['parent.sub', 'subscriber']
+
+    rng = random.Random(0)
+    updates = [{'oddschecker': i} if rng.random() < 0.5 else None for i in range(50)]
+    source = iter(updates)
+    strategy = SimpleNamespace(_usr_data=SimpleNamespace(get_user_data=lambda market, market_book: next(source)))
+    mh = MarketHandler()
+    for selection_id in range(3):
+        mh.runner_handlers[selection_id] = SimpleNamespace(features=_user_data_features(), user_data=None)
+    for _ in updates:
+        MyFeatureStrategy._user_data_process(strategy, None, None, mh)
+
+    # subscribers get each update once per book, not None when there is no update, other features get nothing
+    received = [u for u in updates if u is not None]
+    for rh in mh.runner_handlers.values():
+        assert rh.user_data is received[-1]
+        for feature in _all_features(rh.features):
+            if feature.user_data_subscriber:
+                assert feature.updates == received, feature.ftr_identifier
+            else:
+                assert feature.updates == [], feature.ftr_identifier
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from mytrading.strategy.latency import LATENCY_STAGES, LatencyRecorder, read_latency
+
+
+def test_update_line_read_stages():
+    lr = LatencyRecorder('1.1', capacity=5, record_lag=False)
+    t = datetime(2021, 1, 1)
+    for i in range(8):
+        lr.start(t + timedelta(seconds=i))
+        lr.stage('flags')
+        # runners only initialised on first book
+        if i == 0:
+            lr.stage('runner_init')
+        lr.stage('features')
+        lr.end()
+    df = read_latency(lr.update_line(t))
+    assert list(df.columns) == LATENCY_STAGES
+    assert df.shape[0] == 5
+    assert df['runner_init'].isna().all()
+    assert df['features'].notna().all()
+
+    lr.start(t)
+    lr.stage('runner_init')
+    lr.end()
+    df = read_latency(lr.update_line(t))
+    assert df['runner_init'].notna().sum() == 1
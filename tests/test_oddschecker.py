@@ -0,0 +1,40 @@
+import pytest
+
+from mytrading.process.oddschecker import oc_parse, oc_parse_soup
+from mytrading.utils.ocstandin import oc_page
+
+NAMES = ['Red Rum', "O'Brien & Sons", 'Desert Orchid', 'Kauto Star', 'Arkle', 'Best Mate']
+
+
+def _body(html: str) -> str:
+    """get inner html of event table body of synthetic page"""
+    start = html.index('<tbody id="t1">') + len('<tbody id="t1">')
+    return html[start:html.index('</tbody>', start)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_parse_page(seed):
+    html = oc_page(NAMES, seed=seed, missing_prob=0.2)
+    odds = oc_parse(html)
+    assert set(odds) == set(NAMES)
+    assert odds == oc_parse_soup(html)
+
+
+def test_parse_first_body():
+    html = oc_page(NAMES[:3])
+    other = _body(oc_page(NAMES[3:], seed=1))
+    html = html.replace('</tbody></table></div>', f'</tbody><tbody id="t2">{other}</tbody></table></div>')
+    odds = oc_parse(html)
+    assert set(odds) == set(NAMES[:3])
+    assert odds == oc_parse_soup(html)
+
+
+def test_parse_gt_in_attributes():
+    html = oc_page(NAMES)
+    html = html.replace('<table class="eventTable">', '<table data-cfg="a>b" class="eventTable">')
+    html = html.replace('<tr class="diff-row', '<tr data-tip="x > y" class="diff-row')
+    html = html.replace('<td class="bc bs oi"', '<td title=\'odds > evens\' class="bc bs oi"')
+    odds = oc_parse(html)
+    assert set(odds) == set(NAMES)
+    assert odds == oc_parse(oc_page(NAMES))
+    assert odds == oc_parse_soup(html)
@@ -0,0 +1,89 @@
+import json
+import queue
+import random
+import sys
+
+import numpy as np
+import pytest
+from betfairlightweight import StreamListener
+
+from myutils.betfair import BufferStream
+from mytrading.process.snapshot import BookSnapshot, market_snapshot
+
+
+SELECTION_IDS = list(range(101, 111))
+
+
+class _Market:
+    def __init__(self):
+        self.context = {}
+
+
+def _definition(status: str):
+    return {
+        'bspMarket': False, 'turnInPlayEnabled': True, 'persistenceEnabled': True, 'marketBaseRate': 5,
+        'eventId': '1', 'eventTypeId': '7', 'numberOfWinners': 1, 'bettingType': 'ODDS', 'marketType': 'WIN',
+        'marketTime': '2021-01-01T12:10:00.000Z', 'suspendTime': '2021-01-01T12:10:00.000Z', 'bspReconciled': False,
+        'complete': True, 'inPlay': False, 'crossMatching': False, 'runnersVoidable': False,
+        'numberOfActiveRunners': len(SELECTION_IDS), 'betDelay': 0, 'status': status, 'version': 1,
+        'runners': [{'status': 'ACTIVE', 'sortPriority': i + 1, 'id': s} for i, s in enumerate(SELECTION_IDS)],
+        'regulators': ['MR_INT'], 'venue': 'X', 'countryCode': 'GB', 'discountAllowed': True,
+        'timezone': 'Europe/London', 'openDate': '2021-01-01T12:10:00.000Z', 'name': 'A', 'eventName': 'E',
+    }
+
+
+def _market_books(seed: int, n: int):
+    """non lightweight market books from a stream where each update changes a random subset of runners"""
+    rng = random.Random(seed)
+    traded = {s: 0 for s in SELECTION_IDS}
+    lines = []
+    for i in range(n):
+        runners = SELECTION_IDS if i == 0 else rng.sample(SELECTION_IDS, rng.randint(0, 3))
+        changes = []
+        for s in runners:
+            price = rng.choice([2.0, 2.02, 2.04, 2.06])
+            traded[s] += rng.randint(1, 10)
+            changes.append({
+                'id': s, 'atb': [[price, rng.randint(1, 99)]], 'atl': [[price + 0.02, rng.randint(1, 99)]],
+                'trd': [[price, traded[s]]], 'ltp': price, 'tv': traded[s]
+            })
+        mc = {'id': '1.1', 'rc': changes}
+        if i == 0:
+            mc['img'] = True
+            mc['marketDefinition'] = _definition('OPEN')
+        elif rng.random() < 0.05:
+            mc['marketDefinition'] = _definition(rng.choice(['OPEN', 'SUSPENDED']))
+        lines.append(json.dumps({'op': 'mcm', 'clk': str(i), 'pt': 1609500000000 + i * 200, 'mc': [mc]}))
+    q = queue.Queue()
+    listener = StreamListener(output_queue=q, max_latency=sys.float_info.max, lightweight=False)
+    BufferStream.generator('\n'.join(lines), listener).start()
+    return [books[0] for books in q.queue]
+
+
+def _snapshots_equal(a: BookSnapshot, b: BookSnapshot):
+    if any(getattr(a, k) != getattr(b, k) for k in BookSnapshot.__slots__ if k != 'runners'):
+        return False
+    if len(a.runners) != len(b.runners):
+        return False
+    for ra, rb in zip(a.runners, b.runners):
+        for k in ra.__slots__:
+            va, vb = getattr(ra, k), getattr(rb, k)
+            if not (np.array_equal(va, vb) if isinstance(va, np.ndarray) else va == vb):
+                return False
+    return True
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_market_snapshot_matches_market_book(seed):
+    market = _Market()
+    reused = 0
+    previous = None
+    for market_book in _market_books(seed, 300):
+        snapshot = market_snapshot(market, market_book)
+        assert _snapshots_equal(snapshot, BookSnapshot.from_market_book(market_book))
+        assert market_snapshot(market, market_book) is snapshot
+        if previous is not None:
+            reused += sum(a is b for a, b in zip(snapshot.runners, previous.runners))
+        previous = snapshot
+    # runners without updates should be re-used from the previous book
+    assert reused
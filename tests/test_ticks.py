@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from myutils.general import closest_value
+from mytrading.process import closest_tick, side_tick_offset, tick_offset, tick_spread
+from mytrading.process.ticks import LTICKS_DECODED, N_TICKS, TICKS_DECODED
+
+ROUNDING = [{}, {'round_down': True}, {'round_up': True}, {'round_down': True, 'round_up': True}]
+
+
+def _values():
+    rng = random.Random(0)
+    values = list(LTICKS_DECODED)
+    # midpoints between ticks (ties go to lower tick), and values either side of each tick
+    values += [(a + b) / 2 for a, b in zip(LTICKS_DECODED, LTICKS_DECODED[1:])]
+    values += [v + d for v in LTICKS_DECODED for d in (1e-9, -1e-9, 0.004, -0.004)]
+    values += [rng.uniform(0, 1100) for _ in range(2000)] + [rng.uniform(1, 5) for _ in range(2000)]
+    values += [round(rng.uniform(1.01, 1000), 2) for _ in range(2000)]
+    # out of range, NaN and numpy values
+    values += [-5, 0, 0.5, 1.0, 1000, 1000.5, 5000, -float('inf'), float('nan'), np.float64(2.1), np.float64(3.33)]
+    return values
+
+
+VALUES = _values()
+
+
+def _index(value):
+    return closest_value(TICKS_DECODED, value, return_index=True)
+
+
+@pytest.mark.parametrize('kwargs', ROUNDING)
+def test_closest_tick_matches_closest_value(kwargs):
+    for v in VALUES:
+        assert closest_tick(v, return_index=True, **kwargs) == closest_value(
+            TICKS_DECODED, v, return_index=True, **kwargs), v
+        assert closest_tick(v, **kwargs) == closest_value(TICKS_DECODED, v, **kwargs), v
+
+
+@pytest.mark.parametrize('kwargs', ROUNDING)
+def test_closest_tick_inf(kwargs):
+    # intended change from `closest_value()`, which gives the bottom tick for infinity (as all distances are infinite)
+    assert closest_tick(float('inf'), return_index=True, **kwargs) == N_TICKS - 1
+    assert closest_tick(float('inf'), **kwargs) == LTICKS_DECODED[-1]
+
+
+def test_tick_offsets():
+    rng = random.Random(1)
+    values = [v for v in VALUES if v == v]
+    for _ in range(5000):
+        v = rng.choice(values)
+        i = _index(v)
+        k = rng.randint(-400, 400)
+        assert tick_offset(v, k) == LTICKS_DECODED[min(max(i + k, 0), N_TICKS - 1)]
+        k = abs(k)
+        assert side_tick_offset(v, k, 'BACK') == LTICKS_DECODED[max(i - k, 0)]
+        assert side_tick_offset(v, k, 'LAY') == LTICKS_DECODED[min(i + k, N_TICKS - 1)]
+
+
+def test_tick_spread():
+    rng = random.Random(2)
+    values = [v for v in VALUES if v == v]
+    for _ in range(5000):
+        v, w = rng.choice(values), rng.choice(values)
+        assert tick_spread(v, w, False) == abs(_index(v) - _index(w))
+        if v in LTICKS_DECODED and w in LTICKS_DECODED:
+            expected = abs(LTICKS_DECODED.index(v) - LTICKS_DECODED.index(w))
+        else:
+            expected = 0
+        assert tick_spread(v, w, True) == expected
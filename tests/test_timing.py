@@ -0,0 +1,83 @@
+import random
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from myutils.exceptions import TimingException
+from myutils.timing import TimingHistogram, TimingRegistrar
+
+
+def _values(seed: int, n: int):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(-9, 1.5) for _ in range(n)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_percentiles_within_bucket(seed):
+    values = _values(seed, 5000)
+    hist = TimingHistogram()
+    for v in values:
+        hist.log_result(v)
+    assert hist.count == len(values)
+    assert hist.total == pytest.approx(sum(values))
+    assert hist.min == min(values) and hist.max == max(values)
+    for q in [0, 1, 50, 90, 95, 99, 100]:
+        # nearest rank percentile, approximated to within a bucket (upper bound is factor times lower bound)
+        exact = np.percentile(values, q, method='inverted_cdf')
+        assert exact / hist.factor <= hist.percentile(q) <= exact * hist.factor, q
+
+
+def test_out_of_range_values():
+    hist = TimingHistogram(min_s=1e-3, max_s=1.0)
+    for v in [1e-5, 1e-4, 5.0, 10.0]:
+        hist.log_result(v)
+    # values outside range are clamped to min/max logged
+    assert hist.percentile(0) == 1e-5
+    assert hist.percentile(100) == 10.0
+    assert 1e-5 <= hist.percentile(50) <= 1e-3
+
+
+def test_empty_and_invalid():
+    hist = TimingHistogram()
+    assert hist.percentile(50) == 0
+    assert hist.mean() == 0
+    hist.log_result(1e-3)
+    with pytest.raises(TimingException):
+        hist.percentile(101)
+    with pytest.raises(TimingException):
+        TimingHistogram(min_s=1.0, max_s=0.1)
+
+
+def test_merge_histograms():
+    a_values, b_values = _values(0, 1000), _values(1, 500)
+    a, b, both = TimingHistogram(), TimingHistogram(), TimingHistogram()
+    for v in a_values:
+        a.log_result(v)
+        both.log_result(v)
+    for v in b_values:
+        b.log_result(v)
+        both.log_result(v)
+    merged = a + b
+    assert merged.buckets == both.buckets
+    assert (merged.count, merged.min, merged.max) == (both.count, both.min, both.max)
+    assert merged.total == pytest.approx(both.total)
+    # operands unchanged
+    assert a.count == 1000 and b.count == 500
+    with pytest.raises(TimingException):
+        a + TimingHistogram(factor=1.1)
+
+
+def test_merge_registrars():
+    a, b = TimingRegistrar(), TimingRegistrar()
+    for v in _values(0, 100):
+        a.log_result(v, 'x')
+    for v in _values(1, 50):
+        b.log_result(v, 'x')
+        b.log_result(v, 'y')
+    merged = a + b
+    summary = {s['function']: s for s in merged.get_timings_summary()}
+    assert summary['x']['count'] == 150
+    assert summary['y']['count'] == 50
+    assert summary['x']['max'] == timedelta(seconds=max(a['x'].max, b['x'].max))
+    assert a['x'].count == 100 and 'y' not in a
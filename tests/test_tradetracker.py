@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from betfairlightweight.resources.bettingresources import CurrentOrder
+from flumine.order.ordertype import LimitOrder
+from flumine.order.trade import TradeStatus
+
+from mytrading.strategy.tradetracker import TradeTracker, ORDER_UPDATE_PATHS
+
+
+class _RecordingTracker(TradeTracker):
+    """trade tracker recording full serialized order info of each update logged with an order"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expected = []
+
+    def log_update(self, *args, order=None, **kwargs):
+        logged = order or self.active_order
+        self.expected.append(self.serializable_order_info(logged) if logged else None)
+        super().log_update(*args, order=order, **kwargs)
+
+
+def _current_order(order, status: str, matched: float, price: float, cancelled: float = 0):
+    return CurrentOrder(
+        betId='123', averagePriceMatched=price, bspLiability=0, handicap=0, marketId='1.1', orderType='LIMIT',
+        persistenceType='LAPSE', placedDate='2021-01-01T12:00:00.000Z', selectionId=1, side=order.side,
+        sizeCancelled=cancelled, sizeLapsed=0, sizeMatched=matched,
+        sizeRemaining=order.order_type.size - matched - cancelled, sizeVoided=0, status=status,
+        priceSize={'price': order.order_type.price, 'size': order.order_type.size}
+    )
+
+
+def _get(info, keys):
+    for key in keys:
+        info = info[key]
+    return info
+
+
+def test_read_updates_order_info(tmp_path):
+    file_path = str(tmp_path / 'updates')
+    strategy = SimpleNamespace(client=SimpleNamespace(paper_trade=False), name_hash='abcdef123456')
+    tracker = _RecordingTracker(selection_id=1, strategy=strategy, market_id='1.1', file_path=file_path)
+    tracker.create_trade(handicap=0)
+    trade = tracker.active_trade
+    order = tracker.active_order = trade.create_order('BACK', LimitOrder(price=2.0, size=10))
+    t = datetime(2021, 1, 1, 12)
+
+    def step(f):
+        nonlocal t
+        f()
+        t += timedelta(seconds=1)
+        tracker.update_order_tracker(t)
+
+    def placed():
+        order.bet_id = '123'
+        order.executable()
+
+    step(lambda: None)
+    step(placed)
+    step(lambda: order.update_current_order(_current_order(order, 'EXECUTABLE', 2, 2.0)))
+    step(lambda: order.update_current_order(_current_order(order, 'EXECUTABLE', 6, 2.1)))
+    step(lambda: order.update_current_order(_current_order(order, 'EXECUTION_COMPLETE', 6, 2.1, cancelled=4)))
+    step(lambda: order.violation('order violated'))
+    step(lambda: trade._update_status(TradeStatus.COMPLETE))
+    order.runner_status = 'WINNER'
+    tracker.log_close(t)
+
+    with open(file_path) as f:
+        lines = TradeTracker.read_updates(f.read())
+    assert len(lines) == len(tracker.expected)
+    assert any('order_update' not in line and line['order_info'] for line in lines)
+    changed = set()
+    for line, expected in zip(lines, tracker.expected):
+        if expected is None:
+            assert not line['order_info']
+            continue
+        for name, paths in ORDER_UPDATE_PATHS.items():
+            for keys in paths:
+                assert _get(line['order_info'], keys) == _get(expected, keys), (line['msg_type'], name, keys)
+                if _get(expected, keys) != _get(tracker.expected[0], keys):
+                    changed.add(name)
+    # fields that change over order lifetime must have been rebuilt from compact updates
+    assert changed >= set(ORDER_UPDATE_PATHS) - {'size_lapsed', 'size_voided'}